@@ -8,7 +8,9 @@ import os
 
 from src.utils.did.eladid import ffi, lib
 from src.utils.did.did_wrapper import Credential
-from src.modules.auth.user import UserManager
+from src.utils.http_exception import ElaDIDException
+from src.utils.token_cache import token_cache
+from src.modules.auth.user import UserManager, user_app_recorder
 
 from hive.util.did.v1_entity import V1Entity
 from hive.util.did_info import add_did_nonce_to_db, create_nonce, get_did_info_by_nonce, \
@@ -297,8 +299,7 @@ class HiveAuth(V1Entity):
 
         # @deprecated save the relationship between user did and app did
         # backup module not used in v1, so here is from user
-        if info.get(DID, None) and info.get(APP_ID, None):
-            UserManager().add_app_if_not_exists(info[DID], info[APP_ID])
+        user_app_recorder.record(info.get(DID, None), info.get(APP_ID, None))
 
         return info, None
 
@@ -313,44 +314,32 @@ class HiveAuth(V1Entity):
         if (len(token_splits) != 3) or token_splits[2] == "":
             return None, "Then token is invalid!"
 
-        jws = lib.DefaultJWSParser_Parse(token.encode())
-        if not jws:
+        try:
+            # the verified details are cached by the token
+            details = token_cache.parse(token)
+        except ElaDIDException as e:
             return None, self.get_error_message("JWS parser")
 
-        issuer = lib.JWT_GetIssuer(jws)
-        if not issuer:
-            lib.JWT_Destroy(jws)
+        if not details['issuer']:
             return None, self.get_error_message("JWT getIssuer")
 
-        issuer = ffi.string(issuer).decode()
-        if issuer != self.get_did_string():
-            lib.JWT_Destroy(jws)
+        if details['issuer'] != self.get_did_string():
             return None, "Then issuer is invalid!"
 
-        expired = lib.JWT_GetExpiration(jws)
         now = (int)(datetime.now().timestamp())
-        if now > expired:
-            lib.JWT_Destroy(jws)
+        if now > details['expiration']:
             return None, "Then token is expired!"
 
-        props = lib.JWT_GetClaim(jws, "props".encode())
-        if not props:
-            lib.JWT_Destroy(jws)
+        props_json = details['props']
+        if not props_json:
             return None, "Then props is none!"
 
-        props_str = ffi.string(props).decode()
-        props_json = json.loads(props_str)
-
-        app_instance_did = ffi.string(lib.JWT_GetAudience(jws)).decode()
+        app_instance_did = details['audience']
         if not app_instance_did:
-            lib.JWT_Destroy(jws)
             return None, "Then app instance id is none!"
 
         props_json[APP_INSTANCE_DID] = app_instance_did
 
-        lib.JWT_Destroy(jws)
-        # print(props_json)
-
         return props_json, None
 
     def backup_auth_request(self, content):
@@ -2,13 +2,10 @@ import json
 from datetime import datetime
 
 from bson import json_util
-
-from pymongo import MongoClient
 from pymongo.errors import CollectionInvalid
 
-from hive.settings import hive_setting
 from hive.util.constants import VAULT_ACCESS_WR, VAULT_ACCESS_R, VAULT_ACCESS_DEL
-from hive.util.did_mongo_db_resource import gene_mongo_db_name, options_filter, gene_sort, convert_oid, \
+from hive.util.did_mongo_db_resource import create_db_client, gene_mongo_db_name, options_filter, gene_sort, convert_oid, \
     populate_options_find_many, query_insert_one, query_find_many, populate_options_insert_one, query_count_documents, \
     populate_options_count_documents, query_update_one, populate_options_update_one, query_delete_one, get_collection, \
     get_mongo_database_size
@@ -16,6 +13,7 @@ from hive.util.error_code import INTERNAL_SERVER_ERROR, BAD_REQUEST, NOT_FOUND
 from hive.util.server_response import ServerResponse
 from hive.main.interceptor import post_json_param_pre_proc
 from hive.util.payment.vault_service_manage import update_vault_db_use_storage_byte
+from src.utils.namespace_cache import namespace_cache
 
 
 class HiveMongoDb:
@@ -33,11 +31,7 @@ class HiveMongoDb:
 
         collection_name = content.get('collection')
 
-        if hive_setting.MONGO_URI:
-            uri = hive_setting.MONGO_URI
-            connection = MongoClient(uri)
-        else:
-            connection = MongoClient(hive_setting.MONGODB_URI)
+        connection = create_db_client()
 
         db_name = gene_mongo_db_name(did, app_id)
         db = connection[db_name]
@@ -59,16 +53,13 @@ class HiveMongoDb:
         if collection_name is None:
             return self.response.response_err(BAD_REQUEST, "parameter is null")
 
-        if hive_setting.MONGO_URI:
-            uri = hive_setting.MONGO_URI
-            connection = MongoClient(uri)
-        else:
-            connection = MongoClient(hive_setting.MONGODB_URI)
+        connection = create_db_client()
 
         db_name = gene_mongo_db_name(did, app_id)
         db = connection[db_name]
         try:
             db.drop_collection(collection_name)
+            namespace_cache.remove_collection(db_name, collection_name)
             db_size = get_mongo_database_size(did, app_id)
             update_vault_db_use_storage_byte(did, db_size)
 
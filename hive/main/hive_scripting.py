@@ -5,7 +5,6 @@ import logging
 import jwt
 from bson import ObjectId
 from flask import request
-from pymongo import MongoClient
 from pymongo.errors import CollectionInvalid
 
 from hive.main.interceptor import post_json_param_pre_proc
@@ -16,9 +15,10 @@ from hive.util.constants import SCRIPTING_SCRIPT_COLLECTION, \
     SCRIPTING_EXECUTABLE_TYPE_INSERT, SCRIPTING_CONDITION_TYPE_QUERY_HAS_RESULTS, SCRIPTING_EXECUTABLE_TYPE_AGGREGATED, \
     SCRIPTING_EXECUTABLE_TYPE_UPDATE, SCRIPTING_EXECUTABLE_TYPE_DELETE, SCRIPTING_EXECUTABLE_TYPE_FILE_DOWNLOAD, \
     SCRIPTING_EXECUTABLE_TYPE_FILE_PROPERTIES, SCRIPTING_EXECUTABLE_TYPE_FILE_HASH, SCRIPTING_EXECUTABLE_DOWNLOADABLE, \
-    SCRIPTING_EXECUTABLE_TYPE_FILE_UPLOAD, VAULT_ACCESS_WR, VAULT_ACCESS_R, SCRIPTING_SCRIPT_TEMP_TX_COLLECTION
+    SCRIPTING_EXECUTABLE_TYPE_FILE_UPLOAD, VAULT_ACCESS_WR, VAULT_ACCESS_R, SCRIPTING_SCRIPT_TEMP_TX_COLLECTION, \
+    SCRIPTING_SCRIPT_VERSION
 from hive.util.did_file_info import filter_path_root, query_upload_get_filepath, query_download
-from hive.util.did_mongo_db_resource import gene_mongo_db_name, \
+from hive.util.did_mongo_db_resource import create_db_client, gene_mongo_db_name, \
     get_collection, get_mongo_database_size, query_delete_one, convert_oid
 from hive.util.did_scripting import check_json_param, run_executable_find, run_condition, run_executable_insert, \
     run_executable_update, run_executable_delete, run_executable_file_download, run_executable_file_properties, \
@@ -41,11 +41,7 @@ class HiveScripting:
         self.app = app
 
     def __upsert_script_to_db(self, did, app_id, content):
-        if hive_setting.MONGO_URI:
-            uri = hive_setting.MONGO_URI
-            connection = MongoClient(uri)
-        else:
-            connection = MongoClient(hive_setting.MONGODB_URI)
+        connection = create_db_client()
 
         db_name = gene_mongo_db_name(did, app_id)
         db = connection[db_name]
@@ -72,6 +68,8 @@ class HiveScripting:
             "upsert": True,
             "bypass_document_validation": False
         }
+        # let the compiled script of the v2 API expire
+        content[SCRIPTING_SCRIPT_VERSION] = str(ObjectId())
         try:
             ret = col.replace_one(query, convert_oid(content), **options)
             data = {
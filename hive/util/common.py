@@ -3,10 +3,10 @@ import os
 import random
 from pathlib import Path
 from urllib.parse import urlparse
-import hashlib
 
 from hive.util.constants import CHUNK_SIZE
 from hive.settings import hive_setting
+from src.utils.file_hasher import hash_file, hash_files, list_files
 
 
 def did_tail_part(did):
@@ -47,14 +47,7 @@ def gene_temp_file_name():
 
 
 def get_file_md5_info(file_name):
-    m = hashlib.md5()
-    with open(file_name, 'rb') as f:
-        while True:
-            chunk = f.read(4)
-            if not chunk:
-                break
-            m.update(chunk)
-    return [m.hexdigest(), file_name]
+    return [hash_file(file_name, 'md5'), file_name]
 
 
 def deal_dir(dir_path, deal_func):
@@ -75,8 +68,6 @@ def deal_dir(dir_path, deal_func):
 
 
 def get_file_checksum_list(folder):
-    checksum_list = list()
-    local_file_gene = deal_dir(folder.as_posix(), get_file_md5_info)
-    for info in local_file_gene:
-        checksum_list.append(info[0])
-    return checksum_list
+    if not folder.exists():
+        return list()
+    return hash_files(list_files(folder.resolve().as_posix()), 'md5')
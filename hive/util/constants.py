@@ -63,6 +63,8 @@ VAULT_BACKUP_SERVICE_STATE = "state"
 # scripting begin
 SCRIPTING_SCRIPT_COLLECTION = "scripts"
 SCRIPTING_SCRIPT_TEMP_TX_COLLECTION = "scripts_temptx"
+# changed on every registering of the script
+SCRIPTING_SCRIPT_VERSION = "_version"
 
 SCRIPTING_CONDITION_TYPE_QUERY_HAS_RESULTS = "queryHasResults"
 SCRIPTING_CONDITION_TYPE_AND = "and"
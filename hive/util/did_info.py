@@ -1,19 +1,12 @@
 import uuid
 
-from pymongo import MongoClient
-
 from hive.util.constants import DID_INFO_DB_NAME, DID_INFO_REGISTER_COL, DID, APP_ID, DID_INFO_NONCE, DID_INFO_TOKEN, \
     DID_INFO_NONCE_EXPIRED, DID_INFO_TOKEN_EXPIRED, APP_INSTANCE_DID
-from hive.settings import hive_setting
-from hive.util.did_mongo_db_resource import gene_mongo_db_name
+from hive.util.did_mongo_db_resource import create_db_client, gene_mongo_db_name
 
 
 def add_did_nonce_to_db(app_instance_did, nonce, expired):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     did_dic = {APP_INSTANCE_DID: app_instance_did, DID_INFO_NONCE: nonce, DID_INFO_NONCE_EXPIRED: expired}
@@ -21,11 +14,7 @@ def add_did_nonce_to_db(app_instance_did, nonce, expired):
     return i
 
 def update_nonce_of_did_info(app_instance_did, nonce, expired):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID_INFO_NONCE: nonce}
@@ -34,11 +23,7 @@ def update_nonce_of_did_info(app_instance_did, nonce, expired):
     return ret
 
 def update_did_info_by_app_instance_did(app_instance_did, nonce, expired):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {APP_INSTANCE_DID: app_instance_did}
@@ -47,11 +32,7 @@ def update_did_info_by_app_instance_did(app_instance_did, nonce, expired):
     return ret
 
 def update_token_of_did_info(did, app_id, app_instance_did, nonce, token, expired):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {APP_INSTANCE_DID: app_instance_did, DID_INFO_NONCE: nonce}
@@ -61,11 +42,7 @@ def update_token_of_did_info(did, app_id, app_instance_did, nonce, token, expire
 
 
 def get_all_did_info():
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     infos = col.find()
@@ -73,11 +50,7 @@ def get_all_did_info():
 
 
 def delete_did_info(did, app_id):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID: did, APP_ID: app_id}
@@ -85,11 +58,7 @@ def delete_did_info(did, app_id):
 
 
 def get_all_did_info_by_did(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID: did}
@@ -98,11 +67,7 @@ def get_all_did_info_by_did(did):
 
 
 def get_did_info_by_nonce(nonce):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID_INFO_NONCE: nonce}
@@ -110,11 +75,7 @@ def get_did_info_by_nonce(nonce):
     return info
 
 def get_did_info_by_app_instance_did(app_instance_did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {APP_INSTANCE_DID: app_instance_did}
@@ -122,11 +83,7 @@ def get_did_info_by_app_instance_did(app_instance_did):
     return info
 
 def get_did_info_by_did_appid(did, app_id):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID: did, APP_ID: app_id}
@@ -135,11 +92,7 @@ def get_did_info_by_did_appid(did, app_id):
 
 
 def save_token_to_db(did, app_id, token, expired):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID: did, APP_ID: app_id}
@@ -153,11 +106,7 @@ def save_token_to_db(did, app_id, token, expired):
 
 
 def get_did_info_by_token(token):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_INFO_REGISTER_COL]
     query = {DID_INFO_TOKEN: token}
@@ -165,11 +114,7 @@ def get_did_info_by_token(token):
     return info
 
 def get_collection(did, app_id, collection):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
     db_name = gene_mongo_db_name(did, app_id)
     db = connection[db_name]
     col = db[collection]
@@ -1,16 +1,17 @@
 import hashlib
-import json
 import shutil
 import subprocess
 from datetime import datetime
 from pathlib import Path
 
-from bson import ObjectId, json_util
-from pymongo import MongoClient
+from bson import ObjectId
 
 from hive.settings import hive_setting
 from hive.util.constants import DATETIME_FORMAT, DID, APP_ID
 from hive.util.common import did_tail_part, create_full_path_dir
+from src.utils.extended_json import to_json_value
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils.namespace_cache import namespace_cache
 
 
 def convert_oid(query, update=False):
@@ -139,10 +140,7 @@ def query_find_many(col, content, options):
             result = col.find(convert_oid(content["filter"]), **options)
         else:
             result = col.find(**options)
-        arr = list()
-        for c in json.loads(json_util.dumps(result)):
-            arr.append(c)
-        data = {"items": arr}
+        data = {"items": [to_json_value(c) for c in result]}
         return data, None
     except Exception as e:
         return None, f"Exception: method: 'query_find_many', Err: {str(e)}"
@@ -160,6 +158,11 @@ def query_delete_one(col, content):
         return None, f"Exception: method: 'query_delete_one', Err: {str(e)}"
 
 
+def create_db_client():
+    """ Get the shared MongoClient by the setting MONGO_URI or MONGODB_URI. """
+    return mongodb_pool.get_client(hive_setting.MONGO_URI if hive_setting.MONGO_URI else hive_setting.MONGODB_URI)
+
+
 def gene_mongo_db_name(did, app_id):
     md5 = hashlib.md5()
     md5.update((did + "_" + app_id).encode("utf-8"))
@@ -167,11 +170,7 @@ def gene_mongo_db_name(did, app_id):
 
 
 def get_collection(did, app_id, collection):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db_name = gene_mongo_db_name(did, app_id)
     db = connection[db_name]
@@ -182,23 +181,16 @@ def get_collection(did, app_id, collection):
 
 
 def delete_mongo_database(did, app_id):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db_name = gene_mongo_db_name(did, app_id)
     connection.drop_database(db_name)
+    namespace_cache.remove_database(db_name)
 
 
 def get_mongo_database_size(user_did, app_did):
     """ for database usage size updating """
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     # get user's database
     db_name = gene_mongo_db_name(user_did, app_did)
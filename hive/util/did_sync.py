@@ -1,8 +1,6 @@
-from pymongo import MongoClient
-
 from hive.util.constants import DID, DID_INFO_DB_NAME, DID_SYNC_INFO_COL, DID_SYNC_INFO_STATE, DID_SYNC_INFO_MSG, \
     DID_SYNC_INFO_TIME, DID_SYNC_INFO_DRIVE
-from hive.settings import hive_setting
+from hive.util.did_mongo_db_resource import create_db_client
 
 DATA_SYNC_STATE_NONE = "none"
 DATA_SYNC_STATE_INIT = "init"
@@ -17,11 +15,7 @@ DATA_SYNC_MSG_FAILED = "failed"
 
 
 def add_did_sync_info(did, time, drive):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_SYNC_INFO_COL]
@@ -33,11 +27,7 @@ def add_did_sync_info(did, time, drive):
 
 
 def update_did_sync_info(did, state, info, sync_time, drive):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_SYNC_INFO_COL]
@@ -49,11 +39,7 @@ def update_did_sync_info(did, state, info, sync_time, drive):
 
 
 def delete_did_sync_info(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_SYNC_INFO_COL]
@@ -62,11 +48,7 @@ def delete_did_sync_info(did):
 
 
 def get_did_sync_info(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_SYNC_INFO_COL]
@@ -76,11 +58,7 @@ def get_did_sync_info(did):
 
 
 def get_all_did_sync_info():
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[DID_SYNC_INFO_COL]
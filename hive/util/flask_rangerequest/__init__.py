@@ -1,5 +1,7 @@
-from ._request import RangeRequest
+from ._request import RangeRequest, SEND_MODES, SEND_MODE_STREAM, SEND_MODE_SENDFILE, SEND_MODE_X_ACCEL_REDIRECT, \
+    SEND_MODE_X_SENDFILE
 
 __version__ = '0.0.0'
 
-__all__ = ['RangeRequest']
+__all__ = ['RangeRequest', 'SEND_MODES', 'SEND_MODE_STREAM', 'SEND_MODE_SENDFILE', 'SEND_MODE_X_ACCEL_REDIRECT',
+           'SEND_MODE_X_SENDFILE']
@@ -1,26 +1,84 @@
 import binascii
 import hashlib
+import os
 
 from datetime import datetime
-from flask import Response, abort, request
+from flask import Response, request
 from io import BytesIO
 from werkzeug.http import parse_date, http_date
+from werkzeug.wsgi import wrap_file
 
-from ._utils import parse_range_header
+from ._utils import parse_range_header, parse_etags, etag_matches, to_http_time
+
+# stream the content by the python generator
+SEND_MODE_STREAM = 'stream'
+# hand the opened file to the WSGI server (wsgi.file_wrapper), the server like gunicorn uses os.sendfile()
+SEND_MODE_SENDFILE = 'sendfile'
+# let nginx send the file by the internal location
+SEND_MODE_X_ACCEL_REDIRECT = 'x-accel-redirect'
+# let apache (mod_xsendfile) or lighttpd send the file
+SEND_MODE_X_SENDFILE = 'x-sendfile'
+
+SEND_MODES = (SEND_MODE_STREAM, SEND_MODE_SENDFILE, SEND_MODE_X_ACCEL_REDIRECT, SEND_MODE_X_SENDFILE)
+
+# the size of every reading on streaming the content
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+class _FileRange:
+    """ The file-like object which only exposes one range of the file.
+
+    The file position is at the start of the range, so the server which supports sendfile
+    sends the bytes from here with the size of Content-Length, others just read it.
+    """
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
 
 
 class RangeRequest:
+    # the content type of every part of multipart/byteranges
+    MULTIPART_CONTENT_TYPE = 'application/octet-stream'
 
     def __init__(self,
                  data,
                  etag: str = None,
                  last_modified: datetime = None,
-                 size: int = None) -> None:
+                 size: int = None,
+                 file_path: str = None) -> None:
+        """
+        :param data: the content, can be None if file_path specified.
+        :param file_path: the path of the content file which is required by the sending modes except 'stream'.
+        """
 
         if not ((etag is None and last_modified is None and size is None) or
                 (etag is not None and last_modified is not None and size is not None)):
             raise ValueError('Must specifiy all range data or none.')
 
+        if data is None and file_path is None:
+            raise ValueError('Must specifiy the data or the file path.')
+
+        self.__file_path = file_path
+        if data is None:
+            # open the file only when it is required
+            data = _LazyFile(file_path)
+
         if isinstance(data, bytes):
             self.__data = BytesIO(data)
         elif isinstance(data, str):
@@ -52,74 +110,169 @@ class RangeRequest:
                     break
             self.__data.seek(0)
 
-    def make_response(self) -> Response:
-        use_default_range = True
-        status_code = 200
-        # range requests are only allowed for get
-        if request.method == 'GET':
-            range_header = request.headers.get('Range')
+    def make_response(self, send_mode=SEND_MODE_STREAM, redirect_uri: str = None) -> Response:
+        """ Make the response with the conditional requests (RFC 7232) and the range requests (RFC 7233) support.
+
+        :param send_mode: one of SEND_MODES, 'stream' is used if the file path not specified.
+        :param redirect_uri: the uri of the file for nginx internal location, required by 'x-accel-redirect'.
+        """
+        if send_mode not in SEND_MODES or (send_mode != SEND_MODE_STREAM and not self.__file_path) \
+                or (send_mode == SEND_MODE_X_ACCEL_REDIRECT and not redirect_uri):
+            send_mode = SEND_MODE_STREAM
 
-            ranges = parse_range_header(range_header, self.__size)
-            if not (len(ranges) == 1 and ranges[0][0] == 0 and ranges[0][1] == self.__size - 1):
-                use_default_range = False
-                status_code = 206
+        if send_mode in (SEND_MODE_X_ACCEL_REDIRECT, SEND_MODE_X_SENDFILE):
+            return self.__make_proxy_response(send_mode, redirect_uri)
 
-            if range_header:
-                if_range = request.headers.get('If-Range')
-                if if_range and if_range != self.__etag:
-                    use_default_range = True
-                    status_code = 200
+        status_code = self.__evaluate_preconditions()
+        if status_code is not None:
+            self.__data.close()
+            resp = Response(status=status_code)
+            self.__set_validators(resp)
+            return resp
 
-        if use_default_range:
-            ranges = [(0, self.__size - 1)]
+        ranges = self.__get_ranges()
+        if ranges is not None and not ranges:
+            self.__data.close()
+            resp = Response(status=416)
+            resp.headers['Content-Range'] = 'bytes */{}'.format(self.__size)
+            self.__set_validators(resp)
+            return resp
 
-        if len(ranges) > 1:
-            abort(416)  # We don't support multipart range requests yet
+        if not ranges:
+            # the whole content
+            resp = self.__make_range_response(send_mode, 0, self.__size - 1)
+            resp.status_code = 200
+        elif len(ranges) == 1:
+            resp = self.__make_range_response(send_mode, ranges[0][0], ranges[0][1])
+            resp.headers['Content-Range'] = 'bytes {}-{}/{}'.format(ranges[0][0], ranges[0][1], self.__size)
+            resp.status_code = 206
+        else:
+            resp = self.__make_multipart_response(ranges)
+            resp.status_code = 206
 
-        if_unmod = request.headers.get('If-Unmodified-Since')
-        if if_unmod:
-            if_date = parse_date(if_unmod)
-            if if_date and if_date < self.__last_modified:
-                status_code = 304
+        self.__set_validators(resp)
+        return resp
 
-        # TODO If-None-Match support
+    def __set_validators(self, resp: Response):
+        """ the validators are same for the whole content and its ranges, so no range related etag """
+        resp.headers['Accept-Ranges'] = 'bytes'
+        resp.headers['ETag'] = self.__etag
+        resp.headers['Last-Modified'] = http_date(self.__last_modified)
 
-        if status_code != 304:
-            resp = Response(self.__generate(ranges, self.__data))
+    def __evaluate_preconditions(self):
+        """ Evaluate the conditional headers with the order of RFC 7232 6.
+
+        :return: 304, 412 or None which means the content can be responded.
+        """
+        is_get_or_head = request.method in ('GET', 'HEAD')
+        last_modified = to_http_time(self.__last_modified)
+
+        if_match = request.headers.get('If-Match')
+        if if_match is not None:
+            if not etag_matches(self.__etag, parse_etags(if_match), weak=False):
+                return 412
         else:
-            resp = Response()
+            if_unmodified_since = parse_date(request.headers.get('If-Unmodified-Since'))
+            if if_unmodified_since and last_modified > to_http_time(if_unmodified_since):
+                return 412
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if etag_matches(self.__etag, parse_etags(if_none_match), weak=True):
+                return 304 if is_get_or_head else 412
+        elif is_get_or_head:
+            if_modified_since = parse_date(request.headers.get('If-Modified-Since'))
+            if if_modified_since and last_modified <= to_http_time(if_modified_since):
+                return 304
+
+        return None
+
+    def __get_ranges(self):
+        """ Get the requested ranges, the range is only for GET (RFC 7233 3.1).
 
-        if not use_default_range:
-            etag = self.make_etag(BytesIO((self.__etag + str(ranges)).encode('utf-8')))
+        :return: None means the whole content, empty list means not satisfiable.
+        """
+        if request.method != 'GET':
+            return None
+
+        range_header = request.headers.get('Range')
+        if not range_header:
+            return None
+
+        # the ranges are only used if the client has the same content (RFC 7233 3.2)
+        if_range = request.headers.get('If-Range')
+        if if_range:
+            if_range = if_range.strip()
+            if if_range.startswith(('"', 'W/"')):
+                if not etag_matches(self.__etag, [if_range], weak=False):
+                    return None
+            else:
+                if_range_date = parse_date(if_range)
+                if not if_range_date or to_http_time(if_range_date) != to_http_time(self.__last_modified):
+                    return None
+
+        ranges = parse_range_header(range_header, self.__size)
+        if ranges and len(ranges) == 1 and ranges[0] == (0, self.__size - 1):
+            return None
+        return ranges
+
+    def __make_range_response(self, send_mode, start, end) -> Response:
+        if send_mode == SEND_MODE_SENDFILE:
+            file_range = _FileRange(self.__data, start, end)
+            resp = Response(wrap_file(request.environ, file_range, STREAM_CHUNK_SIZE), direct_passthrough=True)
         else:
-            etag = self.__etag
+            resp = Response(self.__generate([(start, end)], self.__data))
+        resp.headers['Content-Length'] = max(end + 1 - start, 0)
+        return resp
 
-        resp.headers['Content-Length'] = ranges[0][1]+1 - ranges[0][0]
-        resp.headers['Accept-Ranges'] = 'bytes'
-        resp.headers['ETag'] = etag
-        resp.headers['Last-Modified'] = http_date(self.__last_modified)
+    def __make_multipart_response(self, ranges) -> Response:
+        """ multipart/byteranges (RFC 7233 4.1, Appendix A) """
+        boundary = binascii.hexlify(os.urandom(16)).decode('utf-8')
+        part_headers = ['--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n'.format(
+            boundary, self.MULTIPART_CONTENT_TYPE, start, end, self.__size).encode('utf-8') for start, end in ranges]
+        closing = '--{}--\r\n'.format(boundary).encode('utf-8')
 
-        if status_code == 206:
-            resp.headers['Content-Range'] = \
-                'bytes {}-{}/{}'.format(ranges[0][0], ranges[0][1], self.__size)
+        def generate():
+            for part_header, range_ in zip(part_headers, ranges):
+                yield part_header
+                yield from self.__generate([range_], self.__data, close=False)
+                yield b'\r\n'
+            yield closing
+            self.__data.close()
 
-        resp.status_code = status_code
+        length = sum(map(len, part_headers)) + sum(end + 1 - start + 2 for start, end in ranges) + len(closing)
+        resp = Response(generate(), mimetype='multipart/byteranges; boundary={}'.format(boundary))
+        resp.headers['Content-Length'] = length
+        return resp
 
+    def __make_proxy_response(self, send_mode, redirect_uri):
+        """ The front server (nginx, apache) sends the file content and handles the range and conditional headers. """
+        self.__data.close()
+
+        resp = Response()
+        if send_mode == SEND_MODE_X_ACCEL_REDIRECT:
+            resp.headers['X-Accel-Redirect'] = redirect_uri
+        else:
+            resp.headers['X-Sendfile'] = self.__file_path
+        resp.headers['Accept-Ranges'] = 'bytes'
+        resp.headers['ETag'] = self.__etag
+        resp.headers['Last-Modified'] = http_date(self.__last_modified)
         return resp
 
-    def __generate(self, ranges: list, readable):
+    def __generate(self, ranges: list, readable, close=True):
         for (start, end) in ranges:
             readable.seek(start)
             bytes_left = end - start + 1
 
-            chunk_size = 4096
+            chunk_size = STREAM_CHUNK_SIZE
             while bytes_left > 0:
                 read_size = min(chunk_size, bytes_left)
                 chunk = readable.read(read_size)
                 bytes_left -= read_size
                 yield chunk
 
-        readable.close()
+        if close:
+            readable.close()
 
     @classmethod
     def make_etag(cls, data):
@@ -134,3 +287,29 @@ class RangeRequest:
 
         hash_value = binascii.hexlify(hasher.digest()).decode('utf-8')
         return '"sha256:{}"'.format(hash_value)
+
+
+class _LazyFile:
+    """ Open the file on the first access. """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = None
+
+    def __get_file(self):
+        if self.file is None:
+            self.file = open(self.file_path, 'rb')
+        return self.file
+
+    def fileno(self):
+        return self.__get_file().fileno()
+
+    def seek(self, offset, whence=0):
+        return self.__get_file().seek(offset, whence)
+
+    def read(self, size=-1):
+        return self.__get_file().read(size)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
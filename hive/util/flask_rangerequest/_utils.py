@@ -1,52 +1,52 @@
-from flask import abort
+from datetime import datetime, timezone
 
+# the ranges more than this (after merging) are ignored and the whole content is responded
+MAX_RANGES = 64
 
-def parse_range_header(range_header: str, target_size: int) -> list:
-    end_index = target_size - 1
+
+def parse_range_header(range_header: str, target_size: int):
+    """ Parse the header 'Range' (RFC 7233 2.1, 3.1)
+
+    :return: None means no range or the header is ignored because of invalid syntax,
+        empty list means all ranges are unsatisfiable,
+        else the sorted and merged ranges [(start, end)], the end is inclusive.
+    """
     if range_header is None:
-        return [(0, end_index)]
+        return None
 
-    bytes_ = 'bytes='
-    if not range_header.startswith(bytes_):
-        abort(416)
+    unit, _, specs = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs.strip():
+        return None
 
+    end_index = target_size - 1
     ranges = []
-    for range_ in range_header[len(bytes_):].split(','):
-        split = range_.split('-')
-        if len(split) == 1:
-            try:
-                start = int(split[0])
-                end = end_index
-            except ValueError:
-                abort(416)
-        elif len(split) == 2:
-            start, end = split[0], split[1]
-            if not start:
-                # parse ranges of the form "bytes=-100" (i.e., last 100 bytes)
-                end = end_index
-                try:
-                    start = end - int(split[1]) + 1
-                except ValueError:
-                    abort(416)
-            else:
-                # parse ranges of the form "bytes=100-200"
-                try:
-                    start = int(start)
-                    if not end:
-                        end = target_size
-                    else:
-                        end = int(end)
-                except ValueError:
-                    abort(416)
-
-                if end < start:
-                    abort(416)
-
-                end = min(end, end_index)
-        else:
-            abort(416)
+    for range_ in specs.split(','):
+        range_ = range_.strip()
+        if not range_:
+            continue
 
-        ranges.append((start, end))
+        start, sep, end = range_.partition('-')
+        start, end = start.strip(), end.strip()
+        if not sep or not (start.isdigit() or not start) or not (end.isdigit() or not end):
+            return None
+
+        if not start:
+            # parse ranges of the form "bytes=-100" (i.e., last 100 bytes)
+            if not end:
+                return None
+            suffix = int(end)
+            if suffix == 0 or target_size == 0:
+                continue
+            ranges.append((max(0, target_size - suffix), end_index))
+        else:
+            # parse ranges of the form "bytes=100-200" or "bytes=100-"
+            start = int(start)
+            if end and int(end) < start:
+                return None
+            if start > end_index:
+                continue
+            end = int(end) if end else end_index
+            ranges.append((start, min(end, end_index)))
 
     # merge the ranges
     merged = []
@@ -62,4 +62,47 @@ def parse_range_header(range_header: str, target_size: int) -> list:
             else:
                 merged.append(range_)
 
+    if len(merged) > MAX_RANGES:
+        return None
+
     return merged
+
+
+def parse_etags(header: str) -> list:
+    """ Parse the entity tags of the header 'If-Match' or 'If-None-Match', '*' is kept. """
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+
+def is_weak_etag(etag: str) -> bool:
+    return etag.startswith('W/')
+
+
+def etag_matches(etag: str, etags: list, weak=True) -> bool:
+    """ Compare the entity tag with the list (RFC 7232 2.3.2)
+
+    :param weak: True means weak comparison, else strong comparison which the weak tags never match.
+    """
+    if '*' in etags:
+        return True
+
+    if not weak and is_weak_etag(etag):
+        return False
+
+    def opaque(tag):
+        return tag[2:] if is_weak_etag(tag) else tag
+
+    for tag in etags:
+        if not weak and is_weak_etag(tag):
+            continue
+        if opaque(tag) == opaque(etag):
+            return True
+    return False
+
+
+def to_http_time(value: datetime) -> datetime:
+    """ The time for comparing with the HTTP date: in UTC and without microseconds. """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
@@ -2,7 +2,6 @@ import json
 import logging
 
 from bson import ObjectId
-from pymongo import MongoClient
 from datetime import datetime
 import requests
 
@@ -10,6 +9,7 @@ from hive.util.payment.payment_config import PaymentConfig
 
 from hive.settings import hive_setting
 from hive.util.constants import *
+from hive.util.did_mongo_db_resource import create_db_client
 from hive.util.payment.vault_backup_service_manage import get_vault_backup_service, setup_vault_backup_service, \
     update_vault_backup_service
 from hive.util.payment.vault_service_manage import update_vault_service, get_vault_service, setup_vault_service
@@ -28,11 +28,7 @@ logger = logging.getLogger("vault_order")
 
 
 def create_order_info(did, app_id, package_info, order_type=VAULT_ORDER_TYPE_VAULT):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -52,11 +48,7 @@ def create_order_info(did, app_id, package_info, order_type=VAULT_ORDER_TYPE_VAU
 
 
 def find_txid(txid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -66,11 +58,7 @@ def find_txid(txid):
 
 
 def find_canceled_order_by_txid(did, txid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -84,11 +72,7 @@ def find_canceled_order_by_txid(did, txid):
 
 
 def update_order_info(_id, info_dic):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -100,11 +84,7 @@ def update_order_info(_id, info_dic):
 
 
 def get_order_info_by_id(_id):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -114,11 +94,7 @@ def get_order_info_by_id(_id):
 
 
 def get_order_info_list(did, app_id):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -194,11 +170,7 @@ def deal_order_tx(info):
 
 
 def check_pay_order_timeout_job():
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -213,11 +185,7 @@ def check_pay_order_timeout_job():
 
 
 def check_wait_order_tx_job():
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_ORDER_COL]
@@ -1,9 +1,6 @@
 import shutil
 from datetime import datetime
 
-from pymongo import MongoClient
-
-from hive.settings import hive_setting
 from hive.util.constants import DID_INFO_DB_NAME, VAULT_SERVICE_COL, VAULT_SERVICE_DID, VAULT_SERVICE_STATE, \
     VAULT_SERVICE_MAX_STORAGE, VAULT_SERVICE_START_TIME, VAULT_SERVICE_END_TIME, VAULT_SERVICE_PRICING_USING, \
     VAULT_ACCESS_WR, DID, APP_ID, VAULT_SERVICE_FILE_USE_STORAGE, VAULT_SERVICE_DB_USE_STORAGE, \
@@ -11,10 +8,11 @@ from hive.util.constants import DID_INFO_DB_NAME, VAULT_SERVICE_COL, VAULT_SERVI
 
 from hive.util.did_file_info import get_dir_size, get_vault_path
 from hive.util.did_info import get_all_did_info_by_did
-from hive.util.did_mongo_db_resource import delete_mongo_database, get_mongo_database_size
+from hive.util.did_mongo_db_resource import create_db_client, delete_mongo_database, get_mongo_database_size
 from hive.util.error_code import NOT_FOUND, LOCKED, NOT_ENOUGH_SPACE, SUCCESS, METHOD_NOT_ALLOWED
 from hive.util.payment.payment_config import PaymentConfig
 from hive.util.payment.vault_backup_service_manage import get_vault_backup_service
+from src.modules.subscription.vault_cache import vault_cache
 
 VAULT_SERVICE_FREE = "Free"
 VAULT_SERVICE_STATE_RUNNING = "running"
@@ -22,11 +20,7 @@ VAULT_SERVICE_STATE_FREEZE = "freeze"
 
 
 def setup_vault_service(did, max_storage, service_days, pricing_name=VAULT_SERVICE_FREE):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -50,16 +44,13 @@ def setup_vault_service(did, max_storage, service_days, pricing_name=VAULT_SERVI
     query = {VAULT_SERVICE_DID: did}
     value = {"$set": dic}
     ret = col.update_one(query, value, upsert=True)
+    vault_cache.invalidate(did)
     return ret
 
 
 def update_vault_service(did, max_storage, service_days, pricing_name):
     # If there has a service, we just update it. complex process latter
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -80,20 +71,18 @@ def update_vault_service(did, max_storage, service_days, pricing_name):
     query = {VAULT_SERVICE_DID: did}
     value = {"$set": dic}
     ret = col.update_one(query, value)
+    vault_cache.invalidate(did)
     return ret
 
 
 def remove_vault_service(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
     query = {VAULT_SERVICE_DID: did}
     col.delete_many(query)
+    vault_cache.invalidate(did)
 
 
 def freeze_vault(did):
@@ -106,11 +95,7 @@ def unfreeze_vault(did):
 
 def update_vault_service_state(did, state):
     # If there has a service, we just update it. complex process latter
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -124,15 +109,12 @@ def update_vault_service_state(did, state):
     query = {VAULT_SERVICE_DID: did}
     value = {"$set": dic}
     ret = col.update_one(query, value)
+    vault_cache.invalidate(did)
     return ret
 
 
 def get_vault_service(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -183,11 +165,7 @@ def delete_user_vault(did):
 
 
 def proc_expire_vault_job():
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -234,11 +212,7 @@ def get_vault_used_storage(did):
     file_size = count_file_system_storage_size(did)
     db_size = count_db_storage_size(did)
     now = datetime.utcnow().timestamp()
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -248,15 +222,12 @@ def get_vault_used_storage(did):
                       VAULT_SERVICE_MODIFY_TIME: now
                       }}
     col.update_one(query, value)
+    vault_cache.invalidate(did)
     return (file_size + db_size) / (1024 * 1024)
 
 
 def __less_than_max_storage(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -270,11 +241,7 @@ def __less_than_max_storage(did):
 
 
 def update_vault_db_use_storage_byte(did, size):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_SERVICE_COL]
@@ -286,4 +253,5 @@ def update_vault_db_use_storage_byte(did, size):
     }
     value = {"$set": dic}
     ret = col.update_one(query, value)
+    vault_cache.invalidate(did)
     return ret
@@ -1,22 +1,17 @@
 import hashlib
 from datetime import datetime
 
-from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError
 
-from hive.settings import hive_setting
 from hive.util.constants import DID_INFO_DB_NAME, PUB_CHANNEL_COLLECTION, PUB_CHANNEL_PUB_DID, \
     PUB_CHANNEL_PUB_APPID, PUB_CHANNEL_NAME, PUB_CHANNEL_MODIFY_TIME, PUB_CHANNEL_ID, \
     PUB_CHANNEL_SUB_DID, PUB_CHANNEL_SUB_APPID
+from hive.util.did_mongo_db_resource import create_db_client
 
 
 # publisher: create channel, list channels, subscribe, push messages
 def pub_setup_channel(pub_did, pub_appid, channel_name):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -38,11 +33,7 @@ def pub_setup_channel(pub_did, pub_appid, channel_name):
 
 
 def pub_remove_channel(pub_did, pub_appid, channel_name):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -61,11 +52,7 @@ def pubsub_get_channel_id(did, app_id, channel_name):
 
 
 def pub_get_channel(pub_did, pub_appid, channel_name):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -79,11 +66,7 @@ def pub_get_channel(pub_did, pub_appid, channel_name):
 
 
 def pub_get_pub_channels(pub_did, pub_appid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -99,11 +82,7 @@ def pub_get_pub_channels(pub_did, pub_appid):
 
 
 def pub_get_sub_channels(sub_did, sub_appid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -123,11 +102,7 @@ def pubsub_get_subscribe_id(pub_did, pub_appid, channel_name, sub_did, sub_appid
 
 
 def pub_add_subscriber(pub_did, pub_appid, channel_name, sub_did, sub_appid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -151,11 +126,7 @@ def pub_add_subscriber(pub_did, pub_appid, channel_name, sub_did, sub_appid):
 
 
 def pub_remove_subscribe(pub_did, pub_appid, channel_name, sub_did, sub_appid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -167,11 +138,7 @@ def pub_remove_subscribe(pub_did, pub_appid, channel_name, sub_did, sub_appid):
 
 
 def pub_get_subscriber(pub_did, pub_appid, channel_name, sub_did, sub_appid):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
@@ -185,11 +152,7 @@ def pub_get_subscriber(pub_did, pub_appid, channel_name, sub_did, sub_appid):
 
 
 def pub_get_subscriber_list(pub_did, pub_appid, channel_name):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[PUB_CHANNEL_COLLECTION]
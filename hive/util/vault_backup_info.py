@@ -1,12 +1,10 @@
 from datetime import datetime
 
-from pymongo import MongoClient
-
 from hive.util.constants import DID, DID_INFO_DB_NAME, VAULT_BACKUP_INFO_COL, VAULT_BACKUP_INFO_STATE, \
     VAULT_BACKUP_INFO_MSG, VAULT_BACKUP_INFO_TIME, VAULT_BACKUP_INFO_DRIVE, VAULT_BACKUP_INFO_TYPE, \
     VAULT_BACKUP_INFO_TOKEN
+from hive.util.did_mongo_db_resource import create_db_client
 
-from hive.settings import hive_setting
 
 VAULT_BACKUP_STATE_RESTORE = "restore"
 VAULT_BACKUP_STATE_BACKUP = "backup"
@@ -17,11 +15,7 @@ VAULT_BACKUP_MSG_FAILED = "failed"
 
 
 def upsert_vault_backup_info(did, backup_type, drive, token=None):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_BACKUP_INFO_COL]
@@ -38,11 +32,7 @@ def upsert_vault_backup_info(did, backup_type, drive, token=None):
 
 
 def update_vault_backup_info_item(did, key, value):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_BACKUP_INFO_COL]
@@ -53,11 +43,7 @@ def update_vault_backup_info_item(did, key, value):
 
 
 def update_vault_backup_state(did, state, msg):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_BACKUP_INFO_COL]
@@ -69,11 +55,7 @@ def update_vault_backup_state(did, state, msg):
 
 
 def delete_vault_backup_info(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_BACKUP_INFO_COL]
@@ -82,11 +64,7 @@ def delete_vault_backup_info(did):
 
 
 def get_vault_backup_info(did):
-    if hive_setting.MONGO_URI:
-        uri = hive_setting.MONGO_URI
-        connection = MongoClient(uri)
-    else:
-        connection = MongoClient(hive_setting.MONGODB_URI)
+    connection = create_db_client()
 
     db = connection[DID_INFO_DB_NAME]
     col = db[VAULT_BACKUP_INFO_COL]
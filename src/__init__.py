@@ -79,7 +79,7 @@ def after_request(response):
 
     # update vault database usage
     if hasattr(g, 'usr_did') and g.usr_did:
-        update_vault_databases_usage_task.submit(g.usr_did, request.full_path)
+        update_vault_databases_usage_task.submit(g.usr_did, request.full_path, request.method.upper() != 'GET')
 
     return response
 
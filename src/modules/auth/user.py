@@ -1,6 +1,13 @@
 import logging
+import threading
+import time
+from datetime import datetime
 
+from pymongo import UpdateOne
+
+from src import hive_setting
 from src.modules.database.mongodb_client import MongodbClient
+from src.utils import hive_job
 from src.utils.consts import COL_APPLICATION_USR_DID, COL_APPLICATION_APP_DID, COL_APPLICATION_STATE, COL_APPLICATION_STATE_NORMAL, COL_APPLICATION, \
     COL_APPLICATION_DATABASE_NAME
 from src.utils_v1.constants import APP_ID, USER_DID, DID_INFO_REGISTER_COL
@@ -72,6 +79,43 @@ class UserManager:
         col = self.mcli.get_management_collection(COL_APPLICATION)
         col.update_one(filter_, update, contains_extra=True, upsert=True)
 
+        user_app_recorder.add_known(user_did, app_did)
+
+    def add_apps_if_not_exist(self, pairs: list):
+        """ add the relations of user did and app did to collection in one bulk write
+
+        :param pairs [(user_did, app_did)], all dids can not be None
+        """
+
+        if not pairs:
+            return
+
+        now_timestamp = int(datetime.now().timestamp())
+
+        def get_operation(user_did, app_did):
+            filter_ = {
+                COL_APPLICATION_USR_DID: user_did,
+                COL_APPLICATION_APP_DID: app_did,
+            }
+
+            update = {
+                '$set': {
+                    COL_APPLICATION_DATABASE_NAME: self.mcli.get_user_database_name(user_did, app_did),
+                    COL_APPLICATION_STATE: COL_APPLICATION_STATE_NORMAL,
+                    'modified': now_timestamp},
+                '$setOnInsert': {'created': now_timestamp}}
+
+            return UpdateOne(filter_, update, upsert=True)
+
+        col = self.mcli.get_management_collection(COL_APPLICATION)
+        col.col.bulk_write([get_operation(user_did, app_did) for user_did, app_did in pairs], ordered=False)
+
+    def get_all_apps(self) -> list:
+        """ get all relations of user did and app did: [(user_did, app_did)] """
+        col = self.mcli.get_management_collection(COL_APPLICATION)
+        docs = col.find_many({}, projection={COL_APPLICATION_USR_DID: True, COL_APPLICATION_APP_DID: True})
+        return [(d.get(COL_APPLICATION_USR_DID), d.get(COL_APPLICATION_APP_DID)) for d in docs]
+
     def remove_user(self, user_did):
         """ remove all applications of the user did """
 
@@ -84,3 +128,96 @@ class UserManager:
 
         col = self.mcli.get_management_collection(COL_APPLICATION)
         col.delete_many(filter_)
+
+        user_app_recorder.remove_user(user_did)
+
+
+class UserAppRecorder:
+    """ Record the relation of user did and app did for every authenticated request without writing mongodb.
+
+    The known relations are loaded on starting and kept in process,
+    so only the relation which is seen first time is added to the 'application' collection.
+    The new relations are coalesced and upserted in one bulk write after USER_APPS_FLUSH_WINDOW seconds,
+    the upsert is idempotent, so it is safe for the multiple workers to write the same relation.
+
+    The relations removed by other workers are still known here, so a known relation is recorded again
+    after USER_APPS_KNOWN_TTL seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # (user_did, app_did): the time known
+        self.known = {}
+        # the new relations which not write to mongodb yet
+        self.pending = set()
+        self.timer = None
+
+    def load(self):
+        """ load all known relations from mongodb """
+        pairs = UserManager().get_all_apps()
+        now = time.time()
+        with self.lock:
+            self.known.update({pair: now for pair in pairs})
+        logging.getLogger('UserAppRecorder').info(f'Loaded {len(pairs)} relations of user did and app did.')
+
+    def __is_known(self, pair, now):
+        known_time = self.known.get(pair)
+        return known_time is not None and now - known_time < hive_setting.USER_APPS_KNOWN_TTL
+
+    def record(self, user_did, app_did):
+        """ record the relation on the request, the writing is done later on other thread """
+        if not user_did or not app_did:
+            return
+
+        pair, now = (user_did, app_did), time.time()
+        if self.__is_known(pair, now):
+            return
+
+        with self.lock:
+            if self.__is_known(pair, now):
+                return
+
+            self.known[pair] = now
+            self.pending.add(pair)
+            if not self.timer:
+                self.timer = threading.Timer(hive_setting.USER_APPS_FLUSH_WINDOW, flush_user_apps_task)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def add_known(self, user_did, app_did):
+        """ the relation is already in mongodb """
+        with self.lock:
+            self.known[(user_did, app_did)] = time.time()
+
+    def remove_user(self, user_did):
+        with self.lock:
+            self.known = {p: t for p, t in self.known.items() if p[0] != user_did}
+            self.pending = set(filter(lambda p: p[0] != user_did, self.pending))
+
+    def flush(self):
+        """ write the new relations to mongodb """
+        with self.lock:
+            pending, self.pending, self.timer = self.pending, set(), None
+
+        try:
+            UserManager().add_apps_if_not_exist(list(pending))
+        except Exception as e:
+            # forget them to try again on the following requests
+            with self.lock:
+                for pair in pending:
+                    self.known.pop(pair, None)
+            raise e
+
+
+@hive_job('flush_user_apps', tag='executor')
+def flush_user_apps_task():
+    user_app_recorder.flush()
+
+
+@hive_job('load_user_apps', tag='executor')
+def load_user_apps_task():
+    user_app_recorder.load()
+
+
+user_app_recorder = UserAppRecorder()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+The change counters of the vault databases for the incremental backup.
+"""
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from src.utils.consts import COL_DATABASE_CHANGES
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils_v1.constants import DID_INFO_DB_NAME
+
+
+class DatabaseChangeCounter:
+    """ Count the writes to the user databases on the same paths which report the databases usage,
+    so the unchanged databases can be found without reading or hashing their documents.
+
+    The counter is kept by the database name, and by the user DID for the v1 writes which do not tell the database.
+    Every counter has a random epoch, so the counter which is removed and created again never matches an old fingerprint.
+    """
+
+    @staticmethod
+    def __get_collection():
+        return mongodb_pool.get_client()[DID_INFO_DB_NAME][COL_DATABASE_CHANGES]
+
+    def increase(self, key):
+        """ :param key: the name of the changed database, or the user DID whose unknown databases are changed """
+        if not key:
+            return
+
+        self.__get_collection().update_one({'_id': key},
+                                           {'$inc': {'version': 1}, '$setOnInsert': {'epoch': str(ObjectId())}},
+                                           upsert=True)
+
+    def get_fingerprint(self, *keys) -> str:
+        """ Get the fingerprint which changes with any write counted by the keys.
+
+        It must be got before reading the databases, then the writes during the reading are found by the next time.
+        """
+        items = []
+        for key in keys:
+            doc = self.__get_collection().find_one_and_update({'_id': key},
+                                                              {'$setOnInsert': {'version': 0, 'epoch': str(ObjectId())}},
+                                                              upsert=True, return_document=ReturnDocument.AFTER)
+            items.append(f'{doc["epoch"]}.{doc["version"]}')
+        return ':'.join(items)
+
+
+database_change_counter = DatabaseChangeCounter()
@@ -3,15 +3,17 @@
 """
 The entrance for database module.
 """
-import json
-from bson import json_util
-
 from flask import g
 
 from src.utils.http_request import RequestData
+from src.utils.http_response import response_json_items, response_ndjson
 from src.modules.database.mongodb_client import MongodbClient
+from src.modules.database.pagination import PageQuery
 from src.modules.subscription.vault import VaultManager
 
+# the total count of the documents for the NDJSON response
+HEADER_TOTAL_COUNT = 'X-Total-Count'
+
 
 class Database:
     def __init__(self):
@@ -73,26 +75,36 @@ class Database:
         col = self.__get_collection(collection_name)
         return {"count": col.count(filter_, **options)}
 
-    def find_document(self, collection_name, filter_, skip, limit):
+    def find_document(self, collection_name, filter_, skip, limit, after=None, is_total=False, is_ndjson=False):
         """ :v2 API: """
         self.vault_manager.get_vault(g.usr_did)
 
         # options is optional
-        options = {}
+        options = {'total': is_total}
         if skip is not None:
             options['skip'] = skip
         if limit is not None:
             options['limit'] = limit
+        if after is not None:
+            options['after'] = after
 
-        return self.__do_internal_find(collection_name, filter_, options)
+        return self.__do_internal_find(collection_name, filter_, options, is_ndjson)
 
-    def query_document(self, collection_name, filter_, options):
+    def query_document(self, collection_name, filter_, options, is_ndjson=False):
         """ :v2 API: """
         self.vault_manager.get_vault(g.usr_did)
 
-        return self.__do_internal_find(collection_name, filter_, options)
+        return self.__do_internal_find(collection_name, filter_, options, is_ndjson)
 
-    def __do_internal_find(self, collection_name, filter_, options):
+    def __do_internal_find(self, collection_name, filter_, options, is_ndjson):
+        """ the documents are encoded and sent from the cursor one by one """
         col = self.__get_collection(collection_name)
-        docs = col.find_many(filter_, **options)
-        return {"items": [c for c in json.loads(json_util.dumps(docs))]}
+
+        if not is_ndjson:
+            query = PageQuery(col, filter_, options)
+            return response_json_items(query.iterate(), query.get_fields)
+
+        # exporting all documents, the total count is in the header because it can not be in the lines
+        query = PageQuery(col, filter_, options, is_unlimited=True)
+        headers = {HEADER_TOTAL_COUNT: str(query.get_total())} if query.is_total else None
+        return response_ndjson(query.iterate(), headers=headers)
@@ -4,10 +4,13 @@ import typing
 from datetime import datetime
 
 from bson import ObjectId
-from pymongo import MongoClient
 from pymongo.errors import CollectionInvalid
 
 from src import hive_setting
+from src.modules.database.change_counter import database_change_counter
+from src.modules.database.usage import usage_accountant
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils.namespace_cache import namespace_cache
 from src.utils_v1.constants import DID_INFO_DB_NAME
 from src.utils.http_exception import CollectionNotFoundException, AlreadyExistsException, BadRequestException
 
@@ -48,13 +51,16 @@ class MongodbCollection:
 
     """
 
-    def __init__(self, col, is_management=True):
+    def __init__(self, col, is_management=True, user_did=None):
         # Collection from pymongo
         self.col = col
 
         # management means internal collection which do not support extra features
         self.is_management = is_management
 
+        # the owner of the user collection, used to account the databases usage of the vault
+        self.user_did = user_did
+
     def insert_one(self, doc, contains_extra=True, **kwargs):
         if contains_extra:
             doc['created'] = doc['modified'] = int(datetime.now().timestamp())
@@ -66,6 +72,8 @@ class MongodbCollection:
         if not result.inserted_id:
             raise BadRequestException(f'Failed to insert the doc: {str(doc)}.')
 
+        self.__record_usage([doc])
+
         return {
             "acknowledged": result.acknowledged,
             "inserted_id": str(result.inserted_id)  # ObjectId -> str
@@ -83,6 +91,8 @@ class MongodbCollection:
         if len(result.inserted_ids) < len(docs):
             raise BadRequestException(f'Failed to insert the docs: {str(docs)}.')
 
+        self.__record_usage(docs)
+
         return {
             "acknowledged": result.acknowledged,
             "inserted_ids": [str(oid) for oid in result.inserted_ids]  # ObjectId -> str
@@ -115,6 +125,8 @@ class MongodbCollection:
             result = self.col.update_one(self.convert_oid(filter_) if filter_ else None, self.convert_oid(update), **options)
         else:
             result = self.col.update_many(self.convert_oid(filter_) if filter_ else None, self.convert_oid(update), **options)
+
+        self.__record_usage(changed=result.modified_count > 0 or result.upserted_id is not None)
         return {
             "acknowledged": result.acknowledged,
             "matched_count": result.matched_count,
@@ -125,6 +137,11 @@ class MongodbCollection:
     def replace_one(self, filter_, document, upsert=True):
         # default 'bypass_document_validation': False
         result = self.col.replace_one(self.convert_oid(filter_) if filter_ else None, self.convert_oid(document), upsert=upsert)
+
+        if result.upserted_id is not None:
+            self.__record_usage([document])
+        else:
+            self.__record_usage(changed=result.modified_count > 0)
         return {
             "acknowledged": result.acknowledged,
             "matched_count": result.matched_count,
@@ -140,7 +157,18 @@ class MongodbCollection:
 
     def find_many(self, filter_: dict, only_one=False, **kwargs) -> list:
         """ Note: the result documents contain ObjectId or other types
-                which can not directly take as response body. """
+                which can not directly take as response body.
+
+        All documents are got out, please use 'limit', PageQuery or find_cursor() for the large results. """
+
+        if only_one:
+            result = self.col.find_one(self.convert_oid(filter_) if filter_ else None, **kwargs)
+            return [] if result is None else [result]
+
+        return list(self.find_cursor(filter_, **kwargs))
+
+    def find_cursor(self, filter_: dict, **kwargs):
+        """ Same as find_many(), but return the cursor to iterate the documents one batch by one batch. """
 
         # kwargs are the options
         options = {k: v for k, v in kwargs.items() if k in ("projection",
@@ -158,18 +186,20 @@ class MongodbCollection:
                 # value example: {'author', -1} => [('author', -1)]
                 options['sort'] = [(k, v) for k, v in options['sort'].items()]
 
-        # BUGBUG: Getting all documents out maybe not well.
-        if only_one:
-            result = self.col.find_one(self.convert_oid(filter_) if filter_ else None, **kwargs)
-            return [] if result is None else [result]
-
-        return list(self.col.find(self.convert_oid(filter_) if filter_ else None, **options))
+        return self.col.find(self.convert_oid(filter_) if filter_ else None, **options)
 
     def count(self, filter_, **kwargs):
         options = {k: v for k, v in kwargs.items() if k in ("skip", "limit", "maxTimeMS")}
 
         return self.col.count_documents(self.convert_oid(filter_) if filter_ else {}, **options)
 
+    def exists(self, filter_, skip=0, maxTimeMS=None) -> bool:
+        """ Same as 'count(filter_, skip=skip) > 0', but only probe the first matched document with '_id'. """
+        options = {'skip': skip} if skip else {}
+        if maxTimeMS:
+            options['max_time_ms'] = maxTimeMS
+        return self.col.find_one(self.convert_oid(filter_) if filter_ else {}, projection={'_id': True}, **options) is not None
+
     def delete_one(self, filter_):
         return self.delete_many(filter_, only_one=True)
 
@@ -178,6 +208,8 @@ class MongodbCollection:
             result = self.col.delete_one(self.convert_oid(filter_) if filter_ else None)
         else:
             result = self.col.delete_many(self.convert_oid(filter_) if filter_ else None)
+
+        self.__record_usage(changed=result.deleted_count > 0)
         return {
             "acknowledged": result.acknowledged,
             "deleted_count": result.deleted_count
@@ -186,6 +218,22 @@ class MongodbCollection:
     def distinct(self, field: str) -> list:
         return self.col.distinct(field)
 
+    def __record_usage(self, inserted_docs=None, changed=True):
+        """ Report the size changes of the user collection, and count the change of its database.
+
+        Only the size of the inserted documents can be estimated,
+        the user with other changes is reconciled with the real size on the next flush.
+        The writes which changed nothing are not reported.
+        """
+        if self.is_management or not changed:
+            return
+
+        database_change_counter.increase(self.col.database.name)
+        if inserted_docs:
+            usage_accountant.record(self.user_did, usage_accountant.estimate_size(inserted_docs))
+        else:
+            usage_accountant.mark_dirty(self.user_did)
+
     def convert_oid(self, value: _T):
         """ try to convert the following dict recursively.
 
@@ -220,14 +268,9 @@ class MongodbClient:
     This class is used to replace class `src.utils.db_client.DatabaseClient`.
     """
 
-    def __init__(self):
-        self.mongodb_uri = hive_setting.MONGODB_URI
-        self.connection = None
-
     def __get_connection(self):
-        if not self.connection:
-            self.connection = MongoClient(self.mongodb_uri)
-        return self.connection
+        """ all instances share the connection pool """
+        return mongodb_pool.get_client()
 
     def __get_database(self, name):
         """ All databases (manager or user) must exist before call this method.
@@ -239,7 +282,7 @@ class MongodbClient:
         return self.__get_connection()[name]
 
     def exists_database(self, name):
-        return name in self.__get_connection().list_database_names()
+        return namespace_cache.exists_database(name)
 
     def exists_user_database(self, user_did, app_did):
         return self.exists_database(MongodbClient.get_user_database_name(user_did, app_did))
@@ -249,7 +292,7 @@ class MongodbClient:
         if not self.exists_database(database_name):
             return False
 
-        return col_name not in self.__get_database(database_name).list_collection_names()
+        return namespace_cache.exists_collection(database_name, col_name)
 
     @staticmethod
     def get_user_database_name(user_did, app_did):
@@ -270,44 +313,100 @@ class MongodbClient:
         database = self.__get_database(DID_INFO_DB_NAME)
 
         # Directly create manager collection if not exists.
-        if col_name not in database.list_collection_names():
-            database.create_collection(col_name)
+        if not namespace_cache.exists_collection(DID_INFO_DB_NAME, col_name):
+            self.__create_collection(database, col_name)
         return MongodbCollection(database[col_name])
 
+    @staticmethod
+    def __create_collection(database, col_name):
+        """ create the collection which is checked not exist, it may be created by others at the same time. """
+        try:
+            database.create_collection(col_name)
+        except CollectionInvalid as e:
+            pass
+        namespace_cache.add_collection(database.name, col_name)
+
     def get_user_collection(self, user_did: str, app_did: str, col_name, create_on_absence=False) -> MongodbCollection:
         """ User collection belongs to user database and maybe need check the existence.
 
         :raise: CollectionNotFoundException
         """
         database = self.__get_database(MongodbClient.get_user_database_name(user_did, app_did))
-        if col_name not in database.list_collection_names():
+        if not namespace_cache.exists_collection(database.name, col_name):
             if create_on_absence:
-                database.create_collection(col_name)
+                self.__create_collection(database, col_name)
             else:
                 raise CollectionNotFoundException(f'Can not find collection {col_name}')
-        return MongodbCollection(database[col_name], is_management=False)
+        return MongodbCollection(database[col_name], is_management=False, user_did=user_did)
 
     def create_user_collection(self, user_did, app_did, col_name) -> MongodbCollection:
         database_name = MongodbClient.get_user_database_name(user_did, app_did)
         database = self.__get_database(database_name)
         try:
-            return MongodbCollection(database.create_collection(col_name), is_management=False)
+            col = MongodbCollection(database.create_collection(col_name), is_management=False, user_did=user_did)
+            namespace_cache.add_collection(database_name, col_name)
+            database_change_counter.increase(database_name)
+            usage_accountant.mark_dirty(user_did)
+            return col
         except CollectionInvalid as e:
             logging.info(f'The collection {database_name}.{col_name} already exists.')
             raise AlreadyExistsException()
 
     def delete_user_collection(self, user_did, app_did, col_name, check_exist=False):
         database = self.__get_database(MongodbClient.get_user_database_name(user_did, app_did))
-        if col_name not in database.list_collection_names():
+        if not namespace_cache.exists_collection(database.name, col_name):
             if check_exist:
                 raise CollectionNotFoundException(f"Can not found user's collection {col_name}")
         else:
             database.drop_collection(col_name)
+            namespace_cache.remove_collection(database.name, col_name)
+            database_change_counter.increase(database.name)
+            usage_accountant.mark_dirty(user_did)
 
     def drop_user_database(self, user_did, app_did):
         name = MongodbClient.get_user_database_name(user_did, app_did)
         if self.exists_database(name):
             self.__get_connection().drop_database(name)
+            namespace_cache.remove_database(name)
+            database_change_counter.increase(name)
+            usage_accountant.mark_dirty(user_did)
+
+    @staticmethod
+    def get_staging_database_name(name):
+        """ The temporary database to restore the user database, the suffix keeps it in the length limit of Atlas. """
+        return name + '_rs'
+
+    def drop_database(self, name):
+        if self.exists_database(name):
+            self.__get_connection().drop_database(name)
+            namespace_cache.remove_database(name)
+
+    def replace_database_collections(self, from_name, to_name):
+        """ Move the collections of the database 'from_name' to 'to_name', the existing ones with the same names
+        are replaced, then 'from_name' is dropped. Same as 'mongorestore --drop', the other collections are kept.
+        """
+        if not self.exists_database(from_name):
+            return
+
+        connection = self.__get_connection()
+        for col_name in connection[from_name].list_collection_names():
+            connection.admin.command('renameCollection', f'{from_name}.{col_name}', to=f'{to_name}.{col_name}', dropTarget=True)
+            namespace_cache.add_collection(to_name, col_name)
+        database_change_counter.increase(to_name)
+        self.drop_database(from_name)
+
+    def get_database_fingerprint(self, user_did, name) -> typing.Optional[str]:
+        """ Get the fingerprint of the user database which changes with any write to it.
+
+        It is made by the change counters of the database and the user (for v1 writes), see DatabaseChangeCounter,
+        so the documents are neither read nor hashed.
+
+        :return: None if the database does not exist.
+        """
+        if not self.exists_database(name):
+            return None
+
+        return database_change_counter.get_fingerprint(name, user_did)
 
     def get_user_database_size(self, user_did, app_did) -> int:
         """ Get the size of the user database, if not exist, return 0 """
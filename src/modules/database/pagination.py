@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+
+"""
+The pagination of the documents finding.
+"""
+import base64
+import binascii
+import datetime
+import json
+import re
+import typing
+
+from bson import json_util, ObjectId, Int64, Decimal128, Binary, Timestamp, Regex, MinKey, MaxKey
+
+from src.settings import hive_setting
+from src.utils.http_exception import InvalidParameterException
+
+# the types in the sort order of mongodb, the types of the same bracket are compared by the value
+_SORT_TYPES = ['minKey', 'null', 'number', 'string', 'object', 'array', 'binData', 'objectId', 'bool', 'date', 'timestamp', 'regex', 'maxKey']
+
+
+class PageQuery:
+    """ Find one page of the documents, the next page starts after the last document instead of skipping.
+
+    The documents are sorted by the sort keys of the options and then '_id', so the sort values of the last document
+    of the page can be the start point of the next page (keyset pagination).
+    Mongodb can only avoid sorting all matched documents in memory with the index on the sort keys and '_id',
+    so the large collection sorted by 'author' needs the compound index {author: 1, _id: 1}, the index {author: 1}
+    is not enough. The '_id' is not added when all documents are iterated without 'limit' and 'after'.
+    The opaque token 'next' is returned when the page is full, and it can be set as the option 'after'
+    to find the next page with the same filter and sort. The documents after the token follow the sort order
+    of mongodb across the types, so the missing or null sort values and the values of different types are
+    not skipped. The sort keys with the array values are not supported.
+
+    The page size is limited by DATABASE_MAX_PAGE_SIZE. The total count of the documents needs another query,
+    so it's only returned when the option 'total' is True.
+
+    The options::
+
+        {
+            "after": <str>,  # the token 'next' of the previous page
+            "total": <bool>,  # return the total count of the documents matched the filter
+            ...  # the options of MongodbCollection.find_many()
+        }
+
+    The result::
+
+        {
+            "items": [<doc>],  # the documents from mongodb
+            "next": <str>,  # only exists when there may be more documents
+            "total": <int>  # only exists when the option 'total' is True
+        }
+
+    The documents can also be iterated from the cursor one by one by 'iterate()' to encode and send them
+    incrementally, then the fields 'next' and 'total' are got by 'get_fields()'.
+    """
+
+    def __init__(self, col, filter_: dict, options: dict, is_unlimited=False):
+        """
+        :param col: MongodbCollection
+        :param is_unlimited: not limit the page size, only for iterating the documents one by one.
+        """
+        options = dict(options) if options else {}
+
+        self.col = col
+        self.filter = filter_ if filter_ else {}
+        self.after = options.pop('after', None)
+        self.is_total = options.pop('total', False)
+        if self.after is not None and not isinstance(self.after, str):
+            raise InvalidParameterException('The option "after" MUST be the token string.')
+        if not isinstance(self.is_total, bool):
+            raise InvalidParameterException('The option "total" MUST be bool.')
+
+        self.limit = PageQuery.__get_limit(options.pop('limit', None), is_unlimited)
+        self.is_paging = self.after is not None or self.limit > 0
+        self.sort = PageQuery.__get_sort(options.pop('sort', None), self.is_paging)
+        self.projection, self.extra_fields = PageQuery.__get_projection(options.pop('projection', None),
+                                                                        self.sort if self.is_paging else [])
+        self.options = options
+
+        # set after iterating the documents
+        self.count = None
+        self.next = None
+
+    def execute(self) -> dict:
+        """ get all documents of the page """
+        result = {'items': list(self.iterate())}
+        result.update(self.get_fields())
+        return result
+
+    def iterate(self) -> typing.Iterator[dict]:
+        """ iterate the documents of the page from the cursor, the fields are got by get_fields() after that """
+        filter_ = self.filter if not self.after else {'$and': [self.filter, self.__get_after_filter()]}
+        cursor = self.col.find_cursor(filter_, sort=self.sort or None, limit=self.limit, projection=self.projection, **self.options)
+
+        count = 0
+        for doc in cursor:
+            count += 1
+            if count == self.limit:
+                self.next = self.__encode_token(doc)
+
+            for field in self.extra_fields:
+                PageQuery.__remove_field(doc, field)
+            yield doc
+        self.count = count
+
+    def get_fields(self) -> dict:
+        """ the fields 'next' and 'total' of the result """
+        fields = {}
+        if self.next:
+            fields['next'] = self.next
+        if self.is_total:
+            fields['total'] = self.get_total()
+        return fields
+
+    def get_total(self) -> int:
+        """ the total count of the documents which match the filter """
+        if self.count is not None and not self.after and not self.options.get('skip') \
+                and (not self.limit or self.count < self.limit):
+            # all documents are in the first page
+            return self.count
+        return self.col.count(self.filter)
+
+    @staticmethod
+    def __get_sort(sort, is_paging) -> list:
+        """ :return: [(key, direction)], ends with '_id' when paging """
+        if not sort:
+            sort = []
+        elif isinstance(sort, dict):
+            sort = list(sort.items())
+
+        try:
+            sort = [(k, v) for k, v in sort]
+        except (TypeError, ValueError):
+            raise InvalidParameterException(f'Invalid sort option: {sort}')
+
+        for k, v in sort:
+            if not isinstance(k, str) or v not in (1, -1):
+                raise InvalidParameterException(f'Invalid sort option: {sort}')
+
+        keys = [k for k, _ in sort]
+        if not is_paging:
+            return sort
+        elif '_id' not in keys:
+            sort.append(('_id', sort[-1][1] if sort else 1))
+        else:
+            # the keys after '_id' are useless because '_id' is unique
+            sort = sort[:keys.index('_id') + 1]
+        return sort
+
+    @staticmethod
+    def __get_limit(limit, is_unlimited) -> int:
+        """ :return: 0 means no limit """
+        if limit is not None and not isinstance(limit, int):
+            raise InvalidParameterException('The option "limit" MUST be integer.')
+
+        limit = limit if limit and limit > 0 else 0
+        if is_unlimited:
+            return limit
+
+        max_size = hive_setting.DATABASE_MAX_PAGE_SIZE
+        return min(limit, max_size) if limit else max_size
+
+    @staticmethod
+    def __get_projection(projection, sort) -> (dict, list):
+        """ The sort values of the last document are required by the token.
+
+        :return: the projection which contains the sort keys, the extra fields to be removed from the documents
+        """
+        if not projection:
+            return projection, []
+
+        if isinstance(projection, (list, tuple)):
+            projection = {k: True for k in projection}
+        projection, extra_fields = dict(projection), []
+        is_including = any(v for k, v in projection.items() if k != '_id')
+
+        def is_under(key, field):
+            return key == field or key.startswith(field + '.')
+
+        for key, _ in sort:
+            if key == '_id' or not is_including:
+                # the excluded field which contains the sort key
+                for field in [f for f, v in projection.items() if not v and is_under(key, f)]:
+                    del projection[field]
+                    extra_fields.append(field)
+            elif not any(v and is_under(key, f) for f, v in projection.items()):
+                if any(v and is_under(f, key) for f, v in projection.items()):
+                    raise InvalidParameterException(f'The projection conflicts with the sort key "{key}".')
+                projection[key] = True
+                extra_fields.append(key)
+
+        return projection, extra_fields
+
+    @staticmethod
+    def __get_value(doc, key):
+        value = doc
+        for part in key.split('.'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    @staticmethod
+    def __remove_field(doc, field):
+        """ remove the field and the parent documents which become empty """
+        parts = field.split('.')
+        parents = [doc]
+        for part in parts[:-1]:
+            value = parents[-1].get(part)
+            if not isinstance(value, dict):
+                return
+            parents.append(value)
+
+        parents[-1].pop(parts[-1], None)
+        for i in range(len(parents) - 1, 0, -1):
+            if parents[i]:
+                break
+            del parents[i - 1][parts[i - 1]]
+
+    def __encode_token(self, doc) -> str:
+        token = {
+            'sort': [[k, v] for k, v in self.sort],
+            'values': [PageQuery.__get_value(doc, k) for k, _ in self.sort],
+        }
+        return base64.urlsafe_b64encode(json_util.dumps(token).encode()).decode()
+
+    def __decode_token(self) -> list:
+        try:
+            token = json_util.loads(base64.urlsafe_b64decode(self.after.encode()).decode())
+            sort, values = token['sort'], token['values']
+        except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+            raise InvalidParameterException('Invalid token of the option "after".')
+
+        if [tuple(s) for s in sort] != self.sort or len(values) != len(self.sort):
+            raise InvalidParameterException('The token of the option "after" does not match the sort.')
+        return values
+
+    def __get_after_filter(self) -> dict:
+        """ the documents after the last one: (k1 > v1) or (k1 == v1 and k2 > v2) or ... """
+        values, conditions = self.__decode_token(), []
+        for i, (key, direction) in enumerate(self.sort):
+            condition = {self.sort[j][0]: {'$eq': values[j]} for j in range(i)}
+            after = PageQuery.__get_after_conditions(key, values[i], direction)
+            condition.update(after[0] if len(after) == 1 else {'$or': after})
+            conditions.append(condition)
+        return {'$or': conditions}
+
+    @staticmethod
+    def __get_after_conditions(key, value, direction) -> list:
+        """ The conditions of the values after 'value' in the sort order of mongodb.
+
+        The comparison operators only match the values of the same type, so the values of the types after
+        (or before for the descending sort) are matched by '$type'. The missing values are same as null.
+        """
+        index = PageQuery.__get_type_index(value)
+        if index is None:
+            return [{key: {'$gt' if direction == 1 else '$lt': value}}]
+
+        conditions = [] if value is None else [{key: {'$gt' if direction == 1 else '$lt': value}}]
+        types = _SORT_TYPES[index + 1:] if direction == 1 else _SORT_TYPES[:index]
+        if types:
+            conditions.append({key: {'$type': [t for t in types if t != 'null']}})
+            if 'null' in types:
+                conditions.append({key: None})
+        return conditions
+
+    @staticmethod
+    def __get_type_index(value) -> typing.Optional[int]:
+        """ the index of the value type in _SORT_TYPES, None if unknown """
+        if value is None:
+            type_ = 'null'
+        elif isinstance(value, MinKey):
+            type_ = 'minKey'
+        elif isinstance(value, MaxKey):
+            type_ = 'maxKey'
+        elif isinstance(value, bool):
+            type_ = 'bool'
+        elif isinstance(value, (int, float, Int64, Decimal128)):
+            type_ = 'number'
+        elif isinstance(value, str):
+            type_ = 'string'
+        elif isinstance(value, dict):
+            type_ = 'object'
+        elif isinstance(value, (bytes, Binary)):
+            type_ = 'binData'
+        elif isinstance(value, ObjectId):
+            type_ = 'objectId'
+        elif isinstance(value, datetime.datetime):
+            type_ = 'date'
+        elif isinstance(value, Timestamp):
+            type_ = 'timestamp'
+        elif isinstance(value, (Regex, re.Pattern)):
+            type_ = 'regex'
+        else:
+            return None
+        return _SORT_TYPES.index(type_)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+The accounting of the databases usage of the vaults.
+"""
+import logging
+import threading
+
+import bson
+
+from src import hive_setting
+from src.utils import hive_job
+
+
+class DatabaseUsageAccountant:
+    """ Keep the databases usage of the vaults up to date without running 'dbstats' on every request.
+
+    Every insert on the user collections reports an estimated size change here.
+    The changes are coalesced per user and applied to the vault in one update after a short window.
+    The size changes of the updates, replacements and deletions can not be estimated without reading the documents,
+    so these users are reconciled with the real size ('dbstats') on the same flush instead.
+    The users who have inserted are marked as dirty and reconciled with the real size periodically.
+
+    The estimation is not accurate (compression, indexes, deletions), so the difference between
+    the running total and the real size on reconciling is recorded as the drift.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # user_did: increased size which not applied to the vault yet
+        self.pending = {}
+        # users which need reconcile with the real databases size periodically
+        self.dirty = set()
+        # users which need reconcile with the real databases size on the next flush
+        self.stale = set()
+        self.timer = None
+
+        self.metrics = {
+            'recorded': 0,
+            'flushed': 0,
+            'reconciled': 0,
+            'last_drift': 0,
+            'max_drift': 0,
+            'total_drift': 0,
+        }
+
+    @staticmethod
+    def estimate_size(docs) -> int:
+        """ the estimated size of the documents which will be inserted """
+        try:
+            return sum(map(lambda d: len(bson.encode(d)), docs))
+        except Exception as e:
+            return 0
+
+    def record(self, user_did, size: int):
+        """ record the increased (or decreased) size of the user's databases """
+        if not user_did:
+            return
+
+        with self.lock:
+            self.dirty.add(user_did)
+            self.metrics['recorded'] += 1
+            if size == 0:
+                return
+
+            self.pending[user_did] = self.pending.get(user_did, 0) + size
+            self.__start_timer()
+
+    def mark_dirty(self, user_did):
+        """ the size change of the write can not be estimated, reconcile the user on the next flush """
+        if not user_did:
+            return
+
+        with self.lock:
+            self.stale.add(user_did)
+            self.metrics['recorded'] += 1
+            self.__start_timer()
+
+    def __start_timer(self):
+        if not self.timer:
+            self.timer = threading.Timer(hive_setting.DATABASE_USAGE_FLUSH_WINDOW, flush_databases_usage_task)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """ apply the coalesced size changes to the vaults, and reconcile the stale users """
+        from src.modules.subscription.vault import VaultManager
+
+        with self.lock:
+            pending, self.pending, self.timer = self.pending, {}, None
+            stale, self.stale = self.stale, set()
+
+        vault_manager = VaultManager()
+        for user_did, size in pending.items():
+            # the real size of the stale users contains the pending changes
+            if user_did not in stale:
+                vault_manager.update_user_databases_size(user_did, size)
+
+        for user_did in stale:
+            self.__reconcile_user(vault_manager, user_did)
+
+        with self.lock:
+            self.metrics['flushed'] += len(pending) + len(stale)
+
+    def reconcile(self):
+        """ reset the databases usage of the dirty users by the real size and record the drift """
+        from src.modules.subscription.vault import VaultManager
+
+        self.flush()
+
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+
+        vault_manager = VaultManager()
+        for user_did in dirty:
+            self.__reconcile_user(vault_manager, user_did)
+
+        logging.getLogger('DatabaseUsageAccountant').info(f'Reconciled {len(dirty)} vaults, metrics: {self.get_metrics()}')
+
+    def __reconcile_user(self, vault_manager, user_did):
+        """ reset the databases usage of the user by the real size and record the drift """
+        from src.utils.http_exception import VaultNotFoundException
+
+        try:
+            running_size = vault_manager.get_vault(user_did).get_database_usage()
+        except VaultNotFoundException as e:
+            return
+
+        real_size = vault_manager.recalculate_user_databases_size(user_did)
+
+        drift = abs(running_size - real_size)
+        with self.lock:
+            self.metrics['reconciled'] += 1
+            self.metrics['last_drift'] = drift
+            self.metrics['max_drift'] = max(self.metrics['max_drift'], drift)
+            self.metrics['total_drift'] += drift
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['pending_users'] = len(self.pending)
+            metrics['dirty_users'] = len(self.dirty)
+            metrics['stale_users'] = len(self.stale)
+
+        # the average difference in bytes between the running total and the real size
+        metrics['mean_drift'] = int(metrics['total_drift'] / metrics['reconciled']) if metrics['reconciled'] else 0
+        return metrics
+
+
+@hive_job('flush_databases_usage', tag='executor')
+def flush_databases_usage_task():
+    usage_accountant.flush()
+
+
+usage_accountant = DatabaseUsageAccountant()
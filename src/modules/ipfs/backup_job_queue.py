@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+The queue of the backup jobs (the executors of backup, restore and backup server).
+"""
+import logging
+import threading
+import time
+import uuid
+
+from src import hive_setting
+from src.modules.database.mongodb_client import MongodbClient
+from src.utils.consts import COL_IPFS_BACKUP_JOBS, USR_DID
+
+# the fields of the persistent job
+JOB_ACTION = 'action'
+JOB_PRIORITY = 'priority'
+JOB_STATE = 'state'
+JOB_STATE_QUEUED = 'queued'
+JOB_STATE_RUNNING = 'running'
+# the id of the latest submission of the same action of the user
+JOB_ID = 'job_id'
+
+# the seconds to wait before running the first recovered job when rebooted, and the interval of the others
+RECOVERY_DELAY = 30
+RECOVERY_INTERVAL = 10
+
+
+class BackupJobQueue:
+    """ Run the backup jobs by the bounded workers instead of one thread per request.
+
+    - At most BACKUP_MAX_JOBS jobs run at the same time, and one user only has one running job (fair share).
+    - The job with the higher priority (smaller number) runs first, then the older one.
+    - The same action of the same user is only queued once, the newer executor replaces the queued one.
+    - The jobs are also kept in the collection COL_IPFS_BACKUP_JOBS, so the queued ones can be recovered when rebooted.
+      The finished job only removes the row of its own submission, the row of the job submitted again is kept.
+
+    The jobs of the vault node and the backup node use different queues, because the backup job waits for
+    the backup server job which maybe runs on the same hive node.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.condition = threading.Condition()
+        self.workers = []
+
+        # (user_did, action): {executor, priority, ready_time, queued_time}
+        self.queued = {}
+        # users who have the running job
+        self.running_users = set()
+        # the count of the recovered jobs when rebooted
+        self.recovered = 0
+
+        self.metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'total_wait': 0,
+            'max_wait': 0,
+            'total_duration': 0,
+            'max_duration': 0,
+        }
+
+    def submit(self, executor, delay=0):
+        """ queue the executor (ExecutorBase) to run after the delay seconds """
+        key, now, job_id = (executor.user_did, executor.action), time.time(), uuid.uuid4().hex
+        with self.condition:
+            # saved in the same order as queued, so the row always belongs to the queued job
+            self.__save_job(executor.user_did, executor.action, executor.PRIORITY, job_id)
+            job = self.queued.get(key)
+            self.queued[key] = {
+                'executor': executor,
+                'job_id': job_id,
+                'priority': executor.PRIORITY,
+                'ready_time': now + delay,
+                'queued_time': job['queued_time'] if job else now,
+            }
+            self.metrics['submitted'] += 1
+            self.__start_workers()
+            self.condition.notify_all()
+
+        logging.info(f'[BackupJobQueue] The job {key} is queued, depth: {len(self.queued)}')
+
+    def recover(self, executor):
+        """ queue the executor of the unfinished job when rebooted, the recovered jobs start one by one with the interval """
+        with self.condition:
+            delay = RECOVERY_DELAY + self.recovered * RECOVERY_INTERVAL
+            self.recovered += 1
+        self.submit(executor, delay=delay)
+
+    @staticmethod
+    def get_persistent_jobs(actions: list) -> list:
+        """ the jobs which have not finished before rebooting: [{user_did, action, priority, state}] """
+        col = MongodbClient().get_management_collection(COL_IPFS_BACKUP_JOBS)
+        return col.find_many({JOB_ACTION: {'$in': actions}})
+
+    @staticmethod
+    def forget(user_did, action, job_id=None):
+        """ remove the persistent job, only the one of the submission 'job_id' if specified """
+        try:
+            col = MongodbClient().get_management_collection(COL_IPFS_BACKUP_JOBS)
+            filter_ = {USR_DID: user_did, JOB_ACTION: action}
+            if job_id:
+                filter_[JOB_ID] = job_id
+            col.delete_one(filter_)
+        except Exception as e:
+            logging.error(f'[BackupJobQueue] Failed to remove the job ({user_did}, {action}): {str(e)}')
+
+    def get_metrics(self):
+        with self.condition:
+            metrics = dict(self.metrics)
+            metrics['queued'] = len(self.queued)
+            metrics['running'] = len(self.running_users)
+            metrics['max_jobs'] = hive_setting.BACKUP_MAX_JOBS
+
+        completed = metrics['completed']
+        metrics['mean_wait'] = round(metrics['total_wait'] / completed, 3) if completed else 0
+        metrics['mean_duration'] = round(metrics['total_duration'] / completed, 3) if completed else 0
+        return metrics
+
+    def __start_workers(self):
+        """ start the workers lazily, the condition MUST be held """
+        while len(self.workers) < max(1, hive_setting.BACKUP_MAX_JOBS):
+            worker = threading.Thread(target=self.__work, name=f'{self.name}-job-{len(self.workers)}', daemon=True)
+            self.workers.append(worker)
+            worker.start()
+
+    def __take_job(self):
+        """ wait and take the job which can run now """
+        with self.condition:
+            while True:
+                now, next_ready = time.time(), None
+                candidates = []
+                for key, job in self.queued.items():
+                    if key[0] in self.running_users:
+                        continue
+                    if job['ready_time'] > now:
+                        next_ready = min(next_ready or job['ready_time'], job['ready_time'])
+                        continue
+                    candidates.append((job['priority'], job['queued_time'], key))
+
+                if candidates:
+                    _, _, key = min(candidates)
+                    job = self.queued.pop(key)
+                    self.running_users.add(key[0])
+                    return job
+
+                self.condition.wait(next_ready - now if next_ready else None)
+
+    def __work(self):
+        while True:
+            job = self.__take_job()
+            executor, start = job['executor'], time.time()
+            try:
+                self.__set_job_running(executor.user_did, executor.action, job['job_id'])
+                executor.run()
+            except Exception as e:
+                logging.error(f'[BackupJobQueue] Unexpected error of the job ({executor.user_did}, {executor.action}): {str(e)}')
+            finally:
+                duration, wait = time.time() - start, start - job['queued_time']
+                with self.condition:
+                    self.running_users.discard(executor.user_did)
+                    self.metrics['completed'] += 1
+                    self.metrics['total_wait'] += wait
+                    self.metrics['max_wait'] = max(self.metrics['max_wait'], wait)
+                    self.metrics['total_duration'] += duration
+                    self.metrics['max_duration'] = max(self.metrics['max_duration'], duration)
+                    self.condition.notify_all()
+
+                self.forget(executor.user_did, executor.action, job['job_id'])
+
+    @staticmethod
+    def __save_job(user_did, action, priority, job_id):
+        """ save the queued job, the newer submission replaces the row of the older one """
+        try:
+            col = MongodbClient().get_management_collection(COL_IPFS_BACKUP_JOBS)
+            update = {'$set': {JOB_PRIORITY: priority, JOB_STATE: JOB_STATE_QUEUED, JOB_ID: job_id}}
+            col.update_one({USR_DID: user_did, JOB_ACTION: action}, update, upsert=True)
+        except Exception as e:
+            logging.error(f'[BackupJobQueue] Failed to save the job ({user_did}, {action}): {str(e)}')
+
+    @staticmethod
+    def __set_job_running(user_did, action, job_id):
+        """ the row replaced by the job submitted again is not changed """
+        try:
+            col = MongodbClient().get_management_collection(COL_IPFS_BACKUP_JOBS)
+            col.update_one({USR_DID: user_did, JOB_ACTION: action, JOB_ID: job_id}, {'$set': {JOB_STATE: JOB_STATE_RUNNING}})
+        except Exception as e:
+            logging.error(f'[BackupJobQueue] Failed to update the job ({user_did}, {action}): {str(e)}')
+
+
+# the jobs of backup and restore on the vault node
+backup_job_queue = BackupJobQueue('backup')
+# the jobs of the backup server on the backup node
+backup_server_job_queue = BackupJobQueue('backup_server')
@@ -1,5 +1,6 @@
 import typing
 
+from src.settings import hive_setting
 from src.utils.consts import URL_V2, URL_SERVER_INTERNAL_STATE
 from src.utils.http_client import HttpClient
 from src.utils.http_exception import BadRequestException
@@ -25,9 +26,18 @@ class BackupServerClient:
 
         return self.token
 
-    def get_state(self):
+    def get_state(self, wait=0, result=None, message=None):
+        """ Get the state of the backup server.
+
+        :param wait: the seconds to wait on the backup server until the state changes from (result, message),
+            the old backup server ignores it and returns directly.
+        """
         try:
-            body = self.http.get(self.target_host + URL_V2 + URL_SERVER_INTERNAL_STATE, self.get_token())
+            kwargs = dict()
+            if wait > 0 and result is not None:
+                kwargs['params'] = {'wait': wait, 'result': result, 'message': message}
+                kwargs['timeout'] = wait + hive_setting.HTTP_READ_TIMEOUT
+            body = self.http.get(self.target_host + URL_V2 + URL_SERVER_INTERNAL_STATE, self.get_token(), **kwargs)
             # action (None or 'backup'), state, message
             return body['state'], body['result'], body['message']
         except Exception as e:
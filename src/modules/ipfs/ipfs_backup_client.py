@@ -10,6 +10,8 @@ The definition of the request metadata:
         "sha256":
         "cid":
         "size":
+        "gzip": the dump archive is compressed, false or missing for the old backups
+        "fingerprint": the fingerprint of the database when dumped, for the incremental backup
     }],
     "files": [{
         "sha256":
@@ -23,25 +25,29 @@ The definition of the request metadata:
     "create_time":
 }
 """
+import contextlib
 import logging
+import threading
 import typing as t
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from flask import g
 
+from src.settings import hive_setting
 from src.utils.consts import BACKUP_TARGET_TYPE, BACKUP_TARGET_TYPE_HIVE_NODE, BACKUP_REQUEST_ACTION, \
     BACKUP_REQUEST_ACTION_BACKUP, BACKUP_REQUEST_ACTION_RESTORE, BACKUP_REQUEST_STATE, BACKUP_REQUEST_STATE_PROCESS, \
     BACKUP_REQUEST_STATE_MSG, BACKUP_REQUEST_TARGET_HOST, BACKUP_REQUEST_TARGET_DID, BACKUP_REQUEST_TARGET_TOKEN, \
     BACKUP_REQUEST_STATE_STOP, BACKUP_REQUEST_STATE_SUCCESS, \
     URL_SERVER_INTERNAL_BACKUP, URL_SERVER_INTERNAL_RESTORE, \
-    COL_IPFS_BACKUP_CLIENT, USR_DID, URL_V2
-from src.utils_v1.common import gene_temp_file_name
-from src.utils_v1.did_mongo_db_resource import dump_mongodb_to_full_path, restore_mongodb_from_full_path
+    COL_IPFS_BACKUP_CLIENT, USR_DID, URL_V2, BACKUP_REQUEST_LAST_MANIFEST
+from src.utils_v1.did_mongo_db_resource import dump_mongodb_to_stream, restore_mongodb_from_stream
 from src.utils.http_exception import BadRequestException, InsufficientStorageException
 from src.utils.http_client import HttpClient
 from src.utils.file_manager import fm
 from src.modules.auth.auth import Auth
 from src.modules.auth.user import UserManager
 from src.modules.database.mongodb_client import MongodbClient
+from src.modules.ipfs.backup_job_queue import backup_job_queue, JOB_ACTION
 from src.modules.ipfs.backup_server_client import BackupServerClient
 from src.modules.ipfs.ipfs_backup_executor import BackupExecutor, RestoreExecutor
 from src.modules.subscription.vault import VaultManager
@@ -92,7 +98,7 @@ class IpfsBackupClient:
         credential_info = self.auth.get_backup_credential_info(g.usr_did, credential)
         client = self.__validate_remote_state(credential_info['targetHost'], credential, is_force, is_restore=False)
         req = self.__save_request_doc(g.usr_did, credential_info, client.get_token(), is_restore=False)
-        BackupExecutor(g.usr_did, self, req, is_force=is_force).start()
+        backup_job_queue.submit(BackupExecutor(g.usr_did, self, req, is_force=is_force))
 
     def restore(self, credential, is_force):
         """
@@ -111,7 +117,7 @@ class IpfsBackupClient:
         credential_info = self.auth.get_backup_credential_info(g.usr_did, credential)
         client = self.__validate_remote_state(credential_info['targetHost'], credential, is_force, is_restore=True)
         self.__save_request_doc(g.usr_did, credential_info, client.get_token(), is_restore=True)
-        RestoreExecutor(g.usr_did, self).start()
+        backup_job_queue.submit(RestoreExecutor(g.usr_did, self))
 
     def __validate_remote_state(self, target_host, credential, is_force, is_restore):
         """ also do connectivity check """
@@ -167,34 +173,65 @@ class IpfsBackupClient:
 
         self.mcli.get_management_collection(COL_IPFS_BACKUP_CLIENT).update_one(filter_, update)
 
-    def dump_database_data_to_backup_cids(self, user_did, process_callback=t.Optional[t.Callable[[int, int], None]]):
+    def get_last_backup_databases(self, req) -> dict:
+        """ Get the databases of the last successful backup to the same backup node: {name: database metadata}. """
+        manifest = req.get(BACKUP_REQUEST_LAST_MANIFEST)
+        if not hive_setting.BACKUP_IS_INCREMENTAL or not manifest \
+                or manifest.get('target_did') != req.get(BACKUP_REQUEST_TARGET_DID):
+            return dict()
+        return {d['name']: d for d in manifest.get('databases') or [] if d.get('fingerprint')}
+
+    def update_last_manifest(self, user_did, manifest: t.Optional[dict]):
+        """ Record the last successful backup, None means the next backup will be the full one. """
+        filter_ = {USR_DID: user_did,
+                   BACKUP_TARGET_TYPE: BACKUP_TARGET_TYPE_HIVE_NODE}
+        update = {'$set': {BACKUP_REQUEST_LAST_MANIFEST: manifest}}
+        self.mcli.get_management_collection(COL_IPFS_BACKUP_CLIENT).update_one(filter_, update)
+
+    def dump_database_data_to_backup_cids(self, user_did, process_callback=t.Optional[t.Callable[[int, int], None]],
+                                          last_databases: dict = None):
         """
         Each application holds its database under same user did.
         The steps to dump each database data to each application under the specific did:
-        - dump the specific database to a snapshot file;
-        - upload this snapshot file into IPFS node
-        """
-        names = self.user_manager.get_database_names(user_did)
-        metadata_list, length = list(), len(names)
-        for i in range(length):
-            if process_callback:
-                process_callback(i + 1, length)
-
-            d = {
-                'path': gene_temp_file_name(),
-                'name': names[i]
-            }
-            # dump the database data to snapshot file.
-            dump_mongodb_to_full_path(d['name'], d['path'])
+        - dump the specific database to the gzip archive stream;
+        - upload the stream into IPFS node and calculate the SHA256 at the same time.
 
-            # upload this snapshot file onto IPFS node.
-            d['cid'] = fm.ipfs_upload_file_from_path(d['path'])
-            d['sha256'] = fm.get_file_content_sha256(d['path'])
-            d['size'] = d['path'].stat().st_size
-            d['path'].unlink()
+        The databases are dumped concurrently by BACKUP_DUMP_WORKERS mongodump processes,
+        so the uploading of one database overlaps with the dumping of others.
 
-            metadata_list.append(d)
-        return metadata_list
+        :param last_databases: The databases of the last backup, the one with the same fingerprint is not dumped again.
+        """
+        names = self.user_manager.get_database_names(user_did)
+        if not names:
+            return list()
+
+        last_databases = last_databases or dict()
+
+        def dump_database(name):
+            fingerprint = self.mcli.get_database_fingerprint(user_did, name)
+            last = last_databases.get(name)
+            if fingerprint and last and last.get('fingerprint') == fingerprint:
+                logging.info(f'[IpfsBackupClient] The database {name} is not changed, skip dumping.')
+                return dict(last)
+
+            cid, sha256, size = dump_mongodb_to_stream(name, lambda stream: fm.ipfs_upload_stream(stream), is_gzip=True)
+            return {'name': name, 'cid': cid, 'sha256': sha256, 'size': size, 'gzip': True, 'fingerprint': fingerprint}
+
+        metadatas, length = dict(), len(names)
+        with ThreadPoolExecutor(min(max(1, hive_setting.BACKUP_DUMP_WORKERS), length)) as executor:
+            futures = [executor.submit(dump_database, name) for name in names]
+            try:
+                for future in as_completed(futures):
+                    d = future.result()
+                    metadatas[d['name']] = d
+                    if process_callback:
+                        process_callback(len(metadatas) + 1, length)
+            except Exception as e:
+                for future in futures:
+                    future.cancel()
+                raise e
+
+        return [metadatas[name] for name in names]
 
     def get_files_data_as_backup_cids(self, user_did):
         """
@@ -234,39 +271,77 @@ class IpfsBackupClient:
         return request_metadata
 
     def restore_database_by_dump_files(self, request_metadata):
+        """ Restore the databases concurrently by streaming the dump files from IPFS node to mongorestore.
+
+        The dump files are restored to the staging databases first, because the content is only verified
+        at the end of the stream. The user databases are replaced by the staging ones after all dump files
+        are restored and verified, and all staging databases are removed when any of them fails.
+        """
         databases = request_metadata['databases']
         if not databases:
             logging.info('[IpfsBackupClient] No user databases dump files, skip.')
             return
+
+        aborted = threading.Event()
+
+        def get_chunks(d):
+            with contextlib.closing(fm.ipfs_cat_chunks(d['cid'], is_proxy=True, sha256=d['sha256'], size=d['size'])) as chunks:
+                for chunk in chunks:
+                    if aborted.is_set():
+                        raise BadRequestException(f'Restoring the database {d["name"]} is aborted.')
+                    yield chunk
+
+        def restore_database(d):
+            staging_name = self.mcli.get_staging_database_name(d['name'])
+            try:
+                self.mcli.drop_database(staging_name)
+                restore_mongodb_from_stream(d['name'], get_chunks(d), is_gzip=d.get('gzip', False), to_db_name=staging_name)
+            except Exception as e:
+                aborted.set()
+                logging.error(f'[IpfsBackupClient] Failed to restore the dump file for database {d["name"]}.')
+                raise e
+            logging.info(f'[IpfsBackupClient] Success to restore the dump file for database {d["name"]} to the staging one.')
+
+        try:
+            with ThreadPoolExecutor(min(max(1, hive_setting.BACKUP_DUMP_WORKERS), len(databases))) as executor:
+                futures = [executor.submit(restore_database, d) for d in databases]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception as e:
+                    for future in futures:
+                        future.cancel()
+                    raise e
+        except Exception as e:
+            for d in databases:
+                self.mcli.drop_database(self.mcli.get_staging_database_name(d['name']))
+            raise e
+
         for d in databases:
-            temp_file = gene_temp_file_name()
-            msg = fm.ipfs_download_file_to_path(d['cid'], temp_file, is_proxy=True, sha256=d['sha256'], size=d['size'])
-            if msg:
-                logging.error(f'[IpfsBackupClient] Failed to download dump file for database {d["name"]}.')
-                temp_file.unlink()
-                raise BadRequestException(msg)
-            restore_mongodb_from_full_path(temp_file)
-            temp_file.unlink()
-            logging.info(f'[IpfsBackupClient] Success to restore the dump file for database {d["name"]}.')
+            self.mcli.replace_database_collections(self.mcli.get_staging_database_name(d['name']), d['name'])
+            logging.info(f'[IpfsBackupClient] Success to replace the database {d["name"]} by the restored one.')
 
     def retry_backup_request(self):
-        """ retry unfinished backup&restore action when node rebooted """
+        """ retry unfinished backup&restore action when node rebooted, include the queued ones """
 
         col = self.mcli.get_management_collection(COL_IPFS_BACKUP_CLIENT)
         requests = col.find_many({})
 
-        for req in requests:
-            if req.get(BACKUP_REQUEST_STATE) != BACKUP_REQUEST_STATE_PROCESS:
-                continue
-
-            # only handle the state BACKUP_REQUEST_STATE_INPROGRESS
+        # only handle the state BACKUP_REQUEST_STATE_INPROGRESS and the queued ones.
+        actions = {req[USR_DID]: req.get(BACKUP_REQUEST_ACTION) for req in requests
+                   if req.get(BACKUP_REQUEST_STATE) == BACKUP_REQUEST_STATE_PROCESS}
+        for job in backup_job_queue.get_persistent_jobs([BACKUP_REQUEST_ACTION_BACKUP, BACKUP_REQUEST_ACTION_RESTORE]):
+            actions[job[USR_DID]] = job[JOB_ACTION]
 
-            user_did = req[USR_DID]
+        for user_did, action in actions.items():
             logging.info(f"[IpfsBackupClient] Found unfinished request({user_did}), retry.")
 
-            if req.get(BACKUP_REQUEST_ACTION) == BACKUP_REQUEST_ACTION_BACKUP:
-                BackupExecutor(user_did, self, req, start_delay=30).start()
-            elif req.get(BACKUP_REQUEST_ACTION) == BACKUP_REQUEST_ACTION_RESTORE:
-                RestoreExecutor(user_did, self, start_delay=30).start()
+            req = self.__get_request_doc(user_did)
+            if not req:
+                backup_job_queue.forget(user_did, action)
+            elif action == BACKUP_REQUEST_ACTION_BACKUP:
+                backup_job_queue.recover(BackupExecutor(user_did, self, req))
+            elif action == BACKUP_REQUEST_ACTION_RESTORE:
+                backup_job_queue.recover(RestoreExecutor(user_did, self))
             else:
-                logging.error(f'[IpfsBackupClient] Unknown action({req.get(BACKUP_REQUEST_ACTION)}), skip.')
+                logging.error(f'[IpfsBackupClient] Unknown action({action}), skip.')
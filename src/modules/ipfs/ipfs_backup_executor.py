@@ -2,35 +2,52 @@
 
 import json
 import logging
-import threading
 import time
 import traceback
+from collections import defaultdict
 from datetime import datetime
 
 from src.modules.ipfs.backup_server_client import BackupServerClient
 from src.modules.ipfs.ipfs_cid_ref import IpfsCidRef
+from src.modules.ipfs.ipfs_pin_set import IpfsPinSet
 from src.modules.subscription.vault import VaultManager
 from src.utils.consts import BACKUP_REQUEST_STATE_SUCCESS, BACKUP_REQUEST_STATE_FAILED, USR_DID, BACKUP_REQUEST_STATE_PROCESS, BACKUP_REQUEST_TARGET_HOST, \
-    BACKUP_REQUEST_TARGET_TOKEN
+    BACKUP_REQUEST_TARGET_TOKEN, BKSERVER_REQ_PIN_PROGRESS, BKSERVER_REQ_LAST_CID, BACKUP_REQUEST_TARGET_DID, \
+    BKSERVER_REQ_CID, BKSERVER_REQ_STATE
 from src.utils.file_manager import fm
 from src.utils.http_exception import HiveException, BadRequestException
 from src.utils_v1.common import gene_temp_file_name
 
+# the action of the executor on the backup node
+BACKUP_SERVER_ACTION = 'backup_server'
 
-class ExecutorBase(threading.Thread):
-    def __init__(self, user_did, owner, action, start_delay=0, is_force=False):
-        super().__init__()
+# the seconds of the long polling on the state of the backup server
+STATE_WAIT_SECONDS = 20
+# the backoff interval of polling the state if the backup server does not support long polling
+STATE_POLL_MIN_INTERVAL = 2
+STATE_POLL_MAX_INTERVAL = 60
+
+# the keys of the progress of handling the CIDs
+PIN_PROGRESS_DONE = 'done'
+PIN_PROGRESS_REF_UPDATED = 'ref_updated'
+
+
+class ExecutorBase:
+    """ The backup job which runs by the workers of backup_job_queue. """
+
+    # the priority in the queue, the smaller one runs first
+    PRIORITY = 0
+
+    def __init__(self, user_did, owner, action, is_force=False):
         self.user_did = user_did
         self.owner = owner
         self.action = action
-        self.start_delay = start_delay
         self.is_force = is_force
         self.vault_manager = VaultManager()
+        self.progress_msg = None
 
     def run(self):
         try:
-            if self.start_delay > 0:
-                time.sleep(self.start_delay)
             logging.info(f'[ExecutorBase] Enter execute the executor for {self.action}.')
             self.execute()
             self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_SUCCESS, '')
@@ -48,6 +65,13 @@ class ExecutorBase(threading.Thread):
         # INFO: override this.
         pass
 
+    def update_progress(self, msg):
+        """ update the progress of the processing request, only when it changes """
+        if msg == self.progress_msg:
+            return
+        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, msg)
+        self.progress_msg = msg
+
     def generate_root_backup_cid(self, database_cids, files_cids, total_file_size):
         """
         Create a json doc containing basic root informations:
@@ -62,7 +86,9 @@ class ExecutorBase(threading.Thread):
             'databases': [{'name': d['name'],
                            'sha256': d['sha256'],
                            'cid': d['cid'],
-                           'size': d['size']} for d in database_cids],
+                           'size': d['size'],
+                           'gzip': d.get('gzip', False),
+                           'fingerprint': d.get('fingerprint')} for d in database_cids],
             'files': [{'sha256': d['sha256'],
                        'cid': d['cid'],
                        'size': d['size'],
@@ -102,10 +128,14 @@ class ExecutorBase(threading.Thread):
                                   contain_databases=True,
                                   contain_files=True,
                                   is_unpin=False,
-                                  only_files_ref=False):
+                                  only_files_ref=False,
+                                  progress=None,
+                                  on_progress=None):
         """ Handle the CIDs of the backup metadata which defined in ipfs_backup_client.py
 
         default is pin&unpin all databases and files.
+        The CIDs are pinned or unpinned concurrently, and the reference counts of the files
+        are changed by one bulk write after all CIDs done.
 
         :param request_metadata: The request json data of the backup processing.
         :param root_cid: Operate on root_cid if not None.
@@ -113,83 +143,109 @@ class ExecutorBase(threading.Thread):
         :param contain_files: Whether it needs pin/unpin files to IPFS node, only for files of request_metadata
         :param is_unpin: Pin or unpin the file on the IPFS node.
         :param only_files_ref: Only increase & decrease the cid ref count of the files.
+        :param progress: The progress saved by on_progress last time, the finished parts are skipped.
+        :param on_progress: Called with the progress dict when some parts finished, for resuming.
         """
 
-        execute_pin_unpin = fm.ipfs_pin_cid if not is_unpin else fm.ipfs_unpin_cid
+        progress = dict(progress or {PIN_PROGRESS_DONE: 0, PIN_PROGRESS_REF_UPDATED: False})
 
-        # pin or unpin the cid of request_metadata
-        if root_cid:
-            execute_pin_unpin(root_cid)
-            logging.info('[ExecutorBase] Success to pin root cid.')
+        def save_progress(**kwargs):
+            progress.update(kwargs)
+            if on_progress:
+                on_progress(dict(progress))
 
         # can not handle without request_metadata
         if not request_metadata:
             logging.info('[ExecutorBase] Invalid request metadata, skip pin CIDs.')
+            if root_cid:
+                IpfsPinSet([root_cid], is_unpin=is_unpin).execute()
             return
 
-        # pin or unpin database packages
+        # pin or unpin the cids of root, database packages and files
+        cids = [root_cid] if root_cid else []
         if contain_databases and request_metadata.get('databases'):
-            for d in request_metadata.get('databases'):
-                execute_pin_unpin(d['cid'])
-            logging.info(f'[ExecutorBase] Success to {"pin" if not is_unpin else "unpin"} all databases CIDs.')
-
-        # pin or unpin files
-        if contain_files and request_metadata.get('files'):
+            cids.extend([d['cid'] for d in request_metadata.get('databases')])
+        if contain_files and request_metadata.get('files') and not only_files_ref:
+            cids.extend([f['cid'] for f in request_metadata.get('files')])
+        cids = list(dict.fromkeys(cids))
+
+        done = progress[PIN_PROGRESS_DONE]
+        if done < len(cids):
+            IpfsPinSet(cids[done:], is_unpin=is_unpin,
+                       on_checkpoint=lambda count: save_progress(**{PIN_PROGRESS_DONE: done + count})).execute()
+        logging.info(f'[ExecutorBase] Success to {"pin" if not is_unpin else "unpin"} {len(cids) - done} CIDs.')
+
+        # increase or decrease the reference counts of the files
+        if contain_files and request_metadata.get('files') and not progress[PIN_PROGRESS_REF_UPDATED]:
+            deltas = defaultdict(int)
             for f in request_metadata.get('files'):
-                if not only_files_ref:
-                    execute_pin_unpin(f['cid'])
-
-                cid_ref = IpfsCidRef(f['cid'])
-                if not is_unpin:
-                    cid_ref.decrease(f['count'])
-                else:
-                    cid_ref.increase(f['count'])
-
-            logging.info('[ExecutorBase] Success to pin all files CIDs.')
+                deltas[f['cid']] += f['count'] if not is_unpin else -f['count']
+            IpfsCidRef.update_counts(deltas)
+            save_progress(**{PIN_PROGRESS_REF_UPDATED: True})
+            logging.info('[ExecutorBase] Success to update the reference counts of all files CIDs.')
 
 
 class BackupExecutor(ExecutorBase):
+    PRIORITY = 2
+
     def __init__(self, user_did, client, req, **kwargs):
         super().__init__(user_did, client, 'backup', **kwargs)
         self.req = req
 
     def execute(self):
         def callback_dump_databases(index, total):
-            percent = str(int(15 * (index - 1) / total))
-            self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, percent)
+            self.update_progress(str(int(15 * (index - 1) / total)))
+
+        self.update_progress('0')  # 100-based
 
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '0')  # 100-based
+        # the unchanged databases of the last successful backup are not dumped again,
+        # and the next backup will be the full one if this one fails.
+        last_databases = self.owner.get_last_backup_databases(self.req)
+        self.owner.update_last_manifest(self.user_did, None)
 
-        database_cids = self.owner.dump_database_data_to_backup_cids(self.user_did, callback_dump_databases)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '15')  # 100-based
+        database_cids = self.owner.dump_database_data_to_backup_cids(self.user_did, callback_dump_databases,
+                                                                     last_databases=last_databases)
+        self.update_progress('15')  # 100-based
         logging.info('[BackupExecutor] Dumped the database data to IPFS node and returned with array of CIDs')
 
         filedata_size, file_cids = self.owner.get_files_data_as_backup_cids(self.user_did)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '25')  # 100-based
+        self.update_progress('25')  # 100-based
         logging.info('[BackupExecutor] Got an array of CIDs to file data')
 
         cid, sha256, size, request_metadata = self.generate_root_backup_cid(database_cids, file_cids, filedata_size)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '35')  # 100-based
+        self.update_progress('35')  # 100-based
         logging.info(f'[BackupExecutor] Generated the root backup CID to vault data, request_metadata, {request_metadata}')
 
         self.owner.send_root_backup_cid_to_backup_node(self.user_did, cid, sha256, size, self.is_force)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '50')  # 100-based
+        self.update_progress('50')  # 100-based
         logging.info('[BackupExecutor] Send the root backup CID to the backup node.')
 
         # wait until the server ends
         try:
             client = BackupServerClient(self.req[BACKUP_REQUEST_TARGET_HOST], token=self.req[BACKUP_REQUEST_TARGET_TOKEN])
+            remote_state, remote_msg, interval = None, None, STATE_POLL_MIN_INTERVAL
             while True:
-                remote_action, remote_state, remote_msg = client.get_state()
+                start = time.time()
+                known_state, known_msg = remote_state, remote_msg
+                remote_action, remote_state, remote_msg = client.get_state(STATE_WAIT_SECONDS, known_state, known_msg)
 
                 if remote_state == BACKUP_REQUEST_STATE_PROCESS:
-                    self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, remote_msg)  # 100-based
+                    self.update_progress(remote_msg)  # 100-based
                 elif remote_state == BACKUP_REQUEST_STATE_SUCCESS:
+                    self.owner.update_last_manifest(self.user_did, {
+                        'cid': cid,
+                        'target_did': self.req.get(BACKUP_REQUEST_TARGET_DID),
+                        'databases': request_metadata['databases']})
                     break
                 else:
                     raise BadRequestException(f'server error: {remote_msg}')
 
-                time.sleep(2)
+                if (remote_state, remote_msg) != (known_state, known_msg):
+                    interval = STATE_POLL_MIN_INTERVAL
+                elif time.time() - start < STATE_WAIT_SECONDS / 2:
+                    # the backup server does not support long polling, back off.
+                    time.sleep(interval)
+                    interval = min(interval * 2, STATE_POLL_MAX_INTERVAL)
         except Exception as e:
             raise e
         finally:
@@ -198,24 +254,27 @@ class BackupExecutor(ExecutorBase):
 
 
 class RestoreExecutor(ExecutorBase):
+    # the user is waiting for the restored vault
+    PRIORITY = 0
+
     def __init__(self, user_did, client, **kwargs):
         super().__init__(user_did, client, 'restore', **kwargs)
 
     def execute(self):
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '0')  # 100-based
+        self.update_progress('0')  # 100-based
 
         # only get the content
         request_metadata = self.owner.get_vault_data_cid_from_backup_node(self.user_did)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '40')  # 100-based
+        self.update_progress('40')  # 100-based
         logging.info('[RestoreExecutor] Success to get request metadata from the backup node.')
 
         # direct download database packages and restore to mongodb
         self.owner.restore_database_by_dump_files(request_metadata)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '60')  # 100-based
+        self.update_progress('60')  # 100-based
         logging.info("[RestoreExecutor] Success to restore the dump files of the user's database.")
 
         self.__class__.handle_cids_in_local_ipfs(request_metadata, contain_databases=False)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '80')  # 100-based
+        self.update_progress('80')  # 100-based
         logging.info('[RestoreExecutor] Success to pin files CIDs.')
 
         self.__class__.update_vault_usage_by_metadata(self.user_did, request_metadata)
@@ -223,23 +282,155 @@ class RestoreExecutor(ExecutorBase):
 
 
 class BackupServerExecutor(ExecutorBase):
+    # the vault node is waiting for the result
+    PRIORITY = 1
+
     def __init__(self, user_did, server, req, **kwargs):
-        super().__init__(user_did, server, 'backup_server', **kwargs)
+        super().__init__(user_did, server, BACKUP_SERVER_ACTION, **kwargs)
         self.req = req
+        # the progress of the stages saved by the last interrupted execution: pin, ref, unpin
+        self.progress = dict(req.get(BKSERVER_REQ_PIN_PROGRESS) or {})
 
     def execute(self):
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '50')  # 100-based
+        self.update_progress('50')  # 100-based
 
         # request_metadata already pinned to ipfs node
 
         request_metadata = self.owner.get_server_request_metadata(self.user_did, self.req)
         logging.info(f'[BackupServerExecutor] request_metadata: {request_metadata}')
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '60')  # 100-based
+        self.update_progress('60')  # 100-based
         logging.info('[BackupServerExecutor] Success to get request metadata.')
 
-        self.__class__.handle_cids_in_local_ipfs(request_metadata)
-        self.owner.update_request_state(self.user_did, BACKUP_REQUEST_STATE_PROCESS, '80')  # 100-based
+        last_cid = self.req.get(BKSERVER_REQ_LAST_CID)
+        last_metadata = self.owner.get_last_request_metadata(self.user_did, self.req)
+        if last_cid and last_cid == self.req.get(BKSERVER_REQ_CID):
+            # same as the last successful backup, all CIDs have been handled.
+            logging.info('[BackupServerExecutor] The backup is not changed, skip handling CIDs.')
+        elif not last_metadata:
+            self.__class__.handle_cids_in_local_ipfs(request_metadata,
+                                                     progress=self.progress.get('pin'),
+                                                     on_progress=lambda p: self.save_progress('pin', p))
+            if not self.progress.get('ref'):
+                IpfsCidRef.update_counts(self.get_databases_ref_deltas(request_metadata['databases']))
+                self.save_progress('ref', True)
+        else:
+            # only pin the added CIDs, and unpin the removed ones of the last backup which are not referenced anymore.
+            added, removed, ref_deltas = self.diff_request_metadata(last_metadata, request_metadata)
+            logging.info(f'[BackupServerExecutor] Incremental backup: {len(added["databases"]) + len(added["files"])} added, '
+                         f'{len(removed["databases"]) + len(removed["files"])} removed, {len(ref_deltas)} changed CIDs.')
+
+            self.__class__.handle_cids_in_local_ipfs(added,
+                                                     progress=self.progress.get('pin'),
+                                                     on_progress=lambda p: self.save_progress('pin', p))
+            if not self.progress.get('ref'):
+                for f in removed['files']:
+                    ref_deltas[f['cid']] = ref_deltas.get(f['cid'], 0) - f['count']
+                for cid, delta in self.get_databases_ref_deltas(added['databases']).items():
+                    ref_deltas[cid] = ref_deltas.get(cid, 0) + delta
+                for cid, delta in self.get_databases_ref_deltas(removed['databases']).items():
+                    ref_deltas[cid] = ref_deltas.get(cid, 0) - delta
+                IpfsCidRef.update_counts(ref_deltas)
+                self.save_progress('ref', True)
+            self.__class__.unpin_unreferenced_cids([last_cid], removed,
+                                                   progress=self.progress.get('unpin'),
+                                                   on_progress=lambda p: self.save_progress('unpin', p))
+        self.update_progress('80')  # 100-based
         logging.info('[BackupServerExecutor] Success to get pin all CIDs.')
 
         self.owner.update_storage_usage(self.user_did, request_metadata['backup_size'])
         logging.info('[BackupServerExecutor] Success to update storage size.')
+
+    @staticmethod
+    def unpin_unreferenced_cids(root_cids, metadata, progress=None, on_progress=None):
+        """ Unpin the root CIDs and the CIDs of the metadata which reference counts reach zero.
+
+        The CIDs may be still referenced by the backups of other users or the files of the vaults on this node.
+
+        :param root_cids: The root CIDs which are only used by the backup of the user.
+        :param metadata: The request metadata which only contains the released databases and files.
+        :param progress: The progress saved by on_progress last time, the finished parts are skipped.
+        :param on_progress: Called with the progress dict when some parts finished, for resuming.
+        """
+        cids = list(dict.fromkeys([d['cid'] for d in metadata.get('databases') or []] +
+                                  [f['cid'] for f in metadata.get('files') or []]))
+        referenced = IpfsCidRef.get_referenced_cids(cids)
+        cids = list(dict.fromkeys([cid for cid in root_cids if cid] + [cid for cid in cids if cid not in referenced]))
+
+        done = (progress or {}).get(PIN_PROGRESS_DONE, 0)
+        if done < len(cids):
+            on_checkpoint = (lambda count: on_progress({PIN_PROGRESS_DONE: done + count})) if on_progress else None
+            IpfsPinSet(cids[done:], is_unpin=True, on_checkpoint=on_checkpoint).execute()
+        logging.info(f'[BackupServerExecutor] Success to unpin {len(cids) - done} CIDs, '
+                     f'{len(referenced)} released CIDs are still referenced.')
+
+    @staticmethod
+    def get_referenced_metadata(req, request_metadata, last_metadata):
+        """ Get the request metadata which reference counts are held by the backup of the user.
+
+        When the backup is interrupted, the reference counts are the ones applied by the finished stages of execute().
+        """
+        progress = req.get(BKSERVER_REQ_PIN_PROGRESS) or {}
+        files_ref_updated = (progress.get('pin') or {}).get(PIN_PROGRESS_REF_UPDATED)
+        if req.get(BKSERVER_REQ_STATE) == BACKUP_REQUEST_STATE_SUCCESS or progress.get('ref') \
+                or req.get(BKSERVER_REQ_LAST_CID) == req.get(BKSERVER_REQ_CID):
+            return request_metadata
+        elif not last_metadata:
+            return {'databases': [], 'files': request_metadata.get('files', []) if files_ref_updated else []}
+
+        added, _, _ = BackupServerExecutor.diff_request_metadata(last_metadata, request_metadata)
+        return {'databases': last_metadata.get('databases', []),
+                'files': last_metadata.get('files', []) + (added['files'] if files_ref_updated else [])}
+
+    @staticmethod
+    def release_request_metadata(root_cids, metadata, referenced_metadata):
+        """ Release the CIDs of the removed backup of the user.
+
+        The reference counts held by the backup are decreased, then only the CIDs not referenced anymore are unpinned.
+
+        :param root_cids: The root CIDs which are only used by the backup of the user.
+        :param metadata: The request metadata which contains all databases and files may be pinned for the backup.
+        :param referenced_metadata: The request metadata which reference counts are held by the backup, or None.
+        """
+        if referenced_metadata:
+            ref_deltas = defaultdict(int)
+            for f in referenced_metadata.get('files') or []:
+                ref_deltas[f['cid']] -= f['count']
+            for cid, delta in BackupServerExecutor.get_databases_ref_deltas(referenced_metadata.get('databases')).items():
+                ref_deltas[cid] -= delta
+            IpfsCidRef.update_counts(ref_deltas)
+
+        BackupServerExecutor.unpin_unreferenced_cids(root_cids, metadata)
+
+    @staticmethod
+    def get_databases_ref_deltas(databases) -> dict:
+        """ The database CIDs are also referenced on the backup node, because they can be same for the users. """
+        deltas = defaultdict(int)
+        for d in databases or []:
+            deltas[d['cid']] += 1
+        return deltas
+
+    def save_progress(self, stage, progress):
+        self.progress[stage] = progress
+        self.owner.update_backup_request(self.user_did, {BKSERVER_REQ_PIN_PROGRESS: self.progress})
+
+    @staticmethod
+    def diff_request_metadata(last_metadata, request_metadata):
+        """ Get the changes from the last request metadata.
+
+        :return: (added, removed, ref_deltas), the added and removed are the request metadata
+            which only contain the databases and files not in the other one,
+            ref_deltas is the changes of the reference counts of the files in both: {cid: delta}.
+        """
+        def by_cid(metadata, key):
+            return {d['cid']: d for d in metadata.get(key) or []}
+
+        last_databases, databases = by_cid(last_metadata, 'databases'), by_cid(request_metadata, 'databases')
+        last_files, files = by_cid(last_metadata, 'files'), by_cid(request_metadata, 'files')
+
+        added = {'databases': [d for cid, d in databases.items() if cid not in last_databases],
+                 'files': [f for cid, f in files.items() if cid not in last_files]}
+        removed = {'databases': [d for cid, d in last_databases.items() if cid not in databases],
+                   'files': [f for cid, f in last_files.items() if cid not in files]}
+        ref_deltas = {cid: f['count'] - last_files[cid]['count'] for cid, f in files.items()
+                      if cid in last_files and f['count'] != last_files[cid]['count']}
+        return added, removed, ref_deltas
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
+import threading
+import time
 from datetime import datetime
 
 from flask import g
@@ -8,11 +10,13 @@ from src.modules.auth.auth import Auth
 from src.modules.auth.user import UserManager
 from src.modules.database.mongodb_client import MongodbClient
 from src.modules.ipfs.ipfs_backup_client import IpfsBackupClient
-from src.modules.ipfs.ipfs_backup_executor import ExecutorBase, BackupServerExecutor
+from src.modules.ipfs.backup_job_queue import backup_server_job_queue
+from src.modules.ipfs.ipfs_backup_executor import ExecutorBase, BackupServerExecutor, BACKUP_SERVER_ACTION
 from src.modules.subscription.subscription import VaultSubscription
 from src.utils.consts import BKSERVER_REQ_STATE, BACKUP_REQUEST_STATE_PROCESS, BKSERVER_REQ_ACTION, \
     BACKUP_REQUEST_ACTION_BACKUP, BKSERVER_REQ_CID, BKSERVER_REQ_SHA256, BKSERVER_REQ_SIZE, \
-    BKSERVER_REQ_STATE_MSG, BACKUP_REQUEST_STATE_FAILED, COL_IPFS_BACKUP_SERVER, USR_DID, BACKUP_REQUEST_STATE_SUCCESS
+    BKSERVER_REQ_STATE_MSG, BACKUP_REQUEST_STATE_FAILED, COL_IPFS_BACKUP_SERVER, USR_DID, BACKUP_REQUEST_STATE_SUCCESS, \
+    BKSERVER_REQ_PIN_PROGRESS, BKSERVER_REQ_LAST_CID, BKSERVER_REQ_LAST_SHA256, BKSERVER_REQ_LAST_SIZE
 from src.utils.db_client import cli
 from src.utils.file_manager import fm
 from src.utils.http_exception import BackupNotFoundException, AlreadyExistsException, BadRequestException, \
@@ -23,6 +27,58 @@ from src.utils_v1.constants import DID_INFO_DB_NAME, \
 from src.utils_v1.payment.payment_config import PaymentConfig
 
 
+# the max seconds of the long polling on the backup state.
+BACKUP_STATE_MAX_WAIT = 30
+# the max count of the long polling requests waiting at the same time, others return immediately
+BACKUP_STATE_MAX_WAITERS = 32
+
+
+class BackupStateNotifier:
+    """ Wake up the long polling requests of the backup state when the backup request of the user updated.
+
+    Only the updates in this process are notified, the ones by other processes are found when the waiting times out.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        # user_did: the count of the updates
+        self.versions = {}
+        self.waiters = 0
+
+    def get_version(self, user_did):
+        with self.condition:
+            return self.versions.get(user_did, 0)
+
+    def notify(self, user_did):
+        with self.condition:
+            self.versions[user_did] = self.versions.get(user_did, 0) + 1
+            self.condition.notify_all()
+
+    def wait(self, user_did, version, timeout) -> bool:
+        """ Wait until the backup request of the user updated after 'version' or timeout.
+
+        :return: False if there are too many waiters and not wait.
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            if self.waiters >= BACKUP_STATE_MAX_WAITERS:
+                return False
+
+            self.waiters += 1
+            try:
+                while self.versions.get(user_did, 0) == version:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            finally:
+                self.waiters -= 1
+        return True
+
+
+backup_state_notifier = BackupStateNotifier()
+
+
 class IpfsBackupServer:
     def __init__(self):
         self.vault = VaultSubscription()
@@ -66,13 +122,43 @@ class IpfsBackupServer:
             BKSERVER_REQ_STATE_MSG: '50',  # start from 50%
             BKSERVER_REQ_CID: cid,
             BKSERVER_REQ_SHA256: sha256,
-            BKSERVER_REQ_SIZE: size
+            BKSERVER_REQ_SIZE: size,
+            BKSERVER_REQ_PIN_PROGRESS: {}  # the new backup data need be handled from the beginning
         }
+        if doc.get(BKSERVER_REQ_STATE) == BACKUP_REQUEST_STATE_SUCCESS and doc.get(BKSERVER_REQ_CID):
+            # the new backup is handled as the changes based on the last successful one.
+            update.update({
+                BKSERVER_REQ_LAST_CID: doc.get(BKSERVER_REQ_CID),
+                BKSERVER_REQ_LAST_SHA256: doc.get(BKSERVER_REQ_SHA256),
+                BKSERVER_REQ_LAST_SIZE: doc.get(BKSERVER_REQ_SIZE)
+            })
+        else:
+            # the last one is not successful, so which CIDs are kept pinned is unknown, handle the new one fully.
+            update.update({
+                BKSERVER_REQ_LAST_CID: None,
+                BKSERVER_REQ_LAST_SHA256: None,
+                BKSERVER_REQ_LAST_SIZE: None
+            })
         self.update_backup_request(g.usr_did, update)
-        BackupServerExecutor(g.usr_did, self, self.find_backup_request(g.usr_did, False)).start()
+        backup_server_job_queue.submit(BackupServerExecutor(g.usr_did, self, self.find_backup_request(g.usr_did, False)))
 
-    def internal_backup_state(self):
+    def internal_backup_state(self, wait=0, result=None, message=None):
+        """ Get the state of the backup request.
+
+        :param wait: The seconds (long polling) to wait for the state changed from (result, message) which the client known.
+        """
+        version = backup_state_notifier.get_version(g.usr_did)
         doc = self.find_backup_request(g.usr_did, throw_exception=True)
+
+        deadline = time.time() + min(max(wait, 0), BACKUP_STATE_MAX_WAIT)
+        while result is not None and (doc.get(BKSERVER_REQ_STATE), doc.get(BKSERVER_REQ_STATE_MSG)) == (result, message) \
+                and time.time() < deadline:
+            # read the request again only when it's updated by this process or the waiting times out.
+            if not backup_state_notifier.wait(g.usr_did, version, deadline - time.time()):
+                break
+            version = backup_state_notifier.get_version(g.usr_did)
+            doc = self.find_backup_request(g.usr_did, throw_exception=True)
+
         return {
             'state': doc.get(BKSERVER_REQ_ACTION),  # None or backup
             'result': doc.get(BKSERVER_REQ_STATE),
@@ -123,6 +209,19 @@ class IpfsBackupServer:
         logging.info('[IpfsBackupServer] Success to check the verified request metadata.')
         return request_metadata
 
+    def get_last_request_metadata(self, user_did, req):
+        """ Get the request metadata of the last successful backup, None if not exists or can not be got. """
+        cid = req.get(BKSERVER_REQ_LAST_CID)
+        if not cid or cid == req.get(BKSERVER_REQ_CID):
+            return None
+
+        try:
+            return fm.ipfs_download_file_content(cid, is_proxy=True,
+                                                 sha256=req.get(BKSERVER_REQ_LAST_SHA256), size=req.get(BKSERVER_REQ_LAST_SIZE))
+        except Exception as e:
+            logging.error(f'[IpfsBackupServer] Failed to get the last request metadata {cid}, handle as the full backup: {str(e)}')
+            return None
+
     def _get_verified_request_metadata(self, user_did, req):
         cid, sha256, size = req.get(BKSERVER_REQ_CID), req.get(BKSERVER_REQ_SHA256), req.get(BKSERVER_REQ_SIZE)
         return fm.ipfs_download_file_content(cid, is_proxy=True, sha256=sha256, size=size)
@@ -154,16 +253,30 @@ class IpfsBackupServer:
         self.remove_backup_by_did(g.usr_did, doc)
 
     def remove_backup_by_did(self, user_did, doc):
-        """ Remove all data belongs to the backup of the user. """
+        """ Remove all data belongs to the backup of the user.
+
+        The reference counts held by the backup are decreased, and only the CIDs not referenced anymore are unpinned,
+        because the databases and files CIDs can be shared with the backups of other users or the vaults on this node.
+        """
         logging.debug(f'start remove the backup of the user {user_did}, _id, {str(doc["_id"])}')
         if doc.get(BKSERVER_REQ_CID):
             request_metadata = self._get_verified_request_metadata(user_did, doc)
-            ExecutorBase.handle_cids_in_local_ipfs(request_metadata, root_cid=doc.get(BKSERVER_REQ_CID), is_unpin=True)
+            root_cids, last_metadata = [doc.get(BKSERVER_REQ_CID)], None
+            if doc.get(BKSERVER_REQ_STATE) != BACKUP_REQUEST_STATE_SUCCESS:
+                # the CIDs of the last backup are still pinned if the incremental one is interrupted.
+                root_cids.append(doc.get(BKSERVER_REQ_LAST_CID))
+                last_metadata = self.get_last_request_metadata(user_did, doc)
+
+            referenced_metadata = BackupServerExecutor.get_referenced_metadata(doc, request_metadata, last_metadata)
+            metadata = {key: request_metadata.get(key, []) + (last_metadata or {}).get(key, [])
+                        for key in ('databases', 'files')}
+            BackupServerExecutor.release_request_metadata(root_cids, metadata, referenced_metadata)
 
         cli.delete_one_origin(DID_INFO_DB_NAME,
                               COL_IPFS_BACKUP_SERVER,
                               {USR_DID: user_did},
                               is_check_exist=False)
+        backup_state_notifier.notify(user_did)
 
     def get_info(self):
         return self._get_backup_info(self.find_backup_request(g.usr_did, throw_exception=True))
@@ -204,6 +317,7 @@ class IpfsBackupServer:
     def update_backup_request(self, user_did, update):
         col_filter = {USR_DID: user_did}
         cli.update_one_origin(DID_INFO_DB_NAME, COL_IPFS_BACKUP_SERVER, col_filter, {'$set': update}, is_extra=True)
+        backup_state_notifier.notify(user_did)
 
     def find_backup_request(self, user_did, throw_exception=True):
         """ get the backup request information belonged to the user DID
@@ -217,15 +331,20 @@ class IpfsBackupServer:
         return doc
 
     def retry_backup_request(self):
-        """ retry unfinished backup&restore action when node rebooted """
+        """ retry unfinished backup&restore action when node rebooted, include the queued ones """
         col = self.mcli.get_management_collection(COL_IPFS_BACKUP_SERVER)
         requests = col.find_many({})
 
-        for req in requests:
-            if req.get(BKSERVER_REQ_STATE) != BACKUP_REQUEST_STATE_PROCESS:
-                return
+        # only handle BACKUP_REQUEST_STATE_INPROGRESS and the queued ones.
+        user_dids = [req[USR_DID] for req in requests if req.get(BKSERVER_REQ_STATE) == BACKUP_REQUEST_STATE_PROCESS]
+        for job in backup_server_job_queue.get_persistent_jobs([BACKUP_SERVER_ACTION]):
+            if job[USR_DID] not in user_dids:
+                user_dids.append(job[USR_DID])
 
-            # only handle BACKUP_REQUEST_STATE_INPROGRESS ones.
-            user_did = req[USR_DID]
+        for user_did in user_dids:
             logging.info(f"[IpfsBackupServer] Found uncompleted request({user_did}), retry.")
-            BackupServerExecutor(user_did, self, req, start_delay=30).start()
+            req = self.find_backup_request(user_did, throw_exception=False)
+            if not req:
+                backup_server_job_queue.forget(user_did, BACKUP_SERVER_ACTION)
+                continue
+            backup_server_job_queue.recover(BackupServerExecutor(user_did, self, req))
@@ -1,3 +1,5 @@
+from pymongo import UpdateOne, ReturnDocument
+
 from src.modules.database.mongodb_client import MongodbClient
 from src.utils.consts import COL_IPFS_CID_REF, CID, COUNT
 
@@ -20,19 +22,48 @@ class IpfsCidRef:
         col.update_one(filter_, update, upsert=True)
 
     def decrease(self, count=1):
-        """ decrease count if not to zero, else to remove cid info """
+        """ decrease count if not to zero, else to remove cid info
+
+        The decrement is atomic, and the cid info is only removed when its count is still not positive,
+        so the concurrent increment will not be lost.
+        """
 
         filter_ = {CID: self.cid}
+        update = {'$inc': {COUNT: -count}}
 
-        # check if exists
         col = self.mcli.get_management_collection(COL_IPFS_CID_REF)
-        doc = col.find_one(filter_)
-        if not doc:
+        doc = col.col.find_one_and_update(filter_, update, return_document=ReturnDocument.AFTER)
+        if doc and doc[COUNT] <= 0:
+            col.delete_one({CID: self.cid, COUNT: {'$lte': 0}})
+
+    @staticmethod
+    def update_counts(deltas: dict):
+        """ apply the count changes {cid: delta} by one bulk write, the cid info is removed when its count to zero """
+
+        deltas = {cid: delta for cid, delta in deltas.items() if cid and delta}
+        if not deltas:
             return
 
-        # delete or decrease
-        if doc[COUNT] <= count:
-            col.delete_one(filter_)
-        else:
-            update = {'$inc': {COUNT: -count}}
-            col.update_one(filter_, update)
+        # only the increased ones can be inserted, the decreased ones just keep not existing.
+        operations = [UpdateOne({CID: cid}, {'$inc': {COUNT: delta}}, upsert=delta > 0) for cid, delta in deltas.items()]
+
+        col = MongodbClient().get_management_collection(COL_IPFS_CID_REF)
+        col.col.bulk_write(operations, ordered=False)
+        col.delete_many({CID: {'$in': list(deltas.keys())}, COUNT: {'$lte': 0}})
+
+    @staticmethod
+    def get_referenced_cids(cids: list) -> set:
+        """ get the CIDs which reference counts are positive """
+        if not cids:
+            return set()
+
+        col = MongodbClient().get_management_collection(COL_IPFS_CID_REF)
+        docs = col.find_many({CID: {'$in': cids}, COUNT: {'$gt': 0}}, projection={CID: True})
+        return {doc[CID] for doc in docs}
+
+    @staticmethod
+    def remove_zero_counts():
+        """ remove the cid infos which count is not positive, they are left when the process broken after decreasing """
+
+        col = MongodbClient().get_management_collection(COL_IPFS_CID_REF)
+        return col.delete_many({COUNT: {'$lte': 0}})['deleted_count']
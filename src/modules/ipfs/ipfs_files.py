@@ -156,10 +156,10 @@ class IpfsFiles:
 
     def upload_file_with_path(self, user_did, app_did, path: str, is_public: bool = False):
         """ The routine to process the file uploading:
-            1. Receive the content of uploaded file and cache it a temp file;
-            2. Add this file onto IPFS node and return with CID;
-            3. Create a new metadata with the CID and store them as document;
-            4. Cached the temp file to specific cache directory.
+            1. Receive the content of uploaded file, cache it to a temp file and add it onto IPFS node
+               with CID in a single pass, the SHA256 and size are also calculated on the way;
+            2. Create a new metadata with the CID and store them as document;
+            3. Cached the temp file to specific cache directory.
 
         'public' for v1, scripting service
 
@@ -169,12 +169,13 @@ class IpfsFiles:
         :param is_public: True, any user can access the file content.
         :return: None
         """
-        # upload to the temporary file and then to IPFS node.
+        # upload to the temporary file and IPFS node at the same time.
         temp_file = gene_temp_file_name()
-        fm.write_file_by_request_stream(temp_file)
-        return self.upload_file_from_local(user_did, app_did, path, temp_file, is_public=is_public)
+        cid, sha256, _ = fm.ipfs_upload_file_from_request_stream(temp_file)
+        return self.upload_file_from_local(user_did, app_did, path, temp_file, is_public=is_public, cid=cid, sha256=sha256)
 
-    def upload_file_from_local(self, user_did, app_did, path: str, local_path: Path, is_public=False, only_import=False, **kwargs):
+    def upload_file_from_local(self, user_did, app_did, path: str, local_path: Path, is_public=False, only_import=False,
+                               cid=None, sha256=None, **kwargs):
         """ Upload file to ipfs node from local file.
         1. 'only_import' and 'kwargs' is only for v1 relating script.
 
@@ -192,22 +193,24 @@ class IpfsFiles:
         :param local_path: the uploading based file.
         :param is_public: True, any user can access the file content.
         :param only_import: Just import the file to ipfs node, keep the local file and not increase the file storage usage size.
+        :param cid: the CID of the local file which is already uploaded to ipfs node.
+        :param sha256: the SHA256 of the local file if already calculated.
         :return None
         """
         # upload the file to ipfs node.
-        cid = fm.ipfs_upload_file_from_path(local_path)
-        cid_ref, increased_size = IpfsCidRef(cid), 0
+        if not cid:
+            cid = fm.ipfs_upload_file_from_path(local_path)
+        increased_size = 0
 
         # insert or update file metadata.
         doc = self.get_file_metadata(user_did, app_did, path, throw_exception=False)
         if not doc:
-            doc = self.__insert_file_metadata(user_did, app_did, path, local_path, cid, **kwargs)
-            cid_ref.increase()
+            doc = self.__insert_file_metadata(user_did, app_did, path, local_path, cid, sha256=sha256, **kwargs)
+            IpfsCidRef(cid).increase()
             increased_size = doc[SIZE]
         elif doc[COL_IPFS_FILES_IPFS_CID] != cid:
-            new_size = self.__update_file_metadata(user_did, app_did, path, local_path, cid, **kwargs)
-            cid_ref.increase()
-            IpfsCidRef(doc[COL_IPFS_FILES_IPFS_CID]).decrease()
+            new_size = self.__update_file_metadata(user_did, app_did, path, local_path, cid, sha256=sha256, **kwargs)
+            IpfsCidRef.update_counts({cid: 1, doc[COL_IPFS_FILES_IPFS_CID]: -1})
             increased_size = new_size - doc[SIZE]
 
         if increased_size and not only_import:
@@ -223,12 +226,12 @@ class IpfsFiles:
 
         return cid
 
-    def __insert_file_metadata(self, user_did, app_did, rel_path: str, file_path: Path, cid: str, **kwargs):
+    def __insert_file_metadata(self, user_did, app_did, rel_path: str, file_path: Path, cid: str, sha256=None, **kwargs):
         metadata = {
             USR_DID: user_did,
             APP_DID: app_did,
             COL_IPFS_FILES_PATH: rel_path,
-            COL_IPFS_FILES_SHA256: fm.get_file_content_sha256(file_path),
+            COL_IPFS_FILES_SHA256: sha256 if sha256 else fm.get_file_content_sha256(file_path),
             COL_IPFS_FILES_IS_FILE: True,
             SIZE: file_path.stat().st_size,
             COL_IPFS_FILES_IPFS_CID: cid,
@@ -237,10 +240,10 @@ class IpfsFiles:
         logging.info(f'[ipfs-files] Add a new file {rel_path}')
         return metadata
 
-    def __update_file_metadata(self, user_did, app_did, rel_path: str, file_path: Path, cid: str, **kwargs):
+    def __update_file_metadata(self, user_did, app_did, rel_path: str, file_path: Path, cid: str, sha256=None, **kwargs):
         col_filter = {USR_DID: user_did, APP_DID: app_did, COL_IPFS_FILES_PATH: rel_path}
         size = file_path.stat().st_size
-        updated_metadata = {'$set': {COL_IPFS_FILES_SHA256: fm.get_file_content_sha256(file_path),
+        updated_metadata = {'$set': {COL_IPFS_FILES_SHA256: sha256 if sha256 else fm.get_file_content_sha256(file_path),
                             SIZE: size,
                             COL_IPFS_FILES_IPFS_CID: cid}}
         result = cli.update_one(user_did, app_did, COL_IPFS_FILES, col_filter, updated_metadata, is_extra=True, **kwargs)
@@ -274,7 +277,7 @@ class IpfsFiles:
         cached_file = fm.ipfs_get_cache_root(user_did) / metadata[COL_IPFS_FILES_IPFS_CID]
         if not cached_file.exists():
             fm.ipfs_download_file_to_path(metadata[COL_IPFS_FILES_IPFS_CID], cached_file)
-        return fm.get_response_by_file_path(cached_file)
+        return fm.get_response_by_file_path(cached_file, metadata=metadata)
 
     def move_copy_file(self, user_did, app_did, src_path, dst_path, is_copy=False):
         """ Move/Copy file with the following steps:
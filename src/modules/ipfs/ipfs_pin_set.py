@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.settings import hive_setting
+from src.utils.file_manager import fm, IPFS_BATCH_SIZE
+
+
+class IpfsPinSet:
+    def __init__(self, cids: list, is_unpin=False, max_workers=None, on_checkpoint=None):
+        """ Pin or unpin a set of CIDs on the local IPFS node by the batches with a bounded worker pool.
+
+        :param cids: The CIDs to be handled, the order is kept for the checkpoint.
+        :param max_workers: The count of the concurrent batches, default is IPFS_PIN_WORKERS.
+        :param on_checkpoint: Called with the count of the leading CIDs which have been finished.
+        """
+        self.cids = cids
+        self.is_unpin = is_unpin
+        self.max_workers = max(1, max_workers or hive_setting.IPFS_PIN_WORKERS)
+        self.on_checkpoint = on_checkpoint
+
+        self.finished_batches = set()
+        self.next_batch = 0
+        self.finished_count = 0
+
+    def execute(self):
+        """ Handle all CIDs, raise the first error after the running batches done. """
+        batches = [self.cids[i:i + IPFS_BATCH_SIZE] for i in range(0, len(self.cids), IPFS_BATCH_SIZE)]
+        if not batches:
+            return
+
+        handle = fm.ipfs_pin_cids if not self.is_unpin else fm.ipfs_unpin_cids
+        with ThreadPoolExecutor(min(self.max_workers, len(batches))) as executor:
+            futures = {executor.submit(handle, batch): index for index, batch in enumerate(batches)}
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    self.__finish_batch(futures[future], batches)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        logging.info(f'[IpfsPinSet] Success to {"pin" if not self.is_unpin else "unpin"} {len(self.cids)} CIDs.')
+
+    def __finish_batch(self, index, batches):
+        """ only the continuous finished batches from the beginning are recorded as the checkpoint """
+        self.finished_batches.add(index)
+        if self.next_batch not in self.finished_batches:
+            return
+
+        while self.next_batch in self.finished_batches:
+            self.finished_count += len(batches[self.next_batch])
+            self.next_batch += 1
+
+        if self.on_checkpoint:
+            self.on_checkpoint(self.finished_count)
@@ -12,11 +12,18 @@ import base58
 from flask import g
 
 from src import hive_setting
+from src.modules.database.usage import usage_accountant
+from src.modules.ipfs.backup_job_queue import backup_job_queue, backup_server_job_queue
 from src.modules.ipfs.ipfs_backup_server import IpfsBackupServer
 from src.modules.payment.order import OrderManager
+from src.modules.scripting.script_cache import script_cache
 from src.modules.subscription.subscription import VaultSubscription
+from src.modules.subscription.vault_cache import vault_cache
 from src.utils.consts import COL_IPFS_BACKUP_SERVER, USR_DID
 from src.utils.db_client import cli
+from src.utils.http_client import session_pool
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils.token_cache import token_cache
 from src.utils.http_exception import ForbiddenException, VaultNotFoundException, BackupNotFoundException, \
     ReceiptNotFoundException
 from src.utils_v1.constants import DID_INFO_DB_NAME, VAULT_SERVICE_COL, VAULT_SERVICE_DID, VAULT_SERVICE_PRICING_USING, \
@@ -84,6 +91,21 @@ class Provider:
             'orders': [o.to_get_receipts() for o in receipts]
         }
 
+    def get_metrics(self):
+        self.check_auth_owner_id()
+        return {
+            "database_usage": usage_accountant.get_metrics(),
+            "mongodb_pool": mongodb_pool.get_stats(),
+            "token_cache": token_cache.get_metrics(),
+            "script_cache": script_cache.get_metrics(),
+            "vault_cache": vault_cache.get_metrics(),
+            "http_client": session_pool.get_stats(),
+            "backup_jobs": {
+                "backup": backup_job_queue.get_metrics(),
+                "backup_server": backup_server_job_queue.get_metrics(),
+            },
+        }
+
     def check_auth_owner_id(self):
         if g.usr_did != self.owner_did:
             raise ForbiddenException('No permission for accessing node information.')
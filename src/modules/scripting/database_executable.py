@@ -1,14 +1,12 @@
-import json
-
-from bson import json_util
-
-from src.modules.scripting.executable import Executable, get_populated_value_with_params
+from src.modules.database.pagination import PageQuery
+from src.modules.scripting.executable import Executable
+from src.utils.extended_json import to_json_value
 from src.modules.scripting.scripting import Script
 
 
 class DatabaseExecutable(Executable):
-    def __init__(self, script: Script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script: Script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def get_collection_name(self):
         return self.body['collection']
@@ -17,40 +15,44 @@ class DatabaseExecutable(Executable):
         return self.mcli.get_user_collection(self.get_target_did(), self.get_target_app_did(), self.get_collection_name())
 
     def get_populated_filter(self):
-        return get_populated_value_with_params(self.body.get('filter', {}), self.get_user_did(), self.get_app_did(), self.get_params())
+        return self.get_populated_body_value('filter')
 
     def get_populated_document(self):
-        return get_populated_value_with_params(self.body.get('document', {}), self.get_user_did(), self.get_app_did(), self.get_params())
+        return self.get_populated_body_value('document')
 
     def get_populated_update(self):
-        return get_populated_value_with_params(self.body.get('update', {}), self.get_user_did(), self.get_app_did(), self.get_params())
+        return self.get_populated_body_value('update')
 
     def get_options(self):
         return self.body.get('options', {})
 
     def get_populated_options(self):
-        return get_populated_value_with_params(self.get_options(), self.get_user_did(), self.get_app_did(), self.get_params())
+        return self.get_populated_body_value('options')
 
 
 class FindExecutable(DatabaseExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did())
 
         filter_, options = self.get_populated_filter(), self.get_populated_options()
+
+        # the total count is returned by default for compatibility
+        options['total'] = options.get('total', True)
+
         col = self.get_target_user_collection()
-        items = col.find_many(filter_, **options)
-        total = col.count(filter_)
+        result = PageQuery(col, filter_, options).execute()
 
-        # json decode&encode is used for ObjectId or other mongo data types.
-        return self.get_result_data({'total': total, 'items': json.loads(json_util.dumps(items))})
+        # convert ObjectId or other mongo data types.
+        result['items'] = to_json_value(result['items'])
+        return self.get_result_data(result)
 
 
 class CountExecutable(DatabaseExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did())
@@ -62,8 +64,8 @@ class CountExecutable(DatabaseExecutable):
 
 
 class InsertExecutable(DatabaseExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did()).check_write_permission().check_storage_full()
@@ -79,8 +81,8 @@ class InsertExecutable(DatabaseExecutable):
 
 
 class UpdateExecutable(DatabaseExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did()).check_write_permission().check_storage_full()
@@ -96,8 +98,8 @@ class UpdateExecutable(DatabaseExecutable):
 
 
 class DeleteExecutable(DatabaseExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did()).check_write_permission()
@@ -37,6 +37,35 @@ def validate_exists(json_data, properties, parent_name=None):
             raise InvalidParameterException(f'Invalid parameter: "{str(json_data)}" ("{prop}" not exist)')
 
 
+def populate_str_value(value: str, user_did, app_did, params):
+    """ Replace the string value which is one of:
+
+        - "$params.<parameter name>" (str) -> value (any type)
+        - "$caller_did" -> did
+        - "$caller_app_did" -> app_did
+    """
+    if value == SCRIPTING_EXECUTABLE_CALLER_DID:
+        if not user_did:
+            raise InvalidParameterException(f"Can not find caller's 'user_did' as '$caller_did' exists in script.")
+        return user_did
+    elif value == SCRIPTING_EXECUTABLE_CALLER_APP_DID:
+        if not app_did:
+            raise InvalidParameterException(f"Can not find caller's 'app_did' as '$caller_app_did' exists in script.")
+        return app_did
+    elif value.startswith(f"{SCRIPTING_EXECUTABLE_PARAMS}."):
+        p = value.replace(f"{SCRIPTING_EXECUTABLE_PARAMS}.", "")
+        if p not in params:
+            raise InvalidParameterException(f'Can not find "{p}" of "params" for the script.')
+        return params[p]
+    return value
+
+
+def is_populated_str_value(value) -> bool:
+    """ If the value will be replaced by populate_str_value() """
+    return isinstance(value, str) and (value in (SCRIPTING_EXECUTABLE_CALLER_DID, SCRIPTING_EXECUTABLE_CALLER_APP_DID)
+                                       or value.startswith(f"{SCRIPTING_EXECUTABLE_PARAMS}."))
+
+
 def get_populated_value_with_params(data, user_did, app_did, params):
     """ Do some 'value' replacement on options (dict), 'key' will not change.
     "options" will be updated.
@@ -57,20 +86,7 @@ def get_populated_value_with_params(data, user_did, app_did, params):
         elif isinstance(value, list):  # tuple can not change the element, so skip
             return get_populated_value_with_params(value, user_did, app_did, params)
         elif isinstance(value, str):
-            if value == SCRIPTING_EXECUTABLE_CALLER_DID:
-                if not user_did:
-                    raise InvalidParameterException(f"Can not find caller's 'user_did' as '$caller_did' exists in script.")
-                return user_did
-            elif value == SCRIPTING_EXECUTABLE_CALLER_APP_DID:
-                if not app_did:
-                    raise InvalidParameterException(f"Can not find caller's 'app_did' as '$caller_app_did' exists in script.")
-                return app_did
-            elif value.startswith(f"{SCRIPTING_EXECUTABLE_PARAMS}."):
-                p = value.replace(f"{SCRIPTING_EXECUTABLE_PARAMS}.", "")
-                if p not in params:
-                    raise InvalidParameterException(f'Can not find "{p}" of "params" for the script.')
-                return params[p]
-            return value
+            return populate_str_value(value, user_did, app_did, params)
         else:
             return value
 
@@ -83,20 +99,62 @@ def get_populated_value_with_params(data, user_did, app_did, params):
     return data
 
 
+def get_param_slots(data, path=()) -> list:
+    """ Get the paths of the values which will be replaced by get_populated_value_with_params().
+
+    The slots are computed once when compiling the script, then running the script only replaces the values on them.
+
+    :return: [(key or index, ...)]
+    """
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        return []
+
+    slots = []
+    for k, v in items:
+        if isinstance(v, (dict, list)):
+            slots.extend(get_param_slots(v, path + (k, )))
+        elif is_populated_str_value(v):
+            slots.append(path + (k, ))
+    return slots
+
+
+def get_populated_value_with_slots(data, slots, user_did, app_did, params):
+    """ Same as get_populated_value_with_params(), but only replace the values on the slots from get_param_slots().
+    "data" will be updated.
+    """
+    if not data or not params:
+        return data
+
+    for slot in slots:
+        parent = data
+        for k in slot[:-1]:
+            parent = parent[k]
+        parent[slot[-1]] = populate_str_value(parent[slot[-1]], user_did, app_did, params)
+    return data
+
+
 class Executable:
     """ Executable represents an action which contains operation for database and files. """
 
-    def __init__(self, script, executable_data):
+    def __init__(self, script, executable_data, slots=None):
+        """ :param slots: {body key: slots}, the slots of the values in the body to be populated, see get_param_slots() """
         self.script = script
         self.name = executable_data['name']
         self.body = executable_data['body']
+        self.slots = slots if slots is not None else Executable.get_body_slots(self.body)
 
         # If execute this executable with output or not.
         self.output = executable_data.get('output', True)
 
-        self.ipfs_files = IpfsFiles()
-        self.vault_manager = VaultManager()
-        self.mcli = MongodbClient()
+        # share the service objects of the scripting for all executables
+        scripting = script.scripting
+        self.ipfs_files = scripting.ipfs_files if scripting else IpfsFiles()
+        self.vault_manager = scripting.vault_manager if scripting else VaultManager()
+        self.mcli = scripting.mcli if scripting else MongodbClient()
 
     def execute(self):
         # Override
@@ -117,6 +175,17 @@ class Executable:
     def get_params(self):
         return self.script.params
 
+    def get_populated_body_value(self, key):
+        """ get the value of the body with the parameters populated, the body MUST be owned by this executable """
+        return get_populated_value_with_slots(self.body.get(key, {}), self.slots.get(key, []),
+                                              self.get_user_did(), self.get_app_did(), self.get_params())
+
+    @staticmethod
+    def get_body_slots(body) -> dict:
+        if not isinstance(body, dict):
+            return {}
+        return {k: slots for k, slots in ((k, get_param_slots(v)) for k, v in body.items()) if slots}
+
     def get_result_data(self, data):
         """ for response with the option 'is_output' of the executable """
         return data if self.output else None
@@ -186,35 +255,39 @@ class Executable:
 
     @staticmethod
     def create_executables(script, executable_data) -> ['Executable']:
+        return [cls(script, data, slots) for cls, data, slots in Executable.create_plan(executable_data)]
+
+    @staticmethod
+    def create_plan(executable_data) -> list:
+        """ Flatten the executable data to the plan which can be used to create the executables later.
+
+        :return: [(executable class, executable data, body slots)]
+        """
         result = []
-        Executable.__create(result, script, executable_data)
+        Executable.__create(result, executable_data)
         return result
 
     @staticmethod
-    def __create(result, script, executable_data):
+    def __create(result, executable_data):
         from src.modules.scripting.database_executable import FindExecutable, InsertExecutable, UpdateExecutable, DeleteExecutable, CountExecutable
         from src.modules.scripting.file_executable import FileUploadExecutable, FileDownloadExecutable, FilePropertiesExecutable, FileHashExecutable
 
+        classes = {
+            SCRIPTING_EXECUTABLE_TYPE_FIND: FindExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_COUNT: CountExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_INSERT: InsertExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_UPDATE: UpdateExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_DELETE: DeleteExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_FILE_UPLOAD: FileUploadExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_FILE_DOWNLOAD: FileDownloadExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_FILE_PROPERTIES: FilePropertiesExecutable,
+            SCRIPTING_EXECUTABLE_TYPE_FILE_HASH: FileHashExecutable,
+        }
+
         executable_type = executable_data['type']
         executable_body = executable_data['body']
         if executable_type == SCRIPTING_EXECUTABLE_TYPE_AGGREGATED:
             for data in executable_body:
-                Executable.__create(result, script, data)
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_FIND:
-            result.append(FindExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_COUNT:
-            result.append(CountExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_INSERT:
-            result.append(InsertExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_UPDATE:
-            result.append(UpdateExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_DELETE:
-            result.append(DeleteExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_FILE_UPLOAD:
-            result.append(FileUploadExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_FILE_DOWNLOAD:
-            result.append(FileDownloadExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_FILE_PROPERTIES:
-            result.append(FilePropertiesExecutable(script, executable_data))
-        elif executable_type == SCRIPTING_EXECUTABLE_TYPE_FILE_HASH:
-            result.append(FileHashExecutable(script, executable_data))
+                Executable.__create(result, data)
+        elif executable_type in classes:
+            result.append((classes[executable_type], executable_data, Executable.get_body_slots(executable_body)))
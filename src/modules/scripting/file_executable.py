@@ -8,8 +8,8 @@ from src.modules.scripting.scripting import Script
 
 
 class FileExecutable(Executable):
-    def __init__(self, script: Script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script: Script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def get_populated_path(self) -> str:
         value = self.body.get('path')
@@ -47,24 +47,24 @@ class FileExecutable(Executable):
 
 
 class FileUploadExecutable(FileExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         return self.get_result_data(self._create_transaction('upload'))
 
 
 class FileDownloadExecutable(FileExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         return self.get_result_data(self._create_transaction('download'))
 
 
 class FilePropertiesExecutable(FileExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did())
@@ -81,8 +81,8 @@ class FilePropertiesExecutable(FileExecutable):
 
 
 class FileHashExecutable(FileExecutable):
-    def __init__(self, script, executable_data):
-        super().__init__(script, executable_data)
+    def __init__(self, script, executable_data, slots=None):
+        super().__init__(script, executable_data, slots)
 
     def execute(self):
         self.vault_manager.get_vault(self.get_target_did())
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+The cache of the compiled scripts.
+"""
+import threading
+from collections import OrderedDict
+
+from src.settings import hive_setting
+
+
+class ScriptCache:
+    """ Bounded LRU cache of the compiled scripts to avoid loading and parsing the script content on every running.
+
+    The key is (target_did, target_app_did, name, version). The version of the script is changed on every registering,
+    so the caller checks the version of the script in the database (a light query) before getting the compiled one.
+    This makes the other workers (processes) also find the changed and deleted scripts.
+    Only the latest version of the script is kept.
+
+    The compiled script is shared by the requests, and MUST NOT be changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # (target_did, target_app_did, name): (version, compiled script)
+        self.items = OrderedDict()
+
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'evictions': 0,
+        }
+
+    def get(self, target_did, target_app_did, name, version):
+        """ get the compiled script, None if not cached or the cached one is not the version """
+        key = (target_did, target_app_did, name)
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item[0] == version:
+                self.items.move_to_end(key)
+                self.metrics['hits'] += 1
+                return item[1]
+
+            self.metrics['misses'] += 1
+            return None
+
+    def put(self, target_did, target_app_did, name, version, compiled):
+        with self.lock:
+            self.items[(target_did, target_app_did, name)] = version, compiled
+            self.items.move_to_end((target_did, target_app_did, name))
+            while len(self.items) > hive_setting.SCRIPT_CACHE_SIZE:
+                self.items.popitem(last=False)
+                self.metrics['evictions'] += 1
+
+    def invalidate(self, target_did, target_app_did, name):
+        """ remove the script of the current worker when it is registered or deleted """
+        with self.lock:
+            if self.items.pop((target_did, target_app_did, name), None) is not None:
+                self.metrics['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['size'] = len(self.items)
+
+        metrics['capacity'] = hive_setting.SCRIPT_CACHE_SIZE
+        total = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / total, 4) if total else 0
+        return metrics
+
+
+script_cache = ScriptCache()
@@ -3,19 +3,24 @@
 """
 The main handling file of scripting module.
 """
+import copy
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import jwt
 from flask import request, g
 from bson import ObjectId
 
 from src import hive_setting
-from src.utils_v1.constants import SCRIPTING_SCRIPT_COLLECTION, SCRIPTING_SCRIPT_TEMP_TX_COLLECTION
+from src.utils import extended_json
+from src.utils_v1.constants import SCRIPTING_SCRIPT_COLLECTION, SCRIPTING_SCRIPT_TEMP_TX_COLLECTION, SCRIPTING_SCRIPT_VERSION
 from src.utils.http_exception import BadRequestException, ScriptNotFoundException, UnauthorizedException, InvalidParameterException
 from src.modules.database.mongodb_client import MongodbClient
 from src.modules.ipfs.ipfs_files import IpfsFiles
 from src.modules.subscription.vault import VaultManager
 from src.modules.scripting.executable import Executable, get_populated_value_with_params, validate_exists
+from src.modules.scripting.script_cache import script_cache
 
 _DOLLAR_REPLACE = '%%'
 
@@ -44,12 +49,30 @@ def fix_dollar_keys_recursively(data, is_save=True):
 
 
 class Condition:
+    """ The condition of the script which is checked before running the executables.
+
+    The 'and' and 'or' conditions stop checking the sub-conditions once the result is decided.
+    The 'queryHasResults' condition only probes one document, and its result is kept for the request,
+    so the same query in the condition runs only once.
+
+    When SCRIPT_CONDITION_WORKERS > 0, the 'queryHasResults' sub-conditions of one 'and' or 'or' condition
+    are checked concurrently, and the error of the query is raised only if the result can not be decided
+    by other ones.
+    """
+
+    # the pool to run the queries of the conditions concurrently, shared by the requests
+    _pool = None
+    _pool_lock = threading.Lock()
+
     def __init__(self, params):
         self.user_did = g.usr_did
         self.app_did = g.app_did
         self.params = params
         self.mcli = MongodbClient()
 
+        # query key: bool
+        self.results = {}
+
     @staticmethod
     def validate_data(json_data):
         """ Validate the condition data, can not nest than 5 layers.
@@ -87,19 +110,73 @@ class Condition:
             return True
 
         type_, body = condition_data['type'], condition_data['body']
-        if type_ == 'or':
-            return any([self.is_satisfied(data, context) for data in body])
-        elif type_ == 'and':
-            return all([self.is_satisfied(data, context) for data in body])
-
-        # type: 'queryHasResults'
-
+        if type_ not in ('or', 'and'):
+            # type: 'queryHasResults'
+            return self.__get_query_result(self.__get_query(body, context))
+
+        # 'or' is decided by the first True, 'and' is decided by the first False
+        decisive = type_ == 'or'
+        if self.__get_pool():
+            queries = {}
+            for query in [self.__get_query(data['body'], context) for data in body if data['type'] not in ('or', 'and')]:
+                queries.setdefault(query[0], query)
+            if len([k for k in queries if k not in self.results]) > 1:
+                if self.__is_decided_concurrently(list(queries.values()), decisive):
+                    return decisive
+                body = [data for data in body if data['type'] in ('or', 'and')]
+
+        for data in body:
+            if self.is_satisfied(data, context) == decisive:
+                return decisive
+        return not decisive
+
+    def __get_query(self, body, context):
+        """ :return: (key, context, col_name, col_filter, options), the key is for caching the result """
         # 'options' is for internal
         col_name, options = body['collection'], body.get('options', {})
-        col_filter = get_populated_value_with_params(body.get('filter', {}), self.user_did, self.app_did, self.params)
+        col_filter = get_populated_value_with_params(copy.deepcopy(body.get('filter', {})), self.user_did, self.app_did, self.params)
+        key = extended_json.dumps([context.target_did, context.target_app_did, col_name, col_filter, options])
+        return key, context, col_name, col_filter, options
 
-        col = self.mcli.get_user_collection(context.target_did, context.target_app_did, col_name)
-        return col.count(col_filter, **options) > 0
+    def __get_query_result(self, query) -> bool:
+        key, context, col_name, col_filter, options = query
+        if key not in self.results:
+            col = self.mcli.get_user_collection(context.target_did, context.target_app_did, col_name)
+            self.results[key] = col.exists(col_filter, skip=options.get('skip', 0), maxTimeMS=options.get('maxTimeMS'))
+        return self.results[key]
+
+    def __is_decided_concurrently(self, queries, decisive) -> bool:
+        """ Run the queries concurrently.
+
+        :return: True if any query result is 'decisive', the others are cancelled if not started.
+        """
+        futures = [self.__get_pool().submit(self.__get_query_result, q) for q in queries]
+        error = None
+        try:
+            for future in as_completed(futures):
+                try:
+                    if future.result() == decisive:
+                        return True
+                except Exception as e:
+                    error = error or e
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if error:
+            raise error
+        return False
+
+    @classmethod
+    def __get_pool(cls):
+        workers = hive_setting.SCRIPT_CONDITION_WORKERS
+        if workers <= 0:
+            return None
+
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(workers, thread_name_prefix='script-condition')
+            return cls._pool
 
 
 class Context:
@@ -130,10 +207,53 @@ class Context:
         if not self.target_did or not self.target_app_did:
             raise BadRequestException(f"target_did and target_app_did MUST be provided when do anonymous access.")
 
-    def get_script_data(self, script_name):
-        """ get the script data by target_did and target_app_did """
+    def get_compiled_script(self, script_name) -> 'CompiledScript':
+        """ get the compiled script by target_did and target_app_did, None if not exists.
+
+        Only the version of the script is loaded if the compiled one has been cached.
+        """
         col = self.mcli.get_user_collection(self.target_did, self.target_app_did, SCRIPTING_SCRIPT_COLLECTION, create_on_absence=True)
-        return col.find_one({'name': script_name})
+        doc = col.find_one({'name': script_name}, projection={SCRIPTING_SCRIPT_VERSION: True})
+        if not doc:
+            script_cache.invalidate(self.target_did, self.target_app_did, script_name)
+            return None
+
+        # the script registered before the version introduced is not cached
+        version = doc.get(SCRIPTING_SCRIPT_VERSION)
+        compiled = script_cache.get(self.target_did, self.target_app_did, script_name, version) if version else None
+        if compiled:
+            return compiled
+
+        script_data = col.find_one({'name': script_name})
+        if not script_data:
+            return None
+
+        compiled = CompiledScript(script_data)
+        if compiled.version:
+            script_cache.put(self.target_did, self.target_app_did, script_name, compiled.version, compiled)
+        return compiled
+
+
+class CompiledScript:
+    """ The script data which is ready to run, it's cached and shared by the requests, so MUST NOT be changed.
+
+    The keys with '$' are restored, and the executables are flattened to the plan with the slots of the values
+    to be populated by the parameters.
+    """
+
+    def __init__(self, script_data):
+        # Reverse the script content to let the key contains '$'
+        fix_dollar_keys_recursively(script_data, is_save=False)
+
+        self.version = script_data.get(SCRIPTING_SCRIPT_VERSION)
+        self.allow_anonymous_user = script_data.get('allowAnonymousUser', False)
+        self.allow_anonymous_app = script_data.get('allowAnonymousApp', False)
+        self.condition = script_data.get('condition')
+        self.plan = Executable.create_plan(script_data['executable'])
+
+    def create_executables(self, script) -> ['Executable']:
+        """ every executable owns the copy of the executable data because running changes it """
+        return [cls(script, copy.deepcopy(data), slots) for cls, data, slots in self.plan]
 
 
 class Script:
@@ -238,28 +358,25 @@ class Script:
         """
         self.context.check_target_dids()
 
-        script_data = self.context.get_script_data(self.name)
-        if not script_data:
+        compiled = self.context.get_compiled_script(self.name)
+        if not compiled:
             raise BadRequestException(f"Can't get the script with name '{self.name}'")
 
-        self.anonymous_app = script_data.get('allowAnonymousUser', False)
-        self.anonymous_user = script_data.get('allowAnonymousApp', False)
+        self.anonymous_app = compiled.allow_anonymous_user
+        self.anonymous_user = compiled.allow_anonymous_app
 
         # The feature support that the script can be run without access token when two anonymous options are all True
         anonymous_access = self.anonymous_app and self.anonymous_user
         if not anonymous_access and g.token_error is not None:
             raise UnauthorizedException(f'Parse access token for running script error: {g.token_error}')
 
-        # Reverse the script content to let the key contains '$'
-        fix_dollar_keys_recursively(script_data, is_save=False)
-
         # condition checking for all executables
         condition = Condition(self.params)
-        if not condition.is_satisfied(script_data.get('condition'), self.context):
+        if not condition.is_satisfied(compiled.condition, self.context):
             raise BadRequestException("Caller can't match the condition.")
 
         # run executables and get the results
-        executables: [Executable] = Executable.create_executables(self, script_data['executable'])
+        executables: [Executable] = compiled.create_executables(self)
         # executable_name: executable_result ( MUST not None ), this is for the executable option 'is_out'
         return {k: v for k, v in {e.name: e.execute() for e in executables}.items() if v is not None}
 
@@ -302,9 +419,12 @@ class Scripting:
     def __upsert_script_to_database(self, script_name, json_data, user_did, app_did):
         fix_dollar_keys_recursively(json_data)
         json_data['name'] = script_name
+        json_data[SCRIPTING_SCRIPT_VERSION] = str(ObjectId())
 
         col = self.mcli.get_user_collection(user_did, app_did, SCRIPTING_SCRIPT_COLLECTION, create_on_absence=True)
-        return col.replace_one({"name": script_name}, json_data)
+        result = col.replace_one({"name": script_name}, json_data)
+        script_cache.invalidate(user_did, app_did, script_name)
+        return result
 
     def delete_script(self, script_name):
         """ :v2 API: """
@@ -312,6 +432,7 @@ class Scripting:
 
         col = self.mcli.get_user_collection(g.usr_did, g.app_did, SCRIPTING_SCRIPT_COLLECTION, create_on_absence=True)
         result = col.delete_one({'name': script_name})
+        script_cache.invalidate(g.usr_did, g.app_did, script_name)
 
         if result['deleted_count'] <= 0:
             raise ScriptNotFoundException(f'The script {script_name} does not exist.')
@@ -15,6 +15,7 @@ from src.modules.auth.auth import Auth
 from src.modules.auth.user import UserManager
 from src.modules.payment.order import OrderManager
 from src.modules.subscription.vault import VaultManager, Vault
+from src.modules.subscription.vault_cache import vault_cache
 from src.utils.consts import IS_UPGRADED
 from src.utils_v1.constants import DID_INFO_DB_NAME, VAULT_SERVICE_COL, VAULT_SERVICE_DID, VAULT_SERVICE_MAX_STORAGE, \
     VAULT_SERVICE_FILE_USE_STORAGE, VAULT_SERVICE_DB_USE_STORAGE, VAULT_SERVICE_START_TIME, VAULT_SERVICE_END_TIME, \
@@ -89,6 +90,7 @@ class VaultSubscription(metaclass=Singleton):
         # self.user_manager.remove_user(g.usr_did)
 
         cli.delete_one_origin(DID_INFO_DB_NAME, VAULT_SERVICE_COL, {VAULT_SERVICE_DID: g.usr_did}, is_check_exist=False)
+        vault_cache.invalidate(g.usr_did)
 
     def activate(self):
         """ :v2 API: """
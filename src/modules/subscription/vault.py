@@ -4,6 +4,7 @@ from datetime import datetime
 from src import hive_setting
 from src.modules.auth.user import UserManager
 from src.modules.database.mongodb_client import MongodbClient, Dotdict
+from src.modules.subscription.vault_cache import vault_cache
 from src.utils.consts import COL_IPFS_FILES
 from src.utils.http_exception import InsufficientStorageException, VaultNotFoundException, CollectionNotFoundException, VaultFrozenException
 from src.utils_v1.constants import VAULT_SERVICE_MAX_STORAGE, VAULT_SERVICE_DB_USE_STORAGE, VAULT_SERVICE_COL, \
@@ -105,12 +106,16 @@ class VaultManager:
 
             vault_manager.get_vault(user_did).check_storage_full().check_write_permission()
 
+        The vault is got once in one request and cached for VAULT_CACHE_TTL seconds, see VaultCache.
         """
 
-        vault = self.__only_get_vault(user_did)
+        doc = vault_cache.get(user_did)
+        if doc is None:
+            doc = self.__only_get_vault(user_did)
+            vault_cache.put(user_did, doc)
 
         # try to revert to free package plan
-        return self.__try_to_downgrade_to_free(user_did, vault)
+        return self.__try_to_downgrade_to_free(user_did, Vault(**doc))
 
     def __only_get_vault(self, user_did):
         """ common method to all other method in this class """
@@ -141,6 +146,7 @@ class VaultManager:
 
         col = self.mcli.get_management_collection(VAULT_SERVICE_COL)
         col.update_one(filter_, {'$set': update}, contains_extra=False)
+        vault_cache.invalidate(user_did)
 
     def __try_to_downgrade_to_free(self, user_did, vault: Vault):
         if PaymentConfig.is_free_plan(vault.get_plan_name()):
@@ -151,15 +157,18 @@ class VaultManager:
 
         # downgrade now
         self.upgrade(user_did, PaymentConfig.get_free_vault_plan(), vault=vault)
-        return self.__only_get_vault(user_did)
+        vault = self.__only_get_vault(user_did)
+        vault_cache.put(user_did, vault)
+        return Vault(**vault)
 
-    def recalculate_user_databases_size(self, user_did: str):
-        """ Update all databases used size in vault """
+    def recalculate_user_databases_size(self, user_did: str) -> int:
+        """ Update all databases used size in vault and return the real size """
         # Get all application DIDs of user DID, then get their sizes.
         app_dids = self.user_manager.get_apps(user_did)
         size = sum(list(map(lambda d: self.mcli.get_user_database_size(user_did, d), app_dids)))
 
         self.update_user_databases_size(user_did, size, is_reset=True)
+        return size
 
     def get_user_database_size(self, user_did, app_did):
         return self.mcli.get_user_database_size(user_did, app_did)
@@ -197,8 +206,10 @@ class VaultManager:
 
         col = self.mcli.get_management_collection(VAULT_SERVICE_COL)
         col.update_one(filter_, update, contains_extra=False)
+        vault_cache.invalidate(user_did)
 
     def update_vault_latest_access_time(self, user_did: str):
+        """ the cached vault is not invalidated because the latest access time is not used by checking """
         filter_ = {VAULT_SERVICE_DID: user_did}
         update = {'$set': {VAULT_SERVICE_LATEST_ACCESS_TIME: int(datetime.now().timestamp())}}
 
@@ -215,6 +226,7 @@ class VaultManager:
 
         col = self.mcli.get_management_collection(VAULT_SERVICE_COL)
         col.update_one(filter_, update, contains_extra=False)
+        vault_cache.invalidate(user_did)
 
     def drop_vault_data(self, user_did):
         """ drop all data belong to user, include files and databases """
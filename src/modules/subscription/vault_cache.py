@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+The cache of the vaults.
+"""
+import threading
+import time
+
+from flask import g, has_request_context
+
+from src.settings import hive_setting
+
+
+class VaultCache:
+    """ Cache of the vault documents to avoid querying the vault on every checking.
+
+    There are two levels:
+
+    - request: the vault is got at most once in one request, no matter how many executables or services check it.
+    - worker: the vault is kept for VAULT_CACHE_TTL seconds across the requests (0 means disabled).
+
+    The node's own changes of the vault (upgrade, freeze, usage, remove) MUST call 'invalidate()'.
+    The changes by other workers are found after VAULT_CACHE_TTL seconds.
+
+    The cached documents MUST NOT be changed, the caller gets a copy by 'Vault(**doc)'.
+    """
+
+    # the max count of the vaults kept across the requests
+    MAX_SIZE = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # user_did: (doc, load_time)
+        self.items = {}
+
+        self.metrics = {
+            'hits': 0,
+            'request_hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+        }
+
+    @staticmethod
+    def __get_request_vaults():
+        if not has_request_context():
+            return None
+        if 'vaults' not in g:
+            g.vaults = {}
+        return g.vaults
+
+    def get(self, user_did):
+        """ get the vault document, None if not cached or expired """
+        vaults = self.__get_request_vaults()
+        if vaults is not None and user_did in vaults:
+            with self.lock:
+                self.metrics['request_hits'] += 1
+            return vaults[user_did]
+
+        with self.lock:
+            doc, load_time = self.items.get(user_did, (None, 0))
+            if doc is not None and time.time() - load_time < hive_setting.VAULT_CACHE_TTL:
+                self.metrics['hits'] += 1
+            else:
+                doc = None
+                self.metrics['misses'] += 1
+
+        if doc is not None and vaults is not None:
+            vaults[user_did] = doc
+        return doc
+
+    def put(self, user_did, doc):
+        vaults = self.__get_request_vaults()
+        if vaults is not None:
+            vaults[user_did] = doc
+
+        if hive_setting.VAULT_CACHE_TTL <= 0:
+            return
+
+        now = time.time()
+        with self.lock:
+            if len(self.items) >= self.MAX_SIZE:
+                self.items = {k: v for k, v in self.items.items() if now - v[1] < hive_setting.VAULT_CACHE_TTL}
+                if len(self.items) >= self.MAX_SIZE:
+                    return
+            self.items[user_did] = doc, now
+
+    def invalidate(self, user_did):
+        """ the vault is changed by this worker """
+        vaults = self.__get_request_vaults()
+        if vaults is not None:
+            vaults.pop(user_did, None)
+
+        with self.lock:
+            self.items.pop(user_did, None)
+            self.metrics['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['size'] = len(self.items)
+
+        metrics['ttl'] = hive_setting.VAULT_CACHE_TTL
+        return metrics
+
+
+vault_cache = VaultCache()
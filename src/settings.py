@@ -116,6 +116,34 @@ class HiveSetting:
     def MONGODB_URI(self):
         return self.env_config('MONGODB_URI', default='mongodb://hive-mongo:27017', cast=str)
 
+    @property
+    def MONGODB_MAX_POOL_SIZE(self):
+        return self.env_config('MONGODB_MAX_POOL_SIZE', default='100', cast=int)
+
+    @property
+    def MONGODB_MAX_IDLE_TIME_MS(self):
+        return self.env_config('MONGODB_MAX_IDLE_TIME_MS', default='300000', cast=int)
+
+    @property
+    def MONGODB_CONNECT_TIMEOUT_MS(self):
+        return self.env_config('MONGODB_CONNECT_TIMEOUT_MS', default='10000', cast=int)
+
+    @property
+    def MONGODB_SOCKET_TIMEOUT_MS(self):
+        return self.env_config('MONGODB_SOCKET_TIMEOUT_MS', default='0', cast=int)
+
+    @property
+    def MONGODB_WAIT_QUEUE_TIMEOUT_MS(self):
+        return self.env_config('MONGODB_WAIT_QUEUE_TIMEOUT_MS', default='10000', cast=int)
+
+    @property
+    def MONGODB_SERVER_SELECTION_TIMEOUT_MS(self):
+        return self.env_config('MONGODB_SERVER_SELECTION_TIMEOUT_MS', default='30000', cast=int)
+
+    @property
+    def MONGODB_NAMESPACE_CACHE_TTL(self):
+        return self.env_config('MONGODB_NAMESPACE_CACHE_TTL', default='60', cast=int)
+
     @property
     def IPFS_NODE_URL(self):
         return self.env_config('IPFS_NODE_URL', default='http://hive-ipfs:5001', cast=str)
@@ -160,5 +188,81 @@ class HiveSetting:
     def BACKUP_IS_SYNC(self):
         return self.env_config('BACKUP_IS_SYNC', default='False', cast=bool)
 
+    @property
+    def BACKUP_IS_INCREMENTAL(self):
+        return self.env_config('BACKUP_IS_INCREMENTAL', default='True', cast=bool)
+
+    @property
+    def BACKUP_MAX_JOBS(self):
+        return self.env_config('BACKUP_MAX_JOBS', default='2', cast=int)
+
+    @property
+    def DATABASE_USAGE_FLUSH_WINDOW(self):
+        return self.env_config('DATABASE_USAGE_FLUSH_WINDOW', default='5', cast=int)
+
+    @property
+    def USER_APPS_FLUSH_WINDOW(self):
+        return self.env_config('USER_APPS_FLUSH_WINDOW', default='2', cast=int)
+
+    @property
+    def USER_APPS_KNOWN_TTL(self):
+        return self.env_config('USER_APPS_KNOWN_TTL', default='600', cast=int)
+
+    @property
+    def TOKEN_CACHE_SIZE(self):
+        return self.env_config('TOKEN_CACHE_SIZE', default='10000', cast=int)
+
+    @property
+    def DATABASE_MAX_PAGE_SIZE(self):
+        return self.env_config('DATABASE_MAX_PAGE_SIZE', default='1000', cast=int)
+
+    @property
+    def VAULT_CACHE_TTL(self):
+        return self.env_config('VAULT_CACHE_TTL', default='3', cast=int)
+
+    @property
+    def SCRIPT_CACHE_SIZE(self):
+        return self.env_config('SCRIPT_CACHE_SIZE', default='1000', cast=int)
+
+    @property
+    def SCRIPT_CONDITION_WORKERS(self):
+        return self.env_config('SCRIPT_CONDITION_WORKERS', default='0', cast=int)
+
+    @property
+    def DOWNLOAD_SEND_MODE(self):
+        return self.env_config('DOWNLOAD_SEND_MODE', default='stream', cast=str)
+
+    @property
+    def DOWNLOAD_X_ACCEL_PREFIX(self):
+        return self.env_config('DOWNLOAD_X_ACCEL_PREFIX', default='/hive_data', cast=str)
+
+    @property
+    def HTTP_POOL_SIZE(self):
+        return self.env_config('HTTP_POOL_SIZE', default='10', cast=int)
+
+    @property
+    def HTTP_CONNECT_TIMEOUT(self):
+        return self.env_config('HTTP_CONNECT_TIMEOUT', default='5', cast=float)
+
+    @property
+    def HTTP_READ_TIMEOUT(self):
+        return self.env_config('HTTP_READ_TIMEOUT', default='30', cast=float)
+
+    @property
+    def HTTP_MAX_RETRIES(self):
+        return self.env_config('HTTP_MAX_RETRIES', default='3', cast=int)
+
+    @property
+    def HTTP_RETRY_BACKOFF(self):
+        return self.env_config('HTTP_RETRY_BACKOFF', default='0.5', cast=float)
+
+    @property
+    def IPFS_PIN_WORKERS(self):
+        return self.env_config('IPFS_PIN_WORKERS', default='4', cast=int)
+
+    @property
+    def BACKUP_DUMP_WORKERS(self):
+        return self.env_config('BACKUP_DUMP_WORKERS', default='2', cast=int)
+
 
 hive_setting = HiveSetting()
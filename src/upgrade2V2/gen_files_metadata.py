@@ -19,6 +19,7 @@ import logging
 import sys
 from pathlib import Path
 
+from src.utils.file_hasher import hash_files
 from src.utils.file_manager import fm
 
 
@@ -41,10 +42,10 @@ def generate_app_files_root(vaults_root: Path, user_did, app_did):
     return get_app_files_root(vaults_root / str.split(user_did, ':')[2] / app_did)
 
 
-def get_file_info(relative_dir_name, file: Path):
+def get_file_info(relative_dir_name, file: Path, sha256=None):
     return {
         'path': f'{relative_dir_name}/{file.name}' if relative_dir_name else file.name,
-        'sha256': fm.get_file_content_sha256(file),
+        'sha256': sha256 if sha256 else fm.get_file_content_sha256(file),
         'size': file.stat().st_size,
         'created': fm.get_file_ctime(file.as_posix()),
         'modified': file.stat().st_mtime
@@ -52,20 +53,24 @@ def get_file_info(relative_dir_name, file: Path):
 
 
 def get_all_app_files(files_root: Path, relative_dir_name, result):
+    """ collect all files of the application: [(relative_dir_name, file)] """
     folder_path = Path(f'{files_root.as_posix()}/{relative_dir_name}')
     for file in folder_path.iterdir():
         if file.is_dir():
             name = file.name if not relative_dir_name else f'{relative_dir_name}/{file.name}'
             get_all_app_files(files_root, name, result)
         elif file.name not in skip_file_names:
-            result.append(get_file_info(relative_dir_name, file))
+            result.append((relative_dir_name, file))
 
 
 def generate_app_files(app_root: Path):
-    result = []
+    files = []
     if get_app_files_root(app_root).exists():
-        get_all_app_files(get_app_files_root(app_root), '', result)
-    return result
+        get_all_app_files(get_app_files_root(app_root), '', files)
+
+    # hash the files in parallel
+    sha256s = hash_files([file for _, file in files], 'sha256')
+    return [get_file_info(relative_dir_name, file, sha256) for (relative_dir_name, file), sha256 in zip(files, sha256s)]
 
 
 def generate_vault(vault_root: Path):
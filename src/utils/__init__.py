@@ -22,7 +22,7 @@ def hive_job(name, tag='scheduler'):
 
         @executor.job
         @hive_job('update_vault_databases_usage', tag='executor')
-        def update_vault_databases_usage(user_did: str, full_url: str):  # executor task
+        def update_vault_databases_usage(user_did: str, full_url: str, is_write: bool):  # executor task
             ...
 
     """
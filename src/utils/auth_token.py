@@ -1,16 +1,15 @@
 # -*- coding: utf-8 -*-
-import json
 from datetime import datetime
 
 from flask import request, g
 
 from src import UnauthorizedException
-from src.modules.auth.user import UserManager
+from src.modules.auth.user import user_app_recorder
 from src.utils.consts import URL_V2, URL_SIGN_IN, URL_AUTH, URL_BACKUP_AUTH, URL_SERVER_INTERNAL_BACKUP, URL_SERVER_INTERNAL_STATE, \
     URL_SERVER_INTERNAL_RESTORE, URL_V1
 from src.utils_v1.constants import USER_DID, APP_ID, APP_INSTANCE_DID
 from src.modules.auth.auth import Auth
-from src.utils.did.did_wrapper import JWT
+from src.utils.token_cache import token_cache
 
 
 def __get_token_details(token, is_internal):
@@ -25,30 +24,31 @@ def __get_token_details(token, is_internal):
     if (len(token_splits) != 3) or token_splits[2] == "":
         return None, "The token is invalid because of containing invalid parts!"
 
-    jwt = JWT.parse(token)
+    # the verified details are cached by the token
+    details = token_cache.parse(token)
+
     # check the subject name on /did/auth and /did/backup_auth
-    subject = jwt.get_subject()
+    subject = details['subject']
     if is_internal and subject != "BackupToken":
         return None, "The subject of the token for internal is invalid!"
     if not is_internal and subject != "AccessToken":
         return None, "The subject of the token is invalid!"
 
-    issuer = jwt.get_issuer()
-    if issuer != Auth().get_did_string():
+    if details['issuer'] != Auth().get_did_string():
         return None, "The issuer of the token is invalid!"
 
-    if datetime.now().timestamp() > float(jwt.get_expiration()):
+    if datetime.now().timestamp() > float(details['expiration']):
         return None, "Then token is expired!"
 
-    props_json = json.loads(jwt.get_claim('props'))
-    if USER_DID not in props_json:
+    props_json = details['props']
+    if not props_json or USER_DID not in props_json:
         return None, 'The token MUST contain user DID'
 
     # There is no application DID in the internal token
     if not is_internal and APP_ID not in props_json:
         return None, 'The token MUST contain application DID'
 
-    props_json[APP_INSTANCE_DID] = jwt.get_audience()
+    props_json[APP_INSTANCE_DID] = details['audience']
     return props_json, None
 
 
@@ -89,9 +89,8 @@ def try_to_get_info_for_v1_token():
         if len(parts) < 2 or not parts[1]:
             return
 
-        jwt = JWT.parse(parts[1])
-        props_json = json.loads(jwt.get_claim('props'))
-        if not props_json.get(USER_DID, None):
+        props_json = token_cache.parse(parts[1])['props']
+        if not props_json or not props_json.get(USER_DID, None):
             return
 
         g.usr_did = props_json[USER_DID]
@@ -114,7 +113,6 @@ class TokenParser:
         the implementation of all APIs can directly use this two global variables.
         """
         g.usr_did, g.app_did, g.app_ins_did = None, None, None
-        self.user_manager = UserManager()
 
     def __no_need_auth(self):
         return any(map(lambda url: request.full_path.startswith(url), self.EXCEPT_URLS))
@@ -139,9 +137,11 @@ class TokenParser:
     def record_user_did_and_app_did(self, user_did, app_did):
         """ Just for cached token in app side to
 
+        Only the relation which is seen first time is written, and it is done out of the request.
+
         @deprecated this will be commented many days later
         """
-        self.user_manager.add_app_if_not_exists(user_did, app_did)
+        user_app_recorder.record(user_did, app_did)
 
     def parse(self):
         """ Only handle the access token of v2 APIs.
@@ -75,6 +75,13 @@ COL_IPFS_CID_REF = 'ipfs_cid_ref'
 
 COL_IPFS_BACKUP_CLIENT = 'ipfs_backup_client'
 COL_IPFS_BACKUP_SERVER = 'ipfs_backup_server'
+COL_IPFS_BACKUP_JOBS = 'ipfs_backup_jobs'
+
+# the version of the dropped namespaces to notify all processes
+COL_NAMESPACE_DROPS = 'namespace_drops'
+
+# the change counters of the user databases for the incremental backup
+COL_DATABASE_CHANGES = 'database_changes'
 
 BACKUP_TARGET_TYPE = 'type'
 BACKUP_TARGET_TYPE_HIVE_NODE = 'hive_node'
@@ -94,6 +101,8 @@ BACKUP_REQUEST_STATE_MSG = 'state_msg'
 BACKUP_REQUEST_TARGET_HOST = 'target_host'
 BACKUP_REQUEST_TARGET_DID = 'target_did'
 BACKUP_REQUEST_TARGET_TOKEN = 'target_token'
+# the root CID and the databases of the last successful backup, for the incremental backup.
+BACKUP_REQUEST_LAST_MANIFEST = 'last_manifest'
 
 # For backup subscription.
 BKSERVER_REQ_ACTION = 'req_action'
@@ -102,6 +111,11 @@ BKSERVER_REQ_STATE_MSG = 'req_state_msg'
 BKSERVER_REQ_CID = 'req_cid'
 BKSERVER_REQ_SHA256 = 'req_sha256'
 BKSERVER_REQ_SIZE = 'req_size'
+BKSERVER_REQ_PIN_PROGRESS = 'req_pin_progress'
+# the root CID of the last successful backup, the new backup is handled as the changes based on it.
+BKSERVER_REQ_LAST_CID = 'req_last_cid'
+BKSERVER_REQ_LAST_SHA256 = 'req_last_sha256'
+BKSERVER_REQ_LAST_SIZE = 'req_last_size'
 
 # @deprecated
 URL_BACKUP_SERVICE = '/api/v2/internal_backup/service'
@@ -7,30 +7,27 @@ import os
 import logging
 from datetime import datetime
 
-from pymongo import MongoClient
 from pymongo.errors import CollectionInvalid
 
-from src.settings import hive_setting
+from src.modules.database.change_counter import database_change_counter
+from src.modules.database.usage import usage_accountant
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils.namespace_cache import namespace_cache
 from src.utils_v1.did_mongo_db_resource import gene_mongo_db_name, convert_oid
 from src.utils_v1.constants import DID_INFO_DB_NAME, VAULT_SERVICE_COL, VAULT_SERVICE_DID
 from src.utils.http_exception import BadRequestException, AlreadyExistsException, CollectionNotFoundException
 
 
 class DatabaseClient:
-    def __init__(self):
-        self.mongodb_uri = hive_setting.MONGODB_URI
-        self.connection = None
-
     def __get_connection(self):
-        if not self.connection:
-            self.connection = MongoClient(self.mongodb_uri)
-        return self.connection
+        """ all instances share the connection pool """
+        return mongodb_pool.get_client()
 
     def start_session(self):
         return self.__get_connection().start_session()
 
     def is_database_exists(self, db_name):
-        return db_name in self.__get_connection().list_database_names()
+        return namespace_cache.exists_database(db_name)
 
     def is_col_exists(self, db_name, collection_name):
         col = self.get_origin_collection(db_name, collection_name)
@@ -52,11 +49,15 @@ class DatabaseClient:
 
     def get_origin_collection(self, db_name, collection_name, create_on_absence=False):
         db = self.__get_connection()[db_name]
-        if collection_name not in db.list_collection_names():
+        if not namespace_cache.exists_collection(db_name, collection_name):
             if not create_on_absence:
                 return None
             else:
-                db.create_collection(collection_name)
+                try:
+                    db.create_collection(collection_name)
+                except CollectionInvalid as e:
+                    pass
+                namespace_cache.add_collection(db_name, collection_name)
         return db[collection_name]
 
     def get_all_database_names(self):
@@ -113,8 +114,11 @@ class DatabaseClient:
         return col.count_documents(convert_oid(col_filter) if col_filter else None, **(options if options else {}))
 
     def insert_one(self, user_did, app_did, collection_name, document, options=None, create_on_absence=False, **kwargs):
-        return self.insert_one_origin(self.get_user_database_name(user_did, app_did), collection_name, document,
-                                      options, create_on_absence, **kwargs)
+        result = self.insert_one_origin(self.get_user_database_name(user_did, app_did), collection_name, document,
+                                        options, create_on_absence, **kwargs)
+        database_change_counter.increase(self.get_user_database_name(user_did, app_did))
+        usage_accountant.record(user_did, usage_accountant.estimate_size([document]))
+        return result
 
     def insert_one_origin(self, db_name, collection_name, document, options=None,
                           create_on_absence=False, is_extra=True, **kwargs):
@@ -135,9 +139,12 @@ class DatabaseClient:
 
     def update_one(self, user_did, app_did, collection_name, col_filter, col_update, options=None,
                    is_extra=False, **kwargs):
-        return self.update_one_origin(self.get_user_database_name(user_did, app_did), collection_name,
-                                      col_filter, col_update,
-                                      options=options, is_extra=is_extra, **kwargs)
+        result = self.update_one_origin(self.get_user_database_name(user_did, app_did), collection_name,
+                                        col_filter, col_update,
+                                        options=options, is_extra=is_extra, **kwargs)
+        database_change_counter.increase(self.get_user_database_name(user_did, app_did))
+        usage_accountant.mark_dirty(user_did)
+        return result
 
     def update_one_origin(self, db_name, collection_name, col_filter, col_update,
                           options=None, create_on_absence=False, is_many=False, is_extra=False, **kwargs):
@@ -166,8 +173,11 @@ class DatabaseClient:
         }
 
     def delete_one(self, user_did, app_did, collection_name, col_filter, is_check_exist=True):
-        return self.delete_one_origin(self.get_user_database_name(user_did, app_did),
-                                      collection_name, col_filter, is_check_exist=is_check_exist)
+        result = self.delete_one_origin(self.get_user_database_name(user_did, app_did),
+                                        collection_name, col_filter, is_check_exist=is_check_exist)
+        database_change_counter.increase(self.get_user_database_name(user_did, app_did))
+        usage_accountant.mark_dirty(user_did)
+        return result
 
     def delete_one_origin(self, db_name, collection_name, col_filter, is_check_exist=True):
         col = self.get_origin_collection(db_name, collection_name)
@@ -198,7 +208,10 @@ class DatabaseClient:
 
     def create_collection(self, user_did, app_did, collection_name):
         try:
-            self.__get_connection()[self.get_user_database_name(user_did, app_did)].create_collection(collection_name)
+            db_name = self.get_user_database_name(user_did, app_did)
+            self.__get_connection()[db_name].create_collection(collection_name)
+            namespace_cache.add_collection(db_name, collection_name)
+            database_change_counter.increase(db_name)
         except CollectionInvalid as e:
             logging.error('The collection already exists.')
             raise AlreadyExistsException()
@@ -206,15 +219,22 @@ class DatabaseClient:
     def delete_collection(self, user_did, app_did, collection_name, is_check_exist=True):
         if is_check_exist and not self.get_user_collection(user_did, app_did, collection_name):
             raise CollectionNotFoundException()
-        self.__get_connection()[self.get_user_database_name(user_did, app_did)].drop_collection(collection_name)
+        db_name = self.get_user_database_name(user_did, app_did)
+        self.__get_connection()[db_name].drop_collection(collection_name)
+        namespace_cache.remove_collection(db_name, collection_name)
+        database_change_counter.increase(db_name)
 
     def delete_collection_origin(self, db_name, collection_name):
         if self.get_origin_collection(db_name, collection_name):
             raise CollectionNotFoundException()
         self.__get_connection()[db_name].drop_collection(collection_name)
+        namespace_cache.remove_collection(db_name, collection_name)
 
     def remove_database(self, user_did, app_did):
-        self.__get_connection().drop_database(self.get_user_database_name(user_did, app_did))
+        db_name = self.get_user_database_name(user_did, app_did)
+        self.__get_connection().drop_database(db_name)
+        namespace_cache.remove_database(db_name)
+        database_change_counter.increase(db_name)
 
     def timestamp_to_epoch(self, timestamp):
         if timestamp < 0:
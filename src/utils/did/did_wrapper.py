@@ -52,7 +52,7 @@ class JWT:
         jwt = lib.DefaultJWSParser_Parse(jwt_str.encode())
         if not jwt:
             raise ElaDIDException(ElaError.get('JWT.parse'))
-        return JWT(jwt)
+        return JWT(ffi.gc(jwt, lib.JWT_Destroy))
 
     def get_subject(self):
         subject = lib.JWT_GetSubject(self.jwt)
@@ -1,11 +1,12 @@
-import logging
 import traceback
 from concurrent.futures import ThreadPoolExecutor
 
 from flask_executor import Executor
 from sentry_sdk import capture_exception
 
-from src.modules.auth.user import UserManager
+from src.modules.auth.user import UserManager, load_user_apps_task
+from src.modules.database.change_counter import database_change_counter
+from src.modules.database.usage import usage_accountant
 from src.modules.database.mongodb_client import MongodbClient
 from src.modules.ipfs.ipfs_backup_client import IpfsBackupClient
 from src.modules.ipfs.ipfs_backup_server import IpfsBackupServer
@@ -22,7 +23,7 @@ pool = ThreadPoolExecutor(1)
 
 @executor.job
 @hive_job('update_vault_databases_usage', 'executor')
-def update_vault_databases_usage_task(user_did: str, full_url: str):
+def update_vault_databases_usage_task(user_did: str, full_url: str, is_write: bool):
     from src.modules.subscription.vault import VaultManager
     vault_manager = VaultManager()
 
@@ -40,23 +41,17 @@ def update_vault_databases_usage_task(user_did: str, full_url: str):
     if need_update:
         vault_manager.update_vault_latest_access_time(user_did)
 
-    # v1, just consider auth, subscription, database, files, subscripting
-    exclude_start_urls = [
-        '/api/v1/echo',
-        '/api/v1/hive',  # about
-        '/api/v1/did',
-        '/api/v1/service/vault',  # subscription
-        '/api/v2/node',
-        '/api/v2/about',
-        '/api/v2/did',
-        '/api/v2/subscription',
-        '/api/v2/payment',
-        '/api/v2/provider',
+    # v2 writes report their size changes by themselves, v1 writes use pymongo directly,
+    # so just mark the vault to reconcile its databases usage later, and count the change of all its databases.
+    v1_write_start_urls = [
+        '/api/v1/db',
+        '/api/v1/files',
+        '/api/v1/scripting',
     ]
-    need_update = all([not full_url.startswith(url) for url in exclude_start_urls])
+    need_update = is_write and any([full_url.startswith(url) for url in v1_write_start_urls])
     if need_update:
-        vault_manager.recalculate_user_databases_size(user_did)
-        logging.getLogger('AFTER REQUEST').info(f'Succeeded to update_vault_databases_usage({user_did}), {full_url}')
+        database_change_counter.increase(user_did)
+        usage_accountant.mark_dirty(user_did)
 
 
 @hive_job('retry_backup_when_reboot', 'executor')
@@ -104,6 +99,7 @@ def init_executor(app, mode):
         app.config['EXECUTOR_TYPE'] = 'thread'
         app.config['EXECUTOR_MAX_WORKERS'] = 5
 
+        pool.submit(load_user_apps_task)
         pool.submit(retry_backup_when_reboot_task)
         pool.submit(sync_app_dids_task)
         pool.submit(count_vault_storage_task)
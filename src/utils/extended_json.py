@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+The encoding of the mongodb documents to the extended JSON.
+"""
+import json
+import math
+import typing as t
+
+from bson import json_util
+
+# the size of the encoded content sent to the response once
+CHUNK_SIZE = 64 * 1024
+
+
+def to_json_value(value):
+    """ Convert the mongodb value (ObjectId, datetime, etc.) to the extended JSON one in one pass.
+
+    The result is the same as 'json.loads(json_util.dumps(value))' without encoding and decoding the string.
+    The NaN and infinite floats are converted by json_util as '{"$numberDouble": "NaN"}', which are not valid in JSON.
+    """
+    if value is None or isinstance(value, (str, bool, int)) or (isinstance(value, float) and math.isfinite(value)):
+        return value
+    elif isinstance(value, dict):
+        return {k: to_json_value(v) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    return to_json_value(json_util.default(value))
+
+
+def dumps(value) -> str:
+    """ Encode the mongodb value to the extended JSON string, same as json_util.dumps()
+
+    The floats are not passed to json_util.default by the encoder, so the value which contains
+    the NaN or infinite floats is converted by to_json_value() first.
+    """
+    try:
+        return json.dumps(value, default=json_util.default, allow_nan=False)
+    except ValueError as e:
+        return json.dumps(to_json_value(value), allow_nan=False)
+
+
+def iter_json_items(items: t.Iterable, get_fields: t.Callable[[], dict] = None) -> t.Iterator[str]:
+    """ Encode the JSON object which contains the documents part by part:
+
+        {"items": [<doc>, ...], <the fields from 'get_fields'>}
+
+    :param items: the documents, such as the mongodb cursor.
+    :param get_fields: get the other fields of the object after all documents are encoded.
+    """
+    buffer, size = ['{"items": ['], 0
+    for i, item in enumerate(items):
+        part = dumps(item) if i == 0 else ', ' + dumps(item)
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+
+    buffer.append(']')
+    for k, v in (get_fields() if get_fields else {}).items():
+        buffer.append(f', {json.dumps(k)}: {dumps(v)}')
+    buffer.append('}')
+    yield ''.join(buffer)
+
+
+def iter_ndjson(items: t.Iterable) -> t.Iterator[str]:
+    """ Encode the documents as the newline delimited JSON, one document one line. """
+    buffer, size = [], 0
+    for item in items:
+        part = dumps(item) + '\n'
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+The hashing engine of the files (MD5, SHA256) for the checksums, metadata and backup.
+
+Run the throughput benchmark:
+
+    python -m src.utils.file_hasher [<size in MB>] [<file count>]
+
+"""
+import hashlib
+import mmap
+import os
+import sys
+import tempfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# the size of every reading of the file
+BUFFER_SIZE = 1024 * 1024
+
+# the files not smaller than this are mapped to memory instead of reading
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# the max number of the files hashed at the same time
+MAX_WORKERS = 4
+
+PathLike = typing.Union[str, Path]
+
+
+def hash_file(path: PathLike, algorithm='sha256', use_mmap=True) -> str:
+    """ get the hex digest of the file content
+
+    :param algorithm: 'md5', 'sha256' or other name supported by hashlib
+    :param use_mmap: map the big file to memory to avoid copying it to the buffer
+    """
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                try:
+                    # hashlib releases GIL when updating the big data
+                    for offset in range(0, size, BUFFER_SIZE * 8):
+                        h.update(view[offset:offset + BUFFER_SIZE * 8])
+                finally:
+                    view.release()
+        else:
+            buffer = bytearray(min(BUFFER_SIZE, max(size, 1)))
+            view = memoryview(buffer)
+            while True:
+                length = f.readinto(buffer)
+                if not length:
+                    break
+                h.update(view[:length])
+    return h.hexdigest()
+
+
+def hash_files(paths: typing.List[PathLike], algorithm='sha256', max_workers=MAX_WORKERS) -> typing.List[str]:
+    """ get the hex digests of the files, the order is same as the paths
+
+    The files are hashed on a thread pool when there are more than one file.
+    """
+    if len(paths) <= 1 or max_workers <= 1:
+        return [hash_file(p, algorithm) for p in paths]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+        return list(pool.map(lambda p: hash_file(p, algorithm), paths))
+
+
+def list_files(dir_path: PathLike) -> typing.List[Path]:
+    """ get all files under the folder recursively """
+    result = []
+    for root, dirs, files in os.walk(dir_path):
+        result.extend(Path(root) / name for name in files)
+    return result
+
+
+def _legacy_hash_file(path, algorithm, chunk_size):
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _benchmark(name, total_size, func):
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    print(f'{name:<32} {seconds:>8.3f}s {total_size / (1024 * 1024) / seconds:>10.1f} MB/s')
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = []
+        for i in range(count):
+            path = Path(temp_dir) / f'file_{i}'
+            with path.open('wb') as f:
+                for _ in range(size_mb // count or 1):
+                    f.write(os.urandom(1024 * 1024))
+            paths.append(path)
+        total = sum(p.stat().st_size for p in paths)
+
+        print(f'hashing {count} files, {total // (1024 * 1024)} MB in total')
+        for algorithm in ('md5', 'sha256'):
+            _benchmark(f'{algorithm} read 64KB', total, lambda: [_legacy_hash_file(p, algorithm, 65536) for p in paths])
+            _benchmark(f'{algorithm} buffered', total, lambda: [hash_file(p, algorithm, use_mmap=False) for p in paths])
+            _benchmark(f'{algorithm} buffered/mmap', total, lambda: [hash_file(p, algorithm) for p in paths])
+            _benchmark(f'{algorithm} parallel ({MAX_WORKERS} workers)', total, lambda: hash_files(paths, algorithm))
+
+        # the old md5 checksum reads 4 bytes every time, only test a small part
+        small = paths[0]
+        _benchmark('md5 read 4B (first file)', small.stat().st_size, lambda: _legacy_hash_file(small, 'md5', 4))
+
+
+if __name__ == '__main__':
+    main()
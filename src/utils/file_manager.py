@@ -9,23 +9,32 @@ import os
 import pickle
 import platform
 import shutil
+import uuid
 from datetime import datetime
 from pathlib import Path
 
 from flask import request
-from flask_rangerequest import RangeRequest
 
+from hive.util.flask_rangerequest import RangeRequest, SEND_MODE_X_ACCEL_REDIRECT
 from src.modules.auth.user import UserManager
 from src.settings import hive_setting
 from src.utils.consts import COL_IPFS_FILES, COL_IPFS_FILES_IPFS_CID, DID, SIZE, COL_IPFS_FILES_SHA256, \
     COL_IPFS_FILES_PATH, USR_DID, APP_DID
 from src.utils.db_client import cli
-from src.utils_v1.common import deal_dir, get_file_md5_info, create_full_path_dir, gene_temp_file_name
+from src.utils.file_hasher import hash_file, hash_files, list_files
+from src.utils_v1.common import create_full_path_dir, gene_temp_file_name
 from src.utils_v1.constants import CHUNK_SIZE, DID_INFO_DB_NAME, VAULT_SERVICE_COL, VAULT_SERVICE_MAX_STORAGE
 from src.utils_v1.did_file_info import get_save_files_path, get_user_did_path, get_directory_size
 from src.utils.http_exception import BadRequestException, VaultNotFoundException
 
 
+# the size of every reading from the request body on uploading
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# the max number of the cids in one pin or unpin request to IPFS node
+IPFS_BATCH_SIZE = 100
+
+
 class FileManager:
     def __init__(self):
         self._http = None
@@ -50,9 +59,12 @@ class FileManager:
         """
         :return [(name, checksum), ...]
         """
-        return list() if not root_path.exists() else \
-            [(md5[0], Path(md5[1]).relative_to(root_path).as_posix())
-                for md5 in deal_dir(root_path.as_posix(), get_file_md5_info)]
+        if not root_path.exists():
+            return list()
+
+        root_path = root_path.resolve()
+        files = list_files(root_path)
+        return list(zip(hash_files(files, 'md5'), map(lambda f: f.relative_to(root_path).as_posix(), files)))
 
     def get_hashes_by_lines(self, lines):
         hashes = list()
@@ -147,15 +159,7 @@ class FileManager:
         return sum(map(lambda f: f[SIZE], files))
 
     def get_file_content_sha256(self, file_path: Path):
-        buf_size = 65536  # lets read stuff in 64kb chunks!
-        sha = hashlib.sha256()
-        with file_path.open('rb') as f:
-            while True:
-                data = f.read(buf_size)
-                if not data:
-                    break
-                sha.update(data)
-        return sha.hexdigest()
+        return hash_file(file_path, 'sha256')
 
     def ipfs_uploading_file(self, user_did, app_did, path: str):
         file_path = self.ipfs_get_file_path(user_did, app_did, path)
@@ -167,14 +171,45 @@ class FileManager:
             return 0
         return get_directory_size(root.as_posix())
 
-    def get_response_by_file_path(self, path: Path):
-        size = path.stat().st_size
-        with open(path.as_posix(), 'rb') as f:
-            etag = RangeRequest.make_etag(f)
-        return RangeRequest(open(path.as_posix(), 'rb'),
+    def get_response_by_file_path(self, path: Path, metadata: dict = None):
+        """ Response the file content with range support.
+
+        :param metadata: the file metadata (COL_IPFS_FILES) of the file. The ETag, size and Last-Modified
+            are got from it and the file content is not read before sending.
+        """
+        if metadata and metadata.get(COL_IPFS_FILES_SHA256):
+            # same format as RangeRequest.make_etag()
+            etag = f'"sha256:{metadata[COL_IPFS_FILES_SHA256]}"'
+            size = metadata.get(SIZE)
+            if size is None:
+                size = path.stat().st_size
+            last_modified = datetime.utcfromtimestamp(metadata.get('modified') or path.stat().st_mtime)
+        else:
+            size = path.stat().st_size
+            with open(path.as_posix(), 'rb') as f:
+                etag = RangeRequest.make_etag(f)
+            last_modified = datetime.utcfromtimestamp(path.stat().st_mtime)
+
+        send_mode = hive_setting.DOWNLOAD_SEND_MODE
+        return RangeRequest(None,
                             etag=etag,
-                            last_modified=datetime.now(),
-                            size=size).make_response()
+                            last_modified=last_modified,
+                            size=size,
+                            file_path=path.resolve().as_posix()).make_response(send_mode=send_mode,
+                                                                              redirect_uri=self.__get_redirect_uri(path, send_mode))
+
+    @staticmethod
+    def __get_redirect_uri(path: Path, send_mode):
+        """ the uri of the file under the nginx internal location which maps to the data root """
+        if send_mode != SEND_MODE_X_ACCEL_REDIRECT:
+            return None
+
+        try:
+            relative_path = path.resolve().relative_to(Path(hive_setting.DATA_STORE_PATH).resolve())
+        except ValueError as e:
+            logging.getLogger('FileManager').error(f'The file {path.as_posix()} is not under the data root, send it by stream.')
+            return None
+        return f'{hive_setting.DOWNLOAD_X_ACCEL_PREFIX.rstrip("/")}/{relative_path.as_posix()}'
 
     def ipfs_download_file_to_path(self, cid, path: Path, is_proxy=False, sha256=None, size=None):
         url = self.ipfs_gateway_url if is_proxy else self.ipfs_url
@@ -189,6 +224,35 @@ class FileManager:
             if sha256 != cid_sha256:
                 return f'Failed to get file content with cid {cid}, sha256 {sha256, cid_sha256}'
 
+    def ipfs_cat_chunks(self, cid, is_proxy=False, sha256=None, size=None):
+        """ Get the content of the cid as the chunks, which are verified by the size and SHA256 on the fly.
+
+        The last chunk is only yielded after the whole content verified,
+        so the consumer never gets the complete content if the verification fails.
+        """
+        url = self.ipfs_gateway_url if is_proxy else self.ipfs_url
+        response = self.http.post(f'{url}/api/v0/cat?arg={cid}', None, None, is_body=False, success_code=200, stream=True)
+
+        sha, cid_size, pending = hashlib.sha256(), 0, None
+        try:
+            for chunk in response.iter_content(chunk_size=UPLOAD_CHUNK_SIZE):
+                if not chunk:
+                    continue
+                sha.update(chunk)
+                cid_size += len(chunk)
+                if pending:
+                    yield pending
+                pending = chunk
+        finally:
+            response.close()
+
+        if size is not None and size != cid_size:
+            raise BadRequestException(f'Failed to get file content with cid {cid}, size {size, cid_size}')
+        if sha256 and sha256 != sha.hexdigest():
+            raise BadRequestException(f'Failed to get file content with cid {cid}, sha256 {sha256, sha.hexdigest()}')
+        if pending:
+            yield pending
+
     def ipfs_download_file_content(self, cid, is_proxy=False, sha256=None, size=None):
         temp_file = gene_temp_file_name()
         msg = fm.ipfs_download_file_to_path(cid, temp_file, is_proxy=is_proxy, sha256=sha256, size=size)
@@ -206,55 +270,177 @@ class FileManager:
                                    is_json=False, files=files, success_code=200)
         return json_data['Hash']
 
+    def ipfs_upload_file_from_request_stream(self, file_path: Path):
+        """ Upload the content of the request body to IPFS node in a single pass.
+
+        The content is read once and teed to the SHA256 hasher, the size counter, the local file and
+        the chunked multipart body of the request to IPFS node.
+
+        :return: (cid, sha256, size)
+        """
+        if not self.create_parent_dir(file_path):
+            raise BadRequestException(f'Failed to create parent directory to hold file {file_path.name}.')
+
+        try:
+            with open(file_path.as_posix(), 'bw') as f:
+                return self.ipfs_upload_stream(request.stream, f)
+        except Exception as e:
+            self.delete_file(file_path)
+            raise e
+
+    def ipfs_upload_stream(self, stream, file=None):
+        """ Upload the content of the readable stream to IPFS node by the chunked request.
+
+        :param file: the opened file to keep the content if specified.
+        :return: (cid, sha256, size)
+        """
+        boundary = uuid.uuid4().hex
+        sha, size = hashlib.sha256(), 0
+
+        def generate_body():
+            nonlocal size
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="file"\r\n'
+                   f'Content-Type: application/octet-stream\r\n\r\n').encode()
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                size += len(chunk)
+                if file:
+                    file.write(chunk)
+                yield chunk
+            yield f'\r\n--{boundary}--\r\n'.encode()
+
+        json_data = self.http.post(self.ipfs_url + '/api/v0/add', None, generate_body(), is_json=False, success_code=200,
+                                   headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        return json_data['Hash'], sha.hexdigest(), size
+
     def ipfs_local_exist_cid(self, cid):
+        """ check the cid exists in local IPFS repository without transferring the content """
+        return self.ipfs_stat_cid(cid) is not None
+
+    def ipfs_stat_cid(self, cid):
+        """ get the size of the cid from local IPFS repository, offline mode makes it fail fast if not exists.
+
+        :return {'size': <int>, 'cumulative_size': <int>} or None if not exists.
+        """
         try:
-            response = self.http.post(f'{self.ipfs_url}/api/v0/cat?arg={cid}', None, None, is_body=False, success_code=200)
-            return True
+            json_data = self.http.post(f'{self.ipfs_url}/api/v0/files/stat', None, None, is_json=False, success_code=200,
+                                       params={'arg': f'/ipfs/{cid}', 'offline': 'true'})
+            return {'size': json_data['Size'], 'cumulative_size': json_data['CumulativeSize']}
         except BadRequestException as e:
-            return False
+            return None
 
-    def ipfs_unpin_cid(self, cid):
-        logging.info(f'[fm.ipfs_unpin_cid] Try to unpin {cid} in backup node.')
+    def ipfs_get_pinned_cids(self, cids: list = None) -> set:
+        """ get the cids which are pinned recursively, all pinned ones if 'cids' is None
 
-        if not self.ipfs_local_exist_cid(cid):
-            return
+        The recursive pins are listed by one streamed request and matched with 'cids',
+        the listing stops when all 'cids' are found.
+        """
+        wanted = set(cids) if cids is not None else None
+        response = self.http.post(f'{self.ipfs_url}/api/v0/pin/ls', None, None, is_json=False, is_body=False,
+                                  success_code=200, params={'type': 'recursive', 'stream': 'true'}, stream=True)
 
+        pinned = set()
         try:
-            response = self.http.post(self.ipfs_url + f'/api/v0/pin/rm?arg=/ipfs/{cid}&recursive=true', None, None, is_body=False, success_code=200)
-        except BadRequestException as e:
-            # skip this error
-            if 'not pinned or pinned indirectly' not in e.msg:
-                raise e
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                # one pin per line, or all pins in 'Keys' by the old IPFS node without streaming
+                json_data = json.loads(line)
+                for cid in json_data['Keys'].keys() if 'Keys' in json_data else [json_data.get('Cid')]:
+                    if cid and (wanted is None or cid in wanted):
+                        pinned.add(cid)
+                if wanted is not None and len(pinned) == len(wanted):
+                    break
+        finally:
+            response.close()
+        return pinned
+
+    @staticmethod
+    def __get_batches(cids: list):
+        for i in range(0, len(cids), IPFS_BATCH_SIZE):
+            yield cids[i:i + IPFS_BATCH_SIZE]
+
+    def ipfs_unpin_cid(self, cid):
+        self.ipfs_unpin_cids([cid])
+
+    def ipfs_unpin_cids(self, cids: list):
+        """ unpin the cids in batches, the cids which are not pinned are skipped. """
+        cids = list(dict.fromkeys(filter(lambda c: c, cids)))
+        logging.info(f'[fm.ipfs_unpin_cids] Try to unpin {len(cids)} cids in backup node.')
+
+        for batch in self.__get_batches(cids):
+            try:
+                self.__ipfs_unpin_batch(batch)
+            except BadRequestException as e:
+                if 'not pinned or pinned indirectly' not in e.msg:
+                    raise e
+
+                # some of them are not pinned, only unpin the pinned ones
+                pinned = self.ipfs_get_pinned_cids(batch)
+                batch = [cid for cid in batch if cid in pinned]
+                if batch:
+                    self.__ipfs_unpin_batch(batch)
+
+    def __ipfs_unpin_batch(self, cids: list):
+        params = [('arg', f'/ipfs/{cid}') for cid in cids] + [('recursive', 'true')]
+        self.http.post(f'{self.ipfs_url}/api/v0/pin/rm', None, None, is_json=False, is_body=False, success_code=200, params=params)
 
     def get_file_cids(self, user_did):
         databases = cli.get_all_user_databases(user_did)
         total_size, cids = 0, set()
         for d in databases:
-            docs = cli.find_many_origin(d, COL_IPFS_FILES, {USR_DID: user_did},
-                                        create_on_absence=False, throw_exception=False)
-            if docs:
-                cids.update([doc[COL_IPFS_FILES_IPFS_CID] for doc in docs])
-                total_size += sum([doc[SIZE] for doc in docs])
+            for group in self.__group_files_by_cid(d, user_did):
+                cids.add(group['_id'])
+                total_size += group['total_size']
         return total_size, list(cids)
 
     def get_file_cid_metadatas(self, user_did):
-        """ get all cid infos from user's vault """
+        """ get all cid infos from user's vault
+
+        The files are grouped by cid on the database side, and the groups are merged by cid.
+        """
         database_names = self.user_manager.get_database_names(user_did)
-        total_size, cids = 0, list()
+        total_size, cids = 0, dict()
         for database_name in database_names:
-            docs = cli.find_many_origin(database_name, COL_IPFS_FILES, {USR_DID: user_did},
-                                        create_on_absence=False, throw_exception=False)
-            for doc in docs:
-                mt = self._get_cid_metadata_from_list(cids, doc)
+            for group in self.__group_files_by_cid(database_name, user_did):
+                total_size += group['total_size']
+
+                if len(group['sha256s']) > 1 or len(group['sizes']) > 1:
+                    logging.error(f'Found unexpected files with same CID {group["_id"]}, but different sha256 or size.')
+
+                mt = cids.get(group['_id'])
                 if mt:
-                    mt['count'] += 1
+                    if mt['sha256'] != group['sha256'] or mt['size'] != int(group['size']):
+                        logging.error(f'Found unexpected files with same CID {group["_id"]}, but different sha256 or size.')
+                    mt['count'] += group['count']
                 else:
-                    cids.append({'cid': doc[COL_IPFS_FILES_IPFS_CID],
-                                 'sha256': doc[COL_IPFS_FILES_SHA256],
-                                 'size': int(doc[SIZE]),
-                                 'count': 1})
-            total_size += sum([doc[SIZE] for doc in docs])
-        return total_size, cids
+                    cids[group['_id']] = {'cid': group['_id'],
+                                          'sha256': group['sha256'],
+                                          'size': int(group['size']),
+                                          'count': group['count']}
+        return total_size, list(cids.values())
+
+    def __group_files_by_cid(self, database_name, user_did):
+        """ the cursor of the files groups of the database: {_id: cid, sha256, size, count, total_size, sha256s, sizes} """
+        col = cli.get_origin_collection(database_name, COL_IPFS_FILES)
+        if col is None:
+            return []
+
+        pipeline = [
+            {'$match': {USR_DID: user_did}},
+            {'$group': {
+                '_id': f'${COL_IPFS_FILES_IPFS_CID}',
+                'sha256': {'$first': f'${COL_IPFS_FILES_SHA256}'},
+                'size': {'$first': f'${SIZE}'},
+                'count': {'$sum': 1},
+                'total_size': {'$sum': f'${SIZE}'},
+                'sha256s': {'$addToSet': f'${COL_IPFS_FILES_SHA256}'},
+                'sizes': {'$addToSet': f'${SIZE}'}}}
+        ]
+        return col.aggregate(pipeline, allowDiskUse=True)
 
     def get_app_file_metadatas(self, user_did, app_did) -> list:
         result = []
@@ -283,6 +469,37 @@ class FileManager:
         temp_file.unlink()
         return size
 
+    def ipfs_pin_cids(self, cids: list):
+        """ pin the cids in batches from the local repository, the ones not in the local repository
+        are got from the gateway one by one. """
+        cids = list(dict.fromkeys(filter(lambda c: c, cids)))
+        logging.info(f'[fm.ipfs_pin_cids] Try to pin {len(cids)} cids in backup node.')
+
+        remote_cids = []
+        for batch in self.__get_batches(cids):
+            if self.__ipfs_pin_batch(batch):
+                continue
+
+            # some blocks of them are missing, only check the cids of the failed batch one by one.
+            local_cids = set(filter(lambda c: self.ipfs_local_exist_cid(c), batch))
+            if local_cids and self.__ipfs_pin_batch([cid for cid in batch if cid in local_cids]):
+                remote_cids.extend([cid for cid in batch if cid not in local_cids])
+            else:
+                remote_cids.extend(batch)
+
+        for cid in remote_cids:
+            self.ipfs_pin_cid(cid)
+
+    def __ipfs_pin_batch(self, cids: list) -> bool:
+        """ pin the cids in the local repository, offline mode makes it fail fast if some blocks are missing """
+        params = [('arg', f'/ipfs/{cid}') for cid in cids] + [('recursive', 'true'), ('offline', 'true')]
+        try:
+            self.http.post(f'{self.ipfs_url}/api/v0/pin/add', None, None, is_json=False, is_body=False, success_code=200, params=params)
+            return True
+        except BadRequestException as e:
+            logging.info(f'[fm.ipfs_pin_cids] Failed to pin the local cids: {e.msg}')
+            return False
+
     def get_files_recursively(self, root_dir: Path):
         files = []
 
@@ -296,17 +513,6 @@ class FileManager:
         get_files(root_dir, files)
         return files
 
-    def _get_cid_metadata_from_list(self, cid_mts, file_mt):
-        if not cid_mts:
-            return None
-        for mt in cid_mts:
-            if mt['cid'] == file_mt[COL_IPFS_FILES_IPFS_CID]:
-                if mt['sha256'] != file_mt[COL_IPFS_FILES_SHA256] or mt['size'] != int(file_mt[SIZE]):
-                    logging.error(f'Found an unexpected file {file_mt[COL_IPFS_FILES_PATH]} with same CID, '
-                                  f'but different sha256 or size.')
-                return mt
-        return None
-
     def get_file_ctime(self, path_to_file: str):
         """
         Try to get the date that a file was created, falling back to when it was
@@ -4,17 +4,122 @@
 Http client for backup or other modules.
 """
 import pickle
+import threading
+from http.cookiejar import DefaultCookiePolicy
+import time
 from pathlib import Path
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from src.settings import hive_setting
 from src.utils.file_manager import fm
 from src.utils.http_exception import BadRequestException, HiveException
 
 
+class HttpSessionPool:
+    """ One keep-alive session (with connection pool) for every host: IPFS node, gateway, other hive nodes.
+
+    The connection errors of all methods and the read errors, 502/503/504 of the idempotent methods
+    are retried with the exponential backoff.
+    The latency and the errors of the requests are counted by host.
+    The sessions are shared by all users, so they never keep the cookies from the responses.
+    """
+
+    IDEMPOTENT_METHODS = frozenset(['HEAD', 'GET', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'])
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # host: requests.Session
+        self.sessions = {}
+        # host: {'requests', 'errors', 'total_latency', 'max_latency'}
+        self.stats = {}
+
+    @staticmethod
+    def get_host(url):
+        parts = urlparse(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    @staticmethod
+    def __create_retry():
+        options = {
+            'total': hive_setting.HTTP_MAX_RETRIES,
+            'read': hive_setting.HTTP_MAX_RETRIES,
+            'connect': hive_setting.HTTP_MAX_RETRIES,
+            'backoff_factor': hive_setting.HTTP_RETRY_BACKOFF,
+            'status_forcelist': (502, 503, 504),
+            'raise_on_status': False,
+        }
+        try:
+            return Retry(allowed_methods=HttpSessionPool.IDEMPOTENT_METHODS, **options)
+        except TypeError as e:
+            # urllib3 < 1.26
+            return Retry(method_whitelist=HttpSessionPool.IDEMPOTENT_METHODS, **options)
+
+    def get_session(self, url) -> requests.Session:
+        host = self.get_host(url)
+        session = self.sessions.get(host)
+        if session:
+            return session
+
+        with self.lock:
+            if host not in self.sessions:
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=hive_setting.HTTP_POOL_SIZE,
+                                      max_retries=self.__create_retry())
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+            return self.sessions[host]
+
+    def record(self, url, latency, is_error):
+        host = self.get_host(url)
+        with self.lock:
+            stats = self.stats.setdefault(host, {'requests': 0, 'errors': 0, 'total_latency': 0.0, 'max_latency': 0.0})
+            stats['requests'] += 1
+            stats['errors'] += 1 if is_error else 0
+            stats['total_latency'] += latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+
+    def get_stats(self):
+        """ the latency is in milliseconds """
+        with self.lock:
+            items = {host: dict(stats) for host, stats in self.stats.items()}
+
+        return {
+            'pool_size': hive_setting.HTTP_POOL_SIZE,
+            'hosts': [{
+                'host': host,
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'mean_latency': int(stats['total_latency'] * 1000 / stats['requests']) if stats['requests'] else 0,
+                'max_latency': int(stats['max_latency'] * 1000),
+            } for host, stats in items.items()]
+        }
+
+
+session_pool = HttpSessionPool()
+
+
 class HttpClient:
     def __init__(self):
-        self.timeout = 30
+        # read timeout, the connect timeout is the setting HTTP_CONNECT_TIMEOUT
+        self.timeout = hive_setting.HTTP_READ_TIMEOUT
+
+    def __request(self, method, url, timeout=None, **kwargs):
+        """ send the request by the pooled session of the host """
+        start, is_error = time.time(), True
+        try:
+            timeout = (hive_setting.HTTP_CONNECT_TIMEOUT, timeout if timeout is not None else self.timeout)
+            r = session_pool.get_session(url).request(method, url, timeout=timeout, **kwargs)
+            is_error = r.status_code >= 500
+            return r
+        finally:
+            session_pool.record(url, time.time() - start, is_error)
 
     def __check_status_code(self, r, expect_code):
         if r.status_code != expect_code:
@@ -33,7 +138,7 @@ class HttpClient:
     def get(self, url, access_token, is_body=True, **kwargs):
         try:
             headers = {"Content-Type": "application/json", "Authorization": "token " + access_token}
-            r = requests.get(url, headers=headers, timeout=self.timeout, **kwargs)
+            r = self.__request('GET', url, headers=headers, **kwargs)
             self.__check_status_code(r, 200)
             return r.json() if is_body else r
         except HiveException as e:
@@ -45,18 +150,16 @@ class HttpClient:
         r = self.get(url, access_token, is_body=False, stream=True)
         fm.write_file_by_response(r, file_path, is_temp=True)
 
-    def post(self, url, access_token, body, is_json=True, is_body=True, success_code=201, timeout=None, **kwargs):
+    def post(self, url, access_token, body, is_json=True, is_body=True, success_code=201, timeout=None, headers=None, **kwargs):
         try:
-            headers = dict()
+            headers = dict(headers) if headers else dict()
             if access_token:
                 headers["Authorization"] = "token " + access_token
             if is_json:
                 headers['Content-Type'] = 'application/json'
 
-            timeout_ = timeout if timeout is not None else self.timeout
-
-            r = requests.post(url, headers=headers, json=body, timeout=timeout_, **kwargs) \
-                if is_json else requests.post(url, headers=headers, data=body, timeout=self.timeout, **kwargs)
+            r = self.__request('POST', url, headers=headers, json=body, timeout=timeout, **kwargs) \
+                if is_json else self.__request('POST', url, headers=headers, data=body, timeout=timeout, **kwargs)
             self.__check_status_code(r, success_code)
             return r.json() if is_body else r
         except HiveException as e:
@@ -79,7 +182,7 @@ class HttpClient:
     def put(self, url, access_token, body, is_body=False):
         try:
             headers = {"Authorization": "token " + access_token}
-            r = requests.put(url, headers=headers, data=body, timeout=self.timeout)
+            r = self.__request('PUT', url, headers=headers, data=body)
             self.__check_status_code(r, 200)
             return r.json() if is_body else r
         except HiveException as e:
@@ -94,7 +197,7 @@ class HttpClient:
     def delete(self, url, access_token):
         try:
             headers = {"Authorization": "token " + access_token}
-            r = requests.delete(url, headers=headers, timeout=self.timeout)
+            r = self.__request('DELETE', url, headers=headers)
             self.__check_status_code(r, 204)
         except HiveException as e:
             raise e
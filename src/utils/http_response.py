@@ -3,16 +3,20 @@
 Defines all success and error http response code and body.
 For new exception, please define here.
 """
+import itertools
 import traceback
 import logging
 import typing as t
 
 from werkzeug.exceptions import HTTPException
-from flask import request, make_response, jsonify
+from flask import request, make_response, jsonify, Response, stream_with_context
 from flask_restful import Api
 from sentry_sdk import capture_exception
 
 from src.utils.http_exception import HiveException, InternalServerErrorException
+from src.utils.extended_json import iter_json_items, iter_ndjson
+
+MIMETYPE_NDJSON = 'application/x-ndjson'
 
 
 class HiveApi(Api):
@@ -64,3 +68,28 @@ def response_stream(f: t.Callable[..., t.Any]) -> t.Callable[..., t.Any]:
         response.headers['content-type'] = 'application/octet-stream'
         return response
     return wrapper
+
+
+def is_ndjson_accepted():
+    """ the client prefers the newline delimited JSON by the header 'Accept' """
+    return request.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON]) == MIMETYPE_NDJSON
+
+
+def _prefetch(items: t.Iterable) -> t.Iterator:
+    """ get the first item before responding, then the error of the query can be the error response """
+    items = iter(items)
+    for first in items:
+        return itertools.chain([first], items)
+    return iter([])
+
+
+def response_json_items(items: t.Iterable, get_fields: t.Callable[[], dict] = None, headers: dict = None):
+    """ Response the JSON object with the documents which are encoded and sent one by one, see iter_json_items() """
+    return Response(stream_with_context(iter_json_items(_prefetch(items), get_fields)),
+                    status=HiveApi._get_resp_success_code(), headers=headers, mimetype='application/json')
+
+
+def response_ndjson(items: t.Iterable, headers: dict = None):
+    """ Response the documents as the newline delimited JSON, see iter_ndjson() """
+    return Response(stream_with_context(iter_ndjson(_prefetch(items))),
+                    status=HiveApi._get_resp_success_code(), headers=headers, mimetype=MIMETYPE_NDJSON)
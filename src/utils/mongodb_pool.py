@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+The shared connection pool of mongodb for all v1 and v2 data access.
+"""
+import logging
+import threading
+
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+from src.settings import hive_setting
+
+
+class _PoolStatsListener(ConnectionPoolListener):
+    """ Count the connection events of the pools of one MongoClient. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {
+            'created': 0,
+            'closed': 0,
+            'checked_out': 0,
+            'checked_in': 0,
+            'check_out_failed': 0,
+            'pool_cleared': 0,
+        }
+
+    def __inc(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['open'] = stats['created'] - stats['closed']
+        stats['in_use'] = stats['checked_out'] - stats['checked_in']
+        return stats
+
+    def pool_created(self, event):
+        ...
+
+    def pool_ready(self, event):
+        ...
+
+    def pool_cleared(self, event):
+        self.__inc('pool_cleared')
+
+    def pool_closed(self, event):
+        ...
+
+    def connection_created(self, event):
+        self.__inc('created')
+
+    def connection_ready(self, event):
+        ...
+
+    def connection_closed(self, event):
+        self.__inc('closed')
+
+    def connection_check_out_started(self, event):
+        ...
+
+    def connection_check_out_failed(self, event):
+        self.__inc('check_out_failed')
+
+    def connection_checked_out(self, event):
+        self.__inc('checked_out')
+
+    def connection_checked_in(self, event):
+        self.__inc('checked_in')
+
+
+class MongodbPool:
+    """ The registry of MongoClient, one client (with its connection pool) for every mongodb uri.
+
+    MongoClient is thread-safe and keeps the connections alive, so all code paths must borrow it from here
+    instead of creating a new one which costs the TCP and authentication handshakes.
+
+    usage:
+
+        connection = mongodb_pool.get_client()
+        col = connection[db_name][col_name]
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # uri: (MongoClient, _PoolStatsListener)
+        self.clients = {}
+
+    @staticmethod
+    def __get_options():
+        options = {
+            'maxPoolSize': hive_setting.MONGODB_MAX_POOL_SIZE,
+            'maxIdleTimeMS': hive_setting.MONGODB_MAX_IDLE_TIME_MS,
+            'connectTimeoutMS': hive_setting.MONGODB_CONNECT_TIMEOUT_MS,
+            'socketTimeoutMS': hive_setting.MONGODB_SOCKET_TIMEOUT_MS,
+            'waitQueueTimeoutMS': hive_setting.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            'serverSelectionTimeoutMS': hive_setting.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        }
+
+        # 0 means using the default value of pymongo
+        return {k: v for k, v in options.items() if v > 0}
+
+    def get_client(self, uri=None) -> MongoClient:
+        """ get the shared MongoClient of the uri, default is the setting MONGODB_URI """
+        uri = uri if uri else hive_setting.MONGODB_URI
+
+        item = self.clients.get(uri)
+        if item:
+            return item[0]
+
+        with self.lock:
+            if uri not in self.clients:
+                options = self.__get_options()
+                listener = _PoolStatsListener()
+                self.clients[uri] = MongoClient(uri, event_listeners=[listener], **options), listener
+                logging.getLogger('MongodbPool').info(f'Create the shared MongoClient with options: {options}')
+            return self.clients[uri][0]
+
+    def get_stats(self):
+        """ the connection statistics of all clients """
+        with self.lock:
+            items = list(self.clients.values())
+
+        return {
+            'clients': len(items),
+            'max_pool_size': hive_setting.MONGODB_MAX_POOL_SIZE,
+            'connections': [listener.get_stats() for _, listener in items],
+        }
+
+    def close(self):
+        with self.lock:
+            items, self.clients = list(self.clients.values()), {}
+
+        for client, _ in items:
+            client.close()
+
+
+mongodb_pool = MongodbPool()
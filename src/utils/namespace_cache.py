@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+The cache of the existence of mongodb databases and collections.
+"""
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+from src.settings import hive_setting
+from src.utils.consts import COL_NAMESPACE_DROPS
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils_v1.constants import DID_INFO_DB_NAME
+
+
+class NamespaceCache:
+    """ Per-process cache of the known databases and collections to avoid
+    'list_database_names' and 'list_collection_names' before every operation.
+
+    The node's own create and drop calls update the cache directly.
+    A name which is not in the cache or is expired is checked with mongodb again,
+    so the databases or collections created by others can be found on the first access.
+    The cache is refreshed after MONGODB_NAMESPACE_CACHE_TTL seconds to detect the ones dropped by others.
+
+    The drops by the node increase the version in the collection COL_NAMESPACE_DROPS, which is checked
+    every DROPS_CHECK_INTERVAL seconds, so other processes clear their caches soon after the drop
+    and do not recreate the dropped collection silently.
+    """
+
+    DROPS_CHECK_INTERVAL = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # (names, load_time)
+        self.databases = (set(), 0)
+        # db_name: (names, load_time)
+        self.collections = {}
+
+        # the version of the drops known by this process, and the last checking time
+        self.drops_version = None
+        self.drops_checked = 0
+
+    @staticmethod
+    def __is_fresh(load_time):
+        return time.time() - load_time < hive_setting.MONGODB_NAMESPACE_CACHE_TTL
+
+    def exists_database(self, db_name) -> bool:
+        self.__check_drops()
+        names, load_time = self.databases
+        if db_name in names and self.__is_fresh(load_time):
+            return True
+
+        names = set(mongodb_pool.get_client().list_database_names())
+        with self.lock:
+            self.databases = names, time.time()
+        return db_name in names
+
+    def exists_collection(self, db_name, col_name) -> bool:
+        self.__check_drops()
+        names, load_time = self.collections.get(db_name, (set(), 0))
+        if col_name in names and self.__is_fresh(load_time):
+            return True
+
+        names = set(mongodb_pool.get_client()[db_name].list_collection_names())
+        with self.lock:
+            self.collections[db_name] = names, time.time()
+        return col_name in names
+
+    def add_collection(self, db_name, col_name):
+        """ the collection is created by the node, mongodb also creates the database if not exists """
+        with self.lock:
+            self.databases[0].add(db_name)
+            if db_name in self.collections:
+                self.collections[db_name][0].add(col_name)
+
+    def remove_collection(self, db_name, col_name):
+        with self.lock:
+            if db_name in self.collections:
+                self.collections[db_name][0].discard(col_name)
+        self.__notify_drops()
+
+    def remove_database(self, db_name):
+        with self.lock:
+            self.databases[0].discard(db_name)
+            self.collections.pop(db_name, None)
+        self.__notify_drops()
+
+    @staticmethod
+    def __get_drops_collection():
+        return mongodb_pool.get_client()[DID_INFO_DB_NAME][COL_NAMESPACE_DROPS]
+
+    def __check_drops(self):
+        """ clear the cache when the databases or collections are dropped by other processes """
+        now = time.time()
+        if now - self.drops_checked < self.DROPS_CHECK_INTERVAL:
+            return
+
+        doc = self.__get_drops_collection().find_one({'_id': 'drops'})
+        version = doc['version'] if doc else 0
+        with self.lock:
+            self.drops_checked = now
+            if version != self.drops_version:
+                self.drops_version = version
+                self.databases = set(), 0
+                self.collections = {}
+
+    def __notify_drops(self):
+        """ the dropping is already applied to the cache of this process """
+        doc = self.__get_drops_collection().find_one_and_update({'_id': 'drops'}, {'$inc': {'version': 1}},
+                                                                upsert=True, return_document=ReturnDocument.AFTER)
+        with self.lock:
+            # skip the clearing only if no drops by others
+            if self.drops_version is not None and doc['version'] == self.drops_version + 1:
+                self.drops_version = doc['version']
+
+
+namespace_cache = NamespaceCache()
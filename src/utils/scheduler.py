@@ -11,7 +11,10 @@ from flask_apscheduler import APScheduler
 
 from src.modules.auth.user import UserManager
 from src.modules.database.mongodb_client import MongodbClient
+from src.modules.database.usage import usage_accountant
+from src.modules.ipfs.ipfs_cid_ref import IpfsCidRef
 from src.modules.subscription.vault import VaultManager
+from src.modules.subscription.vault_cache import vault_cache
 from src.utils import hive_job
 from src.utils.file_manager import fm
 from src.utils_v1.common import get_temp_path
@@ -48,6 +51,7 @@ def count_vault_storage_really():
             VAULT_SERVICE_DB_USE_STORAGE: dbs_size,
             VAULT_SERVICE_MODIFY_TIME: now}}
         col.update_one(filter_, update, contains_extra=False)
+        vault_cache.invalidate(user_did)
 
 
 @scheduler.task(trigger='interval', id='daily_routine_job', days=1)
@@ -56,6 +60,22 @@ def count_vault_storage_job():
     count_vault_storage_really()
 
 
+@scheduler.task('interval', id='task_reconcile_databases_usage', minutes=10)
+@hive_job('reconcile_databases_usage_job')
+def reconcile_databases_usage_job():
+    """ Reset the databases usage of the vaults which have been written by the real size. """
+    usage_accountant.reconcile()
+
+
+@scheduler.task('interval', id='task_remove_zero_cid_refs', hours=1)
+@hive_job('remove_zero_cid_refs_job')
+def remove_zero_cid_refs_job():
+    """ Sweep the CID references which count has been decreased to zero. """
+    count = IpfsCidRef.remove_zero_counts()
+    if count:
+        logging.getLogger("scheduler").info(f'remove_zero_cid_refs_job() {count} CID references removed.')
+
+
 @scheduler.task('interval', id='task_clean_temp_files', hours=6)
 @hive_job('clean_temp_files_job')
 def clean_temp_files_job():
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+The cache of the verified access tokens.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from src.settings import hive_setting
+from src.utils.did.did_wrapper import JWT
+from src.utils.http_exception import ElaDIDException
+
+
+class TokenCache:
+    """ Bounded LRU cache of the details of the access tokens which have been parsed and verified by the DID library.
+
+    The key is the digest of the token, so the same token carried by the following requests skips native parsing.
+    Only the tokens which are not expired are cached, and the expired ones are removed on looking up.
+    The caller MUST still check the details (subject, issuer, expiration, props) on every request.
+
+    The details of the token::
+
+        {
+            "subject": <str|None>,
+            "issuer": <str|None>,
+            "audience": <str|None>,
+            "expiration": <int>,
+            "props": <dict|None>
+        }
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+        }
+
+    def parse(self, token: str) -> dict:
+        """ Get the details of the token, parse the token with the DID library on cache missing.
+
+        :raise: ElaDIDException if the token is invalid.
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        now = datetime.now().timestamp()
+
+        with self.lock:
+            details = self.items.get(key)
+            if details is not None:
+                if now < details['expiration']:
+                    self.items.move_to_end(key)
+                    self.metrics['hits'] += 1
+                    return self.__copy(details)
+
+                del self.items[key]
+                self.metrics['expired'] += 1
+            self.metrics['misses'] += 1
+
+        details = TokenCache.__parse(token)
+
+        if now < details['expiration']:
+            with self.lock:
+                self.items[key] = details
+                while len(self.items) > hive_setting.TOKEN_CACHE_SIZE:
+                    self.items.popitem(last=False)
+                    self.metrics['evictions'] += 1
+
+        return self.__copy(details)
+
+    @staticmethod
+    def __copy(details):
+        """ the caller can change the props """
+        result = dict(details)
+        result['props'] = dict(details['props']) if details['props'] is not None else None
+        return result
+
+    @staticmethod
+    def __parse(token):
+        jwt = JWT.parse(token)
+
+        def get_value(getter):
+            try:
+                return getter()
+            except ElaDIDException as e:
+                return None
+
+        props = get_value(lambda: jwt.get_claim('props'))
+        expiration = get_value(jwt.get_expiration)
+        return {
+            'subject': get_value(jwt.get_subject),
+            'issuer': get_value(jwt.get_issuer),
+            'audience': get_value(jwt.get_audience),
+            'expiration': expiration if expiration else 0,
+            'props': json.loads(props) if props else None,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['size'] = len(self.items)
+
+        metrics['capacity'] = hive_setting.TOKEN_CACHE_SIZE
+        total = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / total, 4) if total else 0
+        return metrics
+
+
+token_cache = TokenCache()
@@ -43,6 +43,8 @@ VAULT_BACKUP_SERVICE_END_TIME = "end_time"
 # scripting begin, compatible with v1
 SCRIPTING_SCRIPT_COLLECTION = "scripts"
 SCRIPTING_SCRIPT_TEMP_TX_COLLECTION = "scripts_temptx"
+# changed on every registering of the script
+SCRIPTING_SCRIPT_VERSION = "_version"
 
 SCRIPTING_CONDITION_TYPE_QUERY_HAS_RESULTS = "queryHasResults"
 SCRIPTING_CONDITION_TYPE_AND = "and"
@@ -1,8 +1,8 @@
 import os
-import hashlib
 from pathlib import Path
 
 from src.settings import hive_setting
+from src.utils.file_hasher import hash_file
 from src.utils_v1.common import did_tail_part, create_full_path_dir
 from src.utils_v1.error_code import INTERNAL_SERVER_ERROR, NOT_FOUND
 
@@ -83,15 +83,7 @@ def query_hash(did, app_did, name):
         return data, err
 
     # INFO: to get sha256 by full path, use fm.get_file_content_sha256()
-    buf_size = 65536  # lets read stuff in 64kb chunks!
-    sha = hashlib.sha256()
-    with full_path_name.open('rb') as f:
-        while True:
-            data = f.read(buf_size)
-            if not data:
-                break
-            sha.update(data)
-    data = {"SHA256": sha.hexdigest()}
+    data = {"SHA256": hash_file(full_path_name, 'sha256')}
     return data, err
 
 
@@ -1,21 +1,23 @@
 import hashlib
-import json
 import shutil
 import subprocess
+import tempfile
 from datetime import datetime
 from pathlib import Path
 
-from bson import ObjectId, json_util
-from pymongo import MongoClient
+from bson import ObjectId
 
 from src.settings import hive_setting
+from src.utils.extended_json import to_json_value
+from src.utils.mongodb_pool import mongodb_pool
+from src.utils.namespace_cache import namespace_cache
 from src.utils.http_exception import BadRequestException
 from src.utils_v1.common import did_tail_part
 
 
 def create_db_client():
-    """ Create the instance of the MongoClient by the setting MONGO_TYPE. """
-    return MongoClient(hive_setting.MONGODB_URI)
+    """ Get the shared MongoClient by the setting MONGODB_URI. """
+    return mongodb_pool.get_client()
 
 
 def convert_oid(query, update=False):
@@ -128,10 +130,7 @@ def query_find_many(col, content, options):
             result = col.find(convert_oid(content["filter"]), **options)
         else:
             result = col.find(**options)
-        arr = list()
-        for c in json.loads(json_util.dumps(result)):
-            arr.append(c)
-        data = {"items": arr}
+        data = {"items": [to_json_value(c) for c in result]}
         return data, None
     except Exception as e:
         return None, f"Exception: method: 'query_find_many', Err: {str(e)}"
@@ -163,7 +162,7 @@ def get_collection(did, app_did, collection):
     connection = create_db_client()
     db_name = gene_mongo_db_name(did, app_did)
     db = connection[db_name]
-    if collection not in db.list_collection_names():
+    if not namespace_cache.exists_collection(db_name, collection):
         return None
     col = db[collection]
     return col
@@ -173,6 +172,7 @@ def delete_mongo_database(did, app_did):
     connection = create_db_client()
     db_name = gene_mongo_db_name(did, app_did)
     connection.drop_database(db_name)
+    namespace_cache.remove_database(db_name)
 
 
 def get_save_mongo_db_path(did):
@@ -184,27 +184,83 @@ def get_save_mongo_db_path(did):
     return path.resolve()
 
 
-def dump_mongodb_to_full_path(db_name, full_path: Path):
+def dump_mongodb_to_full_path(db_name, full_path: Path, is_gzip=False):
     try:
-        line2 = f'mongodump --uri="{hive_setting.MONGODB_URI}" -d {db_name} --archive="{full_path.as_posix()}"'
-        subprocess.check_output(line2, shell=True, stderr=subprocess.STDOUT)
+        args = ['mongodump', f'--uri={hive_setting.MONGODB_URI}', '-d', db_name, f'--archive={full_path.as_posix()}']
+        subprocess.check_output(args + (['--gzip'] if is_gzip else []), stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as e:
         raise BadRequestException(f'Failed to dump database {db_name}: {e.output}')
 
 
-def restore_mongodb_from_full_path(full_path: Path):
+def dump_mongodb_to_stream(db_name, consume, is_gzip=True):
+    """ Dump the database as the archive to the stdout of mongodump without the temporary file.
+
+    :param consume: called with the stdout stream, MUST read the stream to the end.
+    :return: the result of consume.
+    """
+    args = ['mongodump', f'--uri={hive_setting.MONGODB_URI}', '-d', db_name, '--archive']
+    with tempfile.TemporaryFile() as err:
+        process = subprocess.Popen(args + (['--gzip'] if is_gzip else []), stdout=subprocess.PIPE, stderr=err)
+        try:
+            result = consume(process.stdout)
+        except Exception as e:
+            process.kill()
+            raise e
+        finally:
+            process.stdout.close()
+
+        if process.wait() != 0:
+            err.seek(0)
+            raise BadRequestException(f'Failed to dump database {db_name}: {err.read()}')
+        return result
+
+
+def restore_mongodb_from_full_path(full_path: Path, is_gzip=False):
     if not full_path.exists():
         raise BadRequestException(f'Failed to import mongo db by invalid full dir {full_path.as_posix()}')
 
     try:
         # https://www.mongodb.com/docs/database-tools/mongorestore/#cmdoption--drop
         # --drop: drop collections before restore, but does not drop collections that are not in the backup.
-        line2 = f'mongorestore --uri="{hive_setting.MONGODB_URI}" --drop --archive="{full_path.as_posix()}"'
-        subprocess.check_output(line2, shell=True, stderr=subprocess.STDOUT)
+        args = ['mongorestore', f'--uri={hive_setting.MONGODB_URI}', '--drop', f'--archive={full_path.as_posix()}']
+        subprocess.check_output(args + (['--gzip'] if is_gzip else []), stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as e:
         raise BadRequestException(f'Failed to load database by {full_path.as_posix()}: {e.output}')
 
 
+def restore_mongodb_from_stream(db_name, chunks, is_gzip=False, to_db_name=None):
+    """ Restore the database by the archive chunks which are written to the stdin of mongorestore without the temporary file.
+
+    :param chunks: the iterable of the archive content, raise to abort the restoring and kill mongorestore.
+        It is closed when mongorestore exits early.
+    :param to_db_name: restore the collections of the database 'db_name' in the archive to this one.
+    """
+    args = ['mongorestore', f'--uri={hive_setting.MONGODB_URI}', '--drop', '--archive']
+    if to_db_name:
+        args.extend([f'--nsFrom={db_name}.*', f'--nsTo={to_db_name}.*'])
+    with tempfile.TemporaryFile() as out:
+        process = subprocess.Popen(args + (['--gzip'] if is_gzip else []), stdin=subprocess.PIPE, stdout=out, stderr=subprocess.STDOUT)
+        is_broken = False
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+            process.stdin.close()
+        except BrokenPipeError:
+            # mongorestore exits, get the error from its output.
+            is_broken = True
+        except Exception as e:
+            process.kill()
+            process.wait()
+            raise e
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+        if process.wait() != 0 or is_broken:
+            out.seek(0)
+            raise BadRequestException(f'Failed to restore database {db_name}: {out.read()}')
+
+
 def delete_mongo_db_export(did):
     save_path = get_save_mongo_db_path(did)
     if save_path.exists():
@@ -63,6 +63,7 @@ def init_app(api: Api):
     api.add_resource(provider.Vaults, '/provider/vaults', endpoint='provider.vaults')
     api.add_resource(provider.Backups, '/provider/backups', endpoint='provider.backups')
     api.add_resource(provider.FilledOrders, '/provider/filled_orders', endpoint='provider.filled_orders')
+    api.add_resource(provider.Metrics, '/provider/metrics', endpoint='provider.metrics')
 
     # about service
     # INFO: one class with two lines for the documentation to hide '/about', so don't combine them.
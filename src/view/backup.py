@@ -209,7 +209,8 @@ class ServerInternalState(Resource):
         self.backup_server = IpfsBackupServer()
 
     def get(self):
-        return self.backup_server.internal_backup_state()
+        result, message = rqargs.get_str('result', None)[0], rqargs.get_str('message', None)[0]
+        return self.backup_server.internal_backup_state(rqargs.get_int('wait')[0], result, message)
 
 
 class ServerInternalRestore(Resource):
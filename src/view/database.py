@@ -7,6 +7,7 @@ from flask_restful import Resource
 from src.modules.database.database import Database
 from src.utils.http_exception import InvalidParameterException
 from src.utils.http_request import RV
+from src.utils.http_response import is_ndjson_accepted
 
 
 class CreateCollection(Resource):
@@ -406,7 +407,9 @@ class Find(Resource):
 
             filter: (json str)  # the filter doc need to be encoded by url
             skip: (int)         # optional
-            limit: (int)        # optional
+            limit: (int)        # optional, at most DATABASE_MAX_PAGE_SIZE (default 1000) documents are returned
+            after: (str)        # optional, the token 'next' of the previous page
+            total: (bool)       # optional, return the total count of the documents, default false
 
         **Request**:
 
@@ -432,9 +435,16 @@ class Find(Resource):
                     "modified": {
                         "$date": 1598803861786
                     }
-                }]
+                }],
+                "next": "eyJzb3J0Ij...",  # only exists when the page is full
+                "total": 5  # only exists when 'total' is true
             }
 
+        The documents are sorted by '_id', please use the token 'next' as 'after' to get the next page.
+
+        With the header "Accept: application/x-ndjson", all documents (or 'limit' ones) are returned as
+        the newline delimited JSON which one line is one document, and the total count is in the header 'X-Total-Count'.
+
         **Response Error**:
 
         .. sourcecode:: http
@@ -454,8 +464,11 @@ class Find(Resource):
         filter_ = RV.get_args().get('filter')
         skip = RV.get_args().get_opt('skip', int, None)
         limit = RV.get_args().get_opt('limit', int, None)
+        after = RV.get_args().get_opt('after', str, None)
+        is_total = RV.get_args().get_opt('total', bool, False)
 
-        return self.database.find_document(collection_name, filter_, skip, limit)
+        return self.database.find_document(collection_name, filter_, skip, limit,
+                                           after=after, is_total=is_total, is_ndjson=is_ndjson_accepted())
 
 
 class Query(Resource):
@@ -478,7 +491,9 @@ class Query(Resource):
                 },
                 "options": {  # optional
                     "skip": 0,
-                    "limit": 3,
+                    "limit": 3,  # at most DATABASE_MAX_PAGE_SIZE (default 1000) documents are returned
+                    "after": "eyJzb3J0Ij...",  # the token 'next' of the previous page
+                    "total": false,  # return the total count of the documents
                     "projection": {
                         "_id": false
                     },
@@ -518,9 +533,21 @@ class Query(Resource):
                     "modified": {
                         "$date": 1598803861786
                     }
-                }]
+                }],
+                "next": "eyJzb3J0Ij...",  # only exists when the page is full
+                "total": 5  # only exists when the option 'total' is true
             }
 
+        The documents are sorted by the option 'sort' and then '_id'. The next page can be got by the same request
+        with the option 'after' as the token 'next', which does not need skip the previous documents.
+        The sort values follow the order of mongodb: the missing or null values are first (ascending),
+        and the values of different types are ordered by the types. The array values of the sort keys are not supported.
+        For the large collection, the index on the sort keys must end with '_id' to be used for sorting,
+        such as {"author": 1, "_id": 1} for the sort {"author": 1}.
+
+        With the header "Accept: application/x-ndjson", all documents (or 'limit' ones) are returned as
+        the newline delimited JSON which one line is one document, and the total count is in the header 'X-Total-Count'.
+
         **Response Error**:
 
         .. sourcecode:: http
@@ -541,4 +568,4 @@ class Query(Resource):
         filter_ = RV.get_body().get('filter')
         options = RV.get_body().get_opt('options', dict, {})
 
-        return self.database.query_document(collection_name, filter_, options)
+        return self.database.query_document(collection_name, filter_, options, is_ndjson=is_ndjson_accepted())
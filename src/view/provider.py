@@ -177,3 +177,124 @@ class FilledOrders(Resource):
         """
 
         return self.provider.get_filled_orders()
+
+
+class Metrics(Resource):
+    def __init__(self):
+        self.provider = Provider()
+
+    def get(self):
+        """ Get the runtime metrics of this hive node.
+
+        .. :quickref: 09 Provider; Get Metrics
+
+        **Request**:
+
+        .. sourcecode:: http
+
+            None
+
+        **Response OK**:
+
+        .. sourcecode:: http
+
+            HTTP/1.1 200 OK
+
+        .. code-block:: json
+
+            {
+                "database_usage": {
+                    "recorded": <int>,
+                    "flushed": <int>,
+                    "reconciled": <int>,
+                    "last_drift": <int>,  // bytes
+                    "max_drift": <int>,
+                    "total_drift": <int>,
+                    "mean_drift": <int>,
+                    "pending_users": <int>,
+                    "dirty_users": <int>,
+                    "stale_users": <int>
+                },
+                "mongodb_pool": {
+                    "clients": <int>,
+                    "max_pool_size": <int>,
+                    "connections": [{
+                        "created": <int>,
+                        "closed": <int>,
+                        "open": <int>,
+                        "in_use": <int>,
+                        "checked_out": <int>,
+                        "checked_in": <int>,
+                        "check_out_failed": <int>,
+                        "pool_cleared": <int>
+                    }]
+                },
+                "token_cache": {
+                    "hits": <int>,
+                    "misses": <int>,
+                    "expired": <int>,
+                    "evictions": <int>,
+                    "size": <int>,
+                    "capacity": <int>,
+                    "hit_rate": <float>
+                },
+                "script_cache": {
+                    "hits": <int>,
+                    "misses": <int>,
+                    "invalidations": <int>,
+                    "evictions": <int>,
+                    "size": <int>,
+                    "capacity": <int>,
+                    "hit_rate": <float>
+                },
+                "vault_cache": {
+                    "hits": <int>,
+                    "request_hits": <int>,
+                    "misses": <int>,
+                    "invalidations": <int>,
+                    "size": <int>,
+                    "ttl": <int>  // seconds
+                },
+                "http_client": {
+                    "pool_size": <int>,
+                    "hosts": [{
+                        "host": <str>,
+                        "requests": <int>,
+                        "errors": <int>,
+                        "mean_latency": <int>,  // milliseconds
+                        "max_latency": <int>
+                    }]
+                },
+                "backup_jobs": {
+                    "backup": {
+                        "submitted": <int>,
+                        "completed": <int>,
+                        "queued": <int>,
+                        "running": <int>,
+                        "max_jobs": <int>,
+                        "total_wait": <float>,  // seconds
+                        "max_wait": <float>,
+                        "mean_wait": <float>,
+                        "total_duration": <float>,
+                        "max_duration": <float>,
+                        "mean_duration": <float>
+                    },
+                    "backup_server": {
+                        ... // same as "backup"
+                    }
+                }
+            }
+
+        **Response Error**:
+
+        .. sourcecode:: http
+
+            HTTP/1.1 401 Unauthorized
+
+        .. sourcecode:: http
+
+            HTTP/1.1 403 Forbidden
+
+        """
+
+        return self.provider.get_metrics()
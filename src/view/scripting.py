@@ -174,6 +174,11 @@ class RegisterScript(Resource):
         - fileProperties
         - fileHash
 
+        The 'find' executable returns at most DATABASE_MAX_PAGE_SIZE (default 1000) documents which are sorted by
+        the option 'sort' and then '_id'. The result contains the token 'next' when the page is full, which can be
+        set as the option 'after' (such as "after": "$params.after") to get the next page.
+        The option 'total' (default true) can be set to false to skip counting all matched documents.
+
         """
         return self.scripting.set_script(script_name)
 
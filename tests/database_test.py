@@ -201,6 +201,13 @@ class DatabaseTestCase(unittest.TestCase):
         RA(response).assert_status(200)
         self.assertEqual(len(RA(response).body().get('items', list)), 3)
 
+    def test05_find_with_ndjson(self):
+        response = self.cli.get(f'/db/{self.collection_name}' + '?filter={"author":"Alice"}&total=true',
+                                headers={'Accept': 'application/x-ndjson'})
+        RA(response).assert_status(200)
+        self.assertEqual(response.headers.get('X-Total-Count'), '5')
+        self.assertEqual(len([line for line in response.text.split('\n') if line]), 5)
+
     def test05_find_with_invalid_parameter(self):
         response = self.cli.get(f'/db/{self.collection_name}' + '?filter=&skip=')
         RA(response).assert_status(400)
@@ -271,6 +278,30 @@ class DatabaseTestCase(unittest.TestCase):
         ids = list(map(lambda i: str(i['_id']), items))
         self.assertTrue(all(ids[i] >= ids[i + 1] for i in range(len(ids) - 1)))
 
+    def test06_query_with_pagination(self):
+        options, ids = {'sort': [['author', pymongo.ASCENDING]], 'limit': 2, 'total': True}, []
+        while True:
+            response = self.cli.post('/db/query', body={
+                "collection": self.collection_name,
+                "filter": {"author": "Alice"},
+                "options": options})
+            RA(response).assert_status(201)
+            self.assertEqual(RA(response).body().get('total', int), 5)
+
+            ids.extend(map(lambda i: str(i['_id']), RA(response).body().get('items', list)))
+            if 'next' not in response.json():
+                break
+            options['after'] = RA(response).body().get('next', str)
+
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+        response = self.cli.post('/db/query', body={
+            "collection": self.collection_name,
+            "filter": {"author": "Alice"},
+            "options": {'after': 'invalid_token'}})
+        RA(response).assert_status(400)
+
     def test06_query_with_invalid_parameter(self):
         response = self.cli.post(f'/db/query')
         RA(response).assert_status(400)
@@ -118,6 +118,22 @@ class IpfsFilesTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.text, self.src_file_content)
 
+        etag = response.headers.get('ETag')
+        self.assertTrue(etag)
+        response = self.cli.get(f'/files/{self.src_file_name}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.cli.get(f'/files/{self.src_file_name}', headers={'Range': 'bytes=0-3', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.text, self.src_file_content[:4])
+
+        response = self.cli.get(f'/files/{self.src_file_name}', headers={'Range': 'bytes=0-3,10-12'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.headers.get('Content-Type').startswith('multipart/byteranges'))
+
+        response = self.cli.get(f'/files/{self.src_file_name}', headers={'Range': 'bytes=100000-'})
+        self.assertEqual(response.status_code, 416)
+
     def test02_download_file_invalid_parameter(self):
         response = self.cli.get(f'/files/')
         self.assertEqual(response.status_code, 400)
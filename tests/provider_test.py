@@ -37,3 +37,11 @@ class ProviderTestCase(unittest.TestCase):
     def test03_get_filled_orders(self):
         response = self.cli_owner.get(f'/filled_orders')
         self.assertTrue(response.status_code in [200, 404])
+
+    def test04_get_metrics(self):
+        response = self.cli_owner.get(f'/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token_cache', response.json())
+        self.assertIn('script_cache', response.json())
+        self.assertIn('vault_cache', response.json())
+        self.assertIn('backup_jobs', response.json())
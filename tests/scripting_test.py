@@ -258,6 +258,34 @@ class IpfsScriptingTestCase(unittest.TestCase):
 
         self.__register_call_delete_script(script_name, script_body, call_body, call_response_checker)
 
+    def test02_count_with_script_changed(self):
+        """ the compiled script is cached, the changed script MUST take effect immediately """
+        script_name, executable_name = 'ipfs_database_count_changed', 'database_count'
+
+        def get_script_body(author):
+            return {'executable': {
+                'name': executable_name,
+                'type': 'count',
+                'body': {
+                    'collection': self.collection_name,
+                    'filter': {'author': author}
+                }
+            }}
+
+        call_body = {"params": {"author": "John"}}
+
+        self.__register_script(script_name, get_script_body('$params.author'))
+        for _ in range(2):
+            body = self.__call_script(script_name, call_body)
+            body.get(executable_name).assert_equal('count', 18)
+
+        self.__register_script(script_name, get_script_body('author_not_exist'))
+        body = self.__call_script(script_name, call_body)
+        body.get(executable_name).assert_equal('count', 0)
+
+        self.delete_script(script_name)
+        self.__call_script(script_name, call_body, expect_status=HttpCode.BAD_REQUEST)
+
     def test02_find(self):
         script_name, executable_name = 'ipfs_database_find', 'database_find'
         script_body = {'executable': {
@@ -494,6 +522,35 @@ class IpfsScriptingTestCase(unittest.TestCase):
 
         self.delete_script(script_name)
 
+    def test03_find_with_short_circuit_conditions(self):
+        script_name, executable_name = 'ipfs_database_find_with_short_circuit_conditions', 'database_find'
+        condition = {
+            'name': 'verify_user_permission',
+            'type': 'queryHasResults',
+            'body': {'collection': self.collection_name, 'filter': {'author': '$params.condition_author'}}
+        }
+        condition_not_checked = {
+            'name': 'verify_user_permission',
+            'type': 'queryHasResults',
+            'body': {'collection': self.name_not_exist, 'filter': {'author': '$params.condition_author'}}
+        }
+
+        self.__register_script(script_name, {'condition': {
+            'name': 'verify_user_permission',
+            'type': 'or',
+            'body': [condition, condition_not_checked]
+        }, 'executable': {
+            'name': executable_name,
+            'type': 'find',
+            'body': {'collection': self.collection_name, 'filter': {'content': '$params.content'}}
+        }})
+
+        # the second condition is not checked when the first one matches
+        body = self.__call_script(script_name, {"params": {"condition_author": "John", "content": "message1"}})
+        body.get(executable_name).assert_equal('total', 2)
+
+        self.delete_script(script_name)
+
     def test03_find_with_sort(self):
         script_name, executable_name = 'ipfs_database_find_with_sort', 'database_find'
 
@@ -254,8 +254,8 @@ class HttpClient:
             return self.base_url + relative_url
         return self.base_url + self.prefix_url + relative_url
 
-    def __get_headers(self, need_token=True, is_json=True):
-        headers = {}
+    def __get_headers(self, need_token=True, is_json=True, extra_headers=None):
+        headers = dict(extra_headers) if extra_headers else {}
         if is_json:
             headers['Content-type'] = 'application/json'
         if need_token:
@@ -275,12 +275,12 @@ class HttpClient:
         return self.remote_resolver.get_backup_credential(self.__class__.get_backup_node_did())
 
     @_log_http_request
-    def get(self, relative_url, body=None, is_json=False, need_token=True):
+    def get(self, relative_url, body=None, is_json=False, need_token=True, headers=None):
         if not is_json:
             return requests.get(self.get_full_url(relative_url),
-                                headers=self.__get_headers(is_json=False, need_token=need_token), data=body)
+                                headers=self.__get_headers(is_json=False, need_token=need_token, extra_headers=headers), data=body)
         return requests.get(self.get_full_url(relative_url),
-                            headers=self.__get_headers(need_token=need_token), json=body)
+                            headers=self.__get_headers(need_token=need_token, extra_headers=headers), json=body)
 
     @_log_http_request
     def post(self, relative_url, body=None, need_token=True, is_json=True, is_skip_prefix=False):